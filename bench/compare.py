@@ -0,0 +1,46 @@
+"""Line up two benchmark reports written by ``run_bench.py``.
+
+    python bench/compare.py before.json after.json
+
+Prints every metric of the scenarios both reports ran, with the relative
+change; for throughput higher is better, for everything else lower is.
+"""
+import json
+import sys
+
+# (項目名, 値の取り出し方, 大きいほど良いか)
+METRICS = [
+    ("time_to_first_result_s", lambda s: s.get("time_to_first_result_s"), False),
+    ("ingest_s", lambda s: s.get("ingest_s"), False),
+    ("paths_per_s", lambda s: s.get("paths_per_s"), True),
+    ("frame_max_ms", lambda s: s.get("frames", {}).get("max_ms"), False),
+    ("filter_mean_ms", lambda s: sum(k["total_ms"] for k in s["filter"]) / len(s["filter"]) if s.get("filter") else None, False),
+    ("filter_max_ms", lambda s: max(k["total_ms"] for k in s["filter"]) if s.get("filter") else None, False),
+    ("peak_rss_mb", lambda s: s.get("peak_rss_mb"), False),
+]
+
+def load_scenarios(filepath: str) -> tuple[dict, dict]:
+    with open(filepath, encoding="utf-8") as f:
+        report = json.load(f)
+    return report, {(s["mode"], s["size"]): s for s in report["scenarios"] if "error" not in s and "skipped" not in s}
+
+def main(argv: list[str]) -> int:
+    if len(argv) != 2:
+        print(__doc__.strip(), file=sys.stderr)
+        return 2
+    (old_report, old), (new_report, new) = load_scenarios(argv[0]), load_scenarios(argv[1])
+    print(f"before: {old_report['git'].get('commit') or '?'}  after: {new_report['git'].get('commit') or '?'}")
+    print(f"{'scenario':<18} {'metric':<24} {'before':>12} {'after':>12} {'change':>9}")
+    for key in sorted(old.keys() & new.keys()):
+        for name, value, higher_is_better in METRICS:
+            before, after = value(old[key]), value(new[key])
+            if before is None or after is None:
+                continue
+            change = (after - before) / before * 100 if before else 0.0
+            worse = change < 0 if higher_is_better else change > 0
+            mark = "  !" if worse and abs(change) >= 10 else ""
+            print(f"{key[0] + ' ' + str(key[1]):<18} {name:<24} {before:>12.3f} {after:>12.3f} {change:>+8.1f}%{mark}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
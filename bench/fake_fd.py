@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Stand-in for fd that replays a recorded path list instead of walking the disk.
+
+Called like fd (``fake_fd.py PATTERN FOLDER [options]``), it prints every
+path of the list in ``FAKE_FD_PATHS`` (NUL-separated, relative, as written
+by ``synth.py list``) under FOLDER, whatever the pattern, so every run of a
+benchmark sees the same results at the same pace:
+
+``FAKE_FD_RATE``   paths per second, 0 (default) for as fast as possible
+``FAKE_FD_DELAY``  seconds to wait before the first path (the start of the walk)
+``FAKE_FD_CHUNK``  paths per write, default 256
+"""
+import os
+import sys
+import time
+
+READ_BYTES = 1 << 20
+
+def iter_chunks(filepath: str, chunk: int):
+    """Yield lists of at most ``chunk`` paths (bytes) from a NUL-separated list."""
+    pending = []
+    rest = b""
+    with open(filepath, "rb") as f:
+        while block := f.read(READ_BYTES):
+            parts = (rest + block).split(b"\0")
+            rest = parts.pop()
+            pending.extend(parts)
+            while len(pending) >= chunk:
+                yield pending[:chunk]
+                del pending[:chunk]
+    if rest:
+        pending.append(rest)
+    if pending:
+        yield pending
+
+def main(argv: list[str]) -> int:
+    paths_file = os.environ.get("FAKE_FD_PATHS")
+    if not paths_file:
+        print("fake_fd: FAKE_FD_PATHS is not set", file=sys.stderr)
+        return 2
+    rate = float(os.environ.get("FAKE_FD_RATE", "0"))
+    delay = float(os.environ.get("FAKE_FD_DELAY", "0"))
+    chunk = int(os.environ.get("FAKE_FD_CHUNK", "256")) if rate else 1 << 16
+    # 引数はアプリが組み立てる順 (パターン, フォルダ, オプション...)
+    positional = [arg for arg in argv[:2] if not arg.startswith("-")]
+    folder = positional[1] if len(positional) > 1 else "."
+    prefix = folder.rstrip("/") + "/"
+    if "--absolute-path" in argv:
+        prefix = os.path.abspath(folder).rstrip("/") + "/"
+    prefix = prefix.encode("utf-8")
+    end = b"\0" if "--print0" in argv else b"\n"
+    joiner = end + prefix
+
+    out = sys.stdout.buffer
+    time.sleep(delay)
+    started = time.perf_counter()
+    emitted = 0
+    try:
+        for paths in iter_chunks(paths_file, chunk):
+            if rate:
+                # 指定の速度より先行していれば追いつかれるまで待つ
+                wait = started + emitted / rate - time.perf_counter()
+                if wait > 0:
+                    time.sleep(wait)
+            out.write(prefix + joiner.join(paths) + end)
+            out.flush()
+            emitted += len(paths)
+    except BrokenPipeError:
+        # 読み手が先に終了した (検索の中止など)
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,329 @@
+"""Reproducible performance benchmarks for searching, ingesting and filtering results.
+
+Each scenario (a result count in one mode) runs in a fresh Python process,
+so the peak RSS it reports is its own, and searches a fake fd
+(``fake_fd.py``) that replays a synthetic path list (``synth.py``) at a
+controlled rate. The report is a single JSON document; ``compare.py``
+lines two of them up.
+
+Modes:
+
+``engine``  ``SearchEngine`` feeding a ``ResultStore`` and ``FuzzyFilter`` the way the app does, without Tk.
+``gui``     the app itself: ``run_fd_search`` -> ``periodic_gui_updater`` -> ``filter_results``.
+            Needs a display; on a server run it under ``xvfb-run``.
+"""
+import argparse
+import json
+import os
+import platform
+import queue
+import resource
+import shlex
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)  # engine.py / main.py を読み込めるようにする
+
+from synth import NAME_DISTRIBUTIONS, generate_paths, parse_count, write_path_list
+
+BENCH_FORMAT = "fd_gui.bench"
+BENCH_VERSION = 1
+MODES = ("engine", "gui")
+KEYWORD = "bench"  # fake fd はパターンを無視するので何でもよい
+
+# --- 子プロセス側: 1 つのシナリオを計測する ---
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss は Linux では KiB、macOS ではバイト単位
+    return round(peak / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+def current_rss_mb() -> float | None:
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1 << 20), 1)
+    except (OSError, ValueError, IndexError):
+        return None
+
+def keystroke_queries(text: str) -> list[str]:
+    """Every prefix of ``text``, as the filter box sees it while typing."""
+    return [text[:n] for n in range(1, len(text) + 1)]
+
+def bench_engine(scenario: dict) -> dict:
+    from engine import SPILL_MB, FuzzyFilter, ResultStore, SearchEngine, result_roots
+
+    baseline = current_rss_mb()
+    roots = [scenario["root"]]
+    engine = SearchEngine(fd_path=scenario["fd"])  # キャッシュもインデックスも使わない
+    store = ResultStore(result_roots(roots), spill_bytes=SPILL_MB << 20)
+    fuzzy = FuzzyFilter()
+    stats = {}
+    # アプリと同じく、fd の読み込みスレッドと取り込み側をキューで切り離す
+    batches = queue.SimpleQueue()
+    first_result = None
+
+    def on_paths(root_id, rels):
+        nonlocal first_result
+        if first_result is None:
+            first_result = time.perf_counter()
+        batches.put((root_id, rels))
+
+    def run():
+        try:
+            engine.search(roots, KEYWORD, stats=stats, on_paths=on_paths)
+        finally:
+            batches.put(None)
+
+    started = time.perf_counter()
+    threading.Thread(target=run, daemon=True).start()
+    while (batch := batches.get()) is not None:
+        root_id, rels = batch
+        store.extend(root_id, rels)
+        if store.spilled and fuzzy.store is not store:
+            fuzzy.use_store(store)
+        fuzzy.extend(rels)
+    ingest = time.perf_counter() - started
+    if stats[roots[0]]["error"]:
+        raise RuntimeError(stats[roots[0]]["error"])
+
+    keystrokes = []
+    for query in keystroke_queries(scenario["keystrokes"]):
+        t0 = time.perf_counter()
+        matches = fuzzy.filter(query)
+        t1 = time.perf_counter()
+        if matches:
+            fuzzy.rank(query, matches)
+        t2 = time.perf_counter()
+        keystrokes.append({
+            "query": query, "matches": len(matches),
+            "filter_ms": round((t1 - t0) * 1000, 3), "rank_ms": round((t2 - t1) * 1000, 3),
+            "total_ms": round((t2 - t0) * 1000, 3),
+        })
+    return {
+        "results": len(store),
+        "time_to_first_result_s": round(first_result - started, 4) if first_result else None,
+        "ingest_s": round(ingest, 4),
+        "paths_per_s": round(len(store) / ingest) if ingest else None,
+        "spilled": store.spilled,
+        "filter": keystrokes,
+        "baseline_rss_mb": baseline,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def pump(app, condition, timeout: float):
+    """Run the Tk event loop until ``condition()`` holds."""
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("timed out waiting for the app")
+        app.tk.dooneevent(0)
+
+def bench_gui(scenario: dict) -> dict:
+    # 設定・履歴・インデックスは作業用フォルダに置き、利用者の settings.json に触れない
+    os.makedirs(scenario["home"], exist_ok=True)
+    os.chdir(scenario["home"])
+    with open("settings.json", "w", encoding="utf-8") as f:
+        json.dump({"cache": {"enabled": False}, "startup": {"single_instance": False}}, f)
+    import main as app_module
+    from engine import duration_stats
+
+    baseline = current_rss_mb()
+    app = app_module.FdSearchApp()
+    app.engine.fd_path = scenario["fd"]
+    timeout = scenario["timeout"]
+    marks = {}
+    frames = []
+
+    # 計測点: 最初の取り込み、各フレームの所要時間、検索の完了
+    add_results, updater, finalize = app.add_results, app.periodic_gui_updater, app.finalize_search
+
+    def timed_add_results(root_ids, rels):
+        marks.setdefault("first", time.perf_counter())
+        add_results(root_ids, rels)
+
+    def timed_updater():
+        t0 = time.perf_counter()
+        updater()
+        frames.append(time.perf_counter() - t0)
+
+    def timed_finalize(summary=None):
+        marks["done"] = time.perf_counter()
+        finalize(summary)
+
+    def record_error(msg):
+        # メッセージボックスで止まらないよう、エラーは記録するだけにする
+        app.search_running = False
+        marks["error"] = msg
+
+    app.add_results = timed_add_results
+    app.periodic_gui_updater = timed_updater
+    app.finalize_search = timed_finalize
+    app.show_error = record_error
+
+    def heartbeat():
+        app.after(100, heartbeat)  # 待ち合わせ中もタイムアウトを確認できるようにする
+    heartbeat()
+
+    app.folder_var.set(scenario["root"])
+    app.keyword_var.set(KEYWORD)
+    app.on_keyword_change()
+    app.update()
+    started = time.perf_counter()
+    app.start_search()
+    pump(app, lambda: "done" in marks or "error" in marks, timeout)
+    if "error" in marks:
+        raise RuntimeError(marks["error"])
+    ingest = marks["done"] - started
+    ingest_frames = list(frames)
+
+    keystrokes = []
+    for query in keystroke_queries(scenario["keystrokes"]):
+        t0 = time.perf_counter()
+        app.filter_var.set(query)
+        app.filter_results()  # 入力の間引き (デバウンス) を待たずに始める
+        pump(app, lambda: (app.shown_query == query and not app.filter_queue
+                           and not (app.filter_thread and app.filter_thread.is_alive())), timeout)
+        keystrokes.append({"query": query, "matches": len(app.displayed_results),
+                           "total_ms": round((time.perf_counter() - t0) * 1000, 3)})
+    result = {
+        "results": app.found_count,
+        "time_to_first_result_s": round(marks["first"] - started, 4) if "first" in marks else None,
+        "ingest_s": round(ingest, 4),
+        "paths_per_s": round(app.found_count / ingest) if ingest else None,
+        "spilled": app.results.spilled,
+        "frames": duration_stats(ingest_frames),
+        "filter": keystrokes,
+        "baseline_rss_mb": baseline,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    app.stop_search()
+    app.destroy()
+    return result
+
+def run_child(scenario: dict) -> int:
+    bench = bench_gui if scenario["mode"] == "gui" else bench_engine
+    print(json.dumps(bench(scenario)))
+    return 0
+
+# --- 親プロセス側: 入力の用意とシナリオの実行 ---
+
+def ensure_path_list(work_dir: str, count: int, args) -> str:
+    """The path list for ``count`` entries, generated once and reused by later runs."""
+    # v2: フォルダの末尾に "/" を付けた形式 (それ以前のリストは使わない)
+    name = f"paths-v2-{count}-{args.names}-d{args.depth}-f{args.files_per_dir}-s{args.seed}.lst"
+    filepath = os.path.join(work_dir, name)
+    if not os.path.exists(filepath):
+        print(f"generating {count} paths -> {filepath}", file=sys.stderr)
+        # 途中で止めても壊れたリストが残らないよう、書き終えてから置き換える
+        write_path_list(filepath + ".tmp", generate_paths(count, args.depth, args.files_per_dir, args.names, args.seed))
+        os.replace(filepath + ".tmp", filepath)
+    return filepath
+
+def fake_fd_command(work_dir: str) -> str:
+    """An executable wrapper that runs ``fake_fd.py`` with this interpreter."""
+    wrapper = os.path.join(work_dir, "fd")
+    with open(wrapper, "w", encoding="utf-8") as f:
+        f.write(f'#!/bin/sh\nexec {shlex.quote(sys.executable)} {shlex.quote(os.path.join(BENCH_DIR, "fake_fd.py"))} "$@"\n')
+    os.chmod(wrapper, 0o755)
+    return wrapper
+
+def gui_unavailable() -> str | None:
+    if platform.system() == "Linux" and not (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY")):
+        return "no display (run the benchmark under xvfb-run)"
+    return None
+
+def git_revision() -> dict:
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=REPO_DIR, capture_output=True, text=True, timeout=30).stdout.strip()
+    try:
+        return {"commit": git("rev-parse", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+    except (OSError, subprocess.SubprocessError):
+        return {"commit": None, "dirty": None}
+
+def run_scenario(scenario: dict, env: dict, timeout: float) -> dict:
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", json.dumps(scenario)]
+    try:
+        proc = subprocess.run(cmd, env=env, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {"error": f"timed out after {timeout:.0f} s"}
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        return {"error": (proc.stderr.strip().splitlines() or ["exit code %d" % proc.returncode])[-1]}
+    return json.loads(lines[-1])
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark result ingest, display and filtering against a fake fd.")
+    parser.add_argument("--sizes", default="10k,1m,10m", help="comma-separated result counts (default: %(default)s)")
+    parser.add_argument("--modes", default="engine,gui", help="comma-separated modes: engine, gui (default: %(default)s)")
+    parser.add_argument("--rate", type=float, default=0, help="paths per second fd replays, 0 for unlimited")
+    parser.add_argument("--delay", type=float, default=0.05, help="seconds fd waits before its first path")
+    parser.add_argument("--names", choices=NAME_DISTRIBUTIONS, default="zipf", help="name distribution of the paths")
+    parser.add_argument("--depth", type=int, default=6, help="maximum directory depth of the paths")
+    parser.add_argument("--files-per-dir", type=int, default=24, help="average entries per directory")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keystrokes", default="report.py", help="filter text typed one character at a time")
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "fd_gui_bench"),
+                        help="where path lists and scratch files are kept between runs")
+    parser.add_argument("--timeout", type=float, default=1800, help="seconds allowed per scenario")
+    parser.add_argument("-o", "--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        return run_child(json.loads(args.child))
+
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        parser.error(f"unknown mode: {', '.join(unknown)}")
+    sizes = [parse_count(size) for size in args.sizes.split(",") if size.strip()]
+    os.makedirs(args.work_dir, exist_ok=True)
+    root = os.path.join(args.work_dir, "root")
+    os.makedirs(root, exist_ok=True)
+    fd = fake_fd_command(args.work_dir)
+
+    scenarios = []
+    for size in sizes:
+        env = dict(os.environ, FAKE_FD_PATHS=ensure_path_list(args.work_dir, size, args),
+                   FAKE_FD_RATE=str(args.rate), FAKE_FD_DELAY=str(args.delay))
+        for mode in modes:
+            entry = {"mode": mode, "size": size}
+            skipped = gui_unavailable() if mode == "gui" else None
+            if skipped:
+                entry["skipped"] = skipped
+            else:
+                print(f"{mode}: {size} results ...", file=sys.stderr)
+                scenario = {"mode": mode, "root": root, "fd": fd, "keystrokes": args.keystrokes,
+                            "home": os.path.join(args.work_dir, "home"), "timeout": args.timeout}
+                entry.update(run_scenario(scenario, env, args.timeout))
+            scenarios.append(entry)
+
+    report = {
+        "format": BENCH_FORMAT,
+        "version": BENCH_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "sizes": sizes, "modes": modes, "rate": args.rate, "delay": args.delay, "names": args.names,
+            "depth": args.depth, "files_per_dir": args.files_per_dir, "seed": args.seed, "keystrokes": args.keystrokes,
+        },
+        "scenarios": scenarios,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 1 if any("error" in entry for entry in scenarios) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
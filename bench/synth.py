@@ -0,0 +1,113 @@
+"""Synthetic path lists and directory trees for the benchmarks.
+
+The same arguments and seed always produce the same paths, so runs of
+different versions of the app see exactly the same input.
+"""
+import argparse
+import os
+import random
+import sys
+from itertools import accumulate
+
+# 名前の部品 (実際のプロジェクトにありがちな語を頻度の高い順に並べる)
+WORDS = [
+    "src", "test", "data", "lib", "main", "util", "config", "index", "core", "app",
+    "model", "view", "report", "image", "build", "docs", "assets", "common", "api", "client",
+    "server", "cache", "log", "temp", "backup", "archive", "module", "plugin", "vendor", "script",
+    "sample", "project", "invoice", "photo", "music", "video", "draft", "final", "readme", "setup",
+]
+UNICODE_WORDS = ["資料", "報告書", "写真", "議事録", "Übersicht", "résumé", "données", "año", "фото", "설정"]
+EXTENSIONS = [".py", ".txt", ".json", ".md", ".jpg", ".png", ".csv", ".log", ".html", ".js", ".pdf", ".xml", ""]
+NAME_DISTRIBUTIONS = ("zipf", "uniform", "unicode")
+
+def parse_count(text: str) -> int:
+    """``10k`` / ``1m`` / ``1.5M`` / ``2500`` -> number of paths."""
+    text = text.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+def name_picker(rng: random.Random, distribution: str):
+    """A function returning one name part drawn from ``distribution``."""
+    if distribution not in NAME_DISTRIBUTIONS:
+        raise ValueError(f"unknown name distribution: {distribution}")
+    words = WORDS + UNICODE_WORDS if distribution == "unicode" else WORDS
+    if distribution == "uniform":
+        return lambda: rng.choice(words)
+    # 順位の逆数に比例する頻度 (少数の語が大半を占める実際のファイル名に近い)
+    cum_weights = list(accumulate(1 / rank for rank in range(1, len(words) + 1)))
+    return lambda: rng.choices(words, cum_weights=cum_weights)[0]
+
+def generate_paths(count: int, depth: int = 6, files_per_dir: int = 24, names: str = "zipf", seed: int = 0):
+    """Yield ``count`` ``(relative_path, is_dir)`` pairs in the order a directory walk would list them.
+
+    ``depth`` caps how deep directories nest and ``files_per_dir`` is the
+    average number of entries before the walk moves to another directory.
+    """
+    rng = random.Random(seed)
+    pick = name_picker(rng, names)
+    stack = [""]
+    change = 1 / max(files_per_dir, 1)
+    for _ in range(count):
+        r = rng.random()
+        if r < change and len(stack) <= depth:
+            path = f"{stack[-1]}{pick()}{rng.randrange(100)}"
+            stack.append(path + "/")
+            yield path, True
+            continue
+        if r < 2 * change and len(stack) > 1:
+            stack.pop()
+        yield f"{stack[-1]}{pick()}_{pick()}{rng.randrange(1000)}{rng.choice(EXTENSIONS)}", False
+
+def write_path_list(filepath: str, paths) -> int:
+    """Write the relative paths of ``paths`` to ``filepath`` NUL-terminated; returns how many were written.
+
+    Directories end with ``/``, as fd prints them.
+    """
+    written = 0
+    batch = []
+    with open(filepath, "wb") as f:
+        for path, is_dir in paths:
+            batch.append(path + "/" if is_dir else path)
+            if len(batch) >= 65536:
+                f.write(("\0".join(batch) + "\0").encode("utf-8"))
+                written += len(batch)
+                batch.clear()
+        if batch:
+            f.write(("\0".join(batch) + "\0").encode("utf-8"))
+            written += len(batch)
+    return written
+
+def make_tree(root: str, paths) -> int:
+    """Create the directories and empty files of ``paths`` under ``root``; returns how many entries were made."""
+    made = 0
+    for path, is_dir in paths:
+        target = os.path.join(root, *path.split("/"))
+        if is_dir:
+            os.makedirs(target, exist_ok=True)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            open(target, "ab").close()
+        made += 1
+    return made
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate synthetic path lists or directory trees.")
+    parser.add_argument("kind", choices=("list", "tree"), help="write a NUL-separated path list, or create a real tree")
+    parser.add_argument("output", help="path list file, or the root directory of the tree")
+    parser.add_argument("-n", "--count", default="10k", help="number of entries (e.g. 10k, 1m)")
+    parser.add_argument("--depth", type=int, default=6, help="maximum directory depth")
+    parser.add_argument("--files-per-dir", type=int, default=24, help="average entries per directory")
+    parser.add_argument("--names", choices=NAME_DISTRIBUTIONS, default="zipf", help="name distribution")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    paths = generate_paths(parse_count(args.count), args.depth, args.files_per_dir, args.names, args.seed)
+    if args.kind == "list":
+        made = write_path_list(args.output, paths)
+    else:
+        made = make_tree(args.output, paths)
+    print(f"{made} entries -> {args.output}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2511 @@
+import subprocess
+import threading
+import os
+import platform
+import signal
+import sys
+import time
+import json
+import queue
+import sqlite3
+import re
+import heapq
+import mmap
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from contextlib import closing
+from itertools import accumulate, chain, islice
+from stat import S_ISDIR, S_ISREG
+
+# Utility function to resolve resource file paths depending on the execution environment.
+def resource_path(relative_path: str) -> str:
+    try:
+        base_path = sys._MEIPASS
+    except AttributeError:
+        base_path = os.path.abspath(".")
+    return os.path.join(base_path, relative_path)
+
+READ_CHUNK_BYTES = 1 << 20  # fd の出力を読み込むバッファのサイズ
+CACHE_BATCH = 1 << 16        # キャッシュから結果を流し込む 1 回あたりの件数
+RESULT_OVERHEAD_BYTES = 64   # キャッシュした相対パス 1 件あたりの str オブジェクトの概算サイズ
+
+def iter_path_batches(stream, chunk_size: int = READ_CHUNK_BYTES, timings: dict | None = None):
+    """Yield lists of paths read from a NUL-separated binary stream.
+
+    Each ``readinto`` call fills the same buffer; everything up to the last
+    separator is decoded and split in one go, and the partial path after it
+    is carried over to the next read. If ``timings`` is given, the seconds
+    spent waiting for the stream and decoding it are added to its
+    ``"read_s"`` and ``"parse_s"``.
+    """
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    carry = b""
+    while True:
+        t0 = time.perf_counter()
+        n = stream.readinto(buffer)
+        if not n:
+            break
+        t1 = time.perf_counter()
+        data = carry + view[:n]
+        cut = data.rfind(b"\0")
+        if cut < 0:
+            carry = data
+            continue
+        carry = data[cut + 1:]
+        paths = data[:cut].decode("utf-8", "ignore").split("\0")
+        if timings is not None:
+            timings["read_s"] += t1 - t0
+            timings["parse_s"] += time.perf_counter() - t1
+        yield paths
+    if carry:
+        yield [carry.decode("utf-8", "ignore")]
+
+def kill_process_tree(process: subprocess.Popen):
+    """Terminate ``process`` and its children (fd is started in its own process group)."""
+    if process.poll() is not None:
+        return
+    try:
+        if platform.system() == "Windows":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)],
+                           capture_output=True, creationflags=subprocess.CREATE_NO_WINDOW)
+        else:
+            os.killpg(process.pid, signal.SIGTERM)
+    except (OSError, subprocess.SubprocessError):
+        process.kill()
+
+def directory_stamps(root: str, limit: int = 256) -> tuple | None:
+    """Modification times of ``root`` and its immediate subdirectories, or None if unreadable."""
+    try:
+        stamps = [os.stat(root).st_mtime_ns]
+        with os.scandir(root) as entries:
+            for entry in islice(entries, limit):
+                if entry.is_dir(follow_symlinks=False):
+                    stamps.append((entry.name, entry.stat(follow_symlinks=False).st_mtime_ns))
+    except OSError:
+        return None
+    return tuple(stamps)
+
+class ResultCache:
+    """LRU cache of finished searches, keyed on the full fd command line.
+
+    Entries are evicted oldest-first once their estimated size exceeds
+    ``max_bytes``. An entry is only served while it is younger than ``ttl``
+    seconds and ``directory_stamps`` of the root is unchanged; changes deeper
+    than one level are left to the TTL.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (results, size, created, stamps)
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: tuple, stamps: tuple) -> list | None:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            results, size, created, cached_stamps = entry
+            if time.time() - created > self.ttl or cached_stamps != stamps:
+                self.discard(key)
+                return None
+            self.entries.move_to_end(key)
+            return results
+
+    def put(self, key: tuple, stamps: tuple, results: list, size: int):
+        with self.lock:
+            self.discard(key)
+            if size > self.max_bytes:
+                return
+            self.entries[key] = (results, size, time.time(), stamps)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_size, _, _) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+
+    def discard(self, key: tuple):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry[1]
+
+def root_prefix_length(path: str, folder: str) -> int | None:
+    """Length of ``folder`` plus its separator at the start of ``path``, or None if fd rewrote it."""
+    for root in (folder, os.path.abspath(folder)):
+        root = root.rstrip("/\\")
+        n = len(root)
+        if os.path.normcase(path[:n]) == os.path.normcase(root) and path[n:n + 1] in ("/", "\\"):
+            return n + 1
+    return None
+
+ROOT_SEPARATOR = ";"   # 検索フォルダ欄で複数のルートを区切る文字
+MAX_ROOT_WORKERS = 4   # 同時に走らせる fd の数 (fd 自体もマルチスレッドのため控えめにする)
+
+def parse_roots(text: str) -> list[str]:
+    """Split the folder field into distinct roots, keeping their order."""
+    roots, seen = [], set()
+    for root in text.split(ROOT_SEPARATOR):
+        root = root.strip()
+        key = os.path.normcase(os.path.abspath(root)) if root else None
+        if key and key not in seen:
+            seen.add(key)
+            roots.append(root)
+    return roots
+
+def root_labels(roots: list[str]) -> dict[str, str]:
+    """Short display tag per root: its base name, or the full path where names collide."""
+    names = {root: os.path.basename(os.path.abspath(root).rstrip("/\\")) for root in roots}
+    clashes = {name for name in names.values() if list(names.values()).count(name) > 1}
+    return {root: os.path.abspath(root) if not name or name in clashes else name
+            for root, name in names.items()}
+
+def root_tags(roots: list[str]) -> dict[str, str]:
+    """Prefix put in front of each root's relative paths; empty when there is only one root."""
+    if len(roots) == 1:
+        return {roots[0]: ""}
+    return {root: os.path.join(label, "") for root, label in root_labels(roots).items()}
+
+# 履歴ファイル: gzip 圧縮した 1 行の JSON ヘッダに続けて、表示用の相対パスを NUL 区切りで並べる
+HISTORY_FORMAT = "fd_gui.history"
+HISTORY_VERSION = 1
+HISTORY_EXTENSION = ".fdh"
+
+def write_history(filepath: str, header: dict, store: "ResultStore"):
+    """Stream the paths in ``store`` to a compressed history file.
+
+    The body is the store's NUL-terminated buffer written as is, so each
+    path is stored once, relative to its root. ``header["roots"]`` lists the
+    ``[tag, prefix]`` pairs the reader needs to rebuild absolute paths.
+    """
+    count = len(store)
+    header = {"format": HISTORY_FORMAT, "version": HISTORY_VERSION, **header,
+              "roots": store.roots, "count": count}
+    import gzip
+    temp_path = filepath + ".tmp"
+    with gzip.open(temp_path, "wb", compresslevel=6) as f:
+        f.write(json.dumps(header, ensure_ascii=False).encode("utf-8") + b"\n")
+        for chunk in store.iter_buffer(0, count):
+            f.write(chunk)
+    os.replace(temp_path, filepath)
+
+def read_history(filepath: str) -> tuple[dict, object]:
+    """Open a history file; returns its header and a generator of ``(root_ids, rels)`` batches.
+
+    ``root_ids`` indexes ``header["roots"]`` (one int for the whole batch, or
+    one per path). Files in the old format (a single JSON document) are
+    still accepted.
+    """
+    import gzip
+    with open(filepath, "rb") as f:
+        compressed = f.read(2) == b"\x1f\x8b"
+    if not compressed:
+        with open(filepath, "r", encoding="utf-8") as f:
+            history_data = json.load(f)
+        results = history_data.pop("results", [])
+        history_data["roots"] = [["", os.path.join(history_data.get("search_folder", ""), "")]]
+        batches = ((0, [item[1] for item in results[start:start + CACHE_BATCH]])
+                   for start in range(0, len(results), CACHE_BATCH))
+        return history_data, batches
+    stream = gzip.open(filepath, "rb")
+    try:
+        header = json.loads(stream.readline())
+        if header.get("format") != HISTORY_FORMAT or header.get("version", 0) > HISTORY_VERSION:
+            raise ValueError("unsupported history file")
+    except Exception:
+        stream.close()
+        raise
+    header["roots"] = header.get("roots") or [["", os.path.join(header.get("search_folder", ""), "")]]
+    return header, iter_history_records(stream, header["roots"])
+
+def read_history_header(filepath: str) -> dict:
+    """Metadata of a history file without reading its results (old JSON files are parsed once)."""
+    with open(filepath, "rb") as f:
+        compressed = f.read(2) == b"\x1f\x8b"
+    if compressed:
+        import gzip
+        with gzip.open(filepath, "rb") as f:
+            return json.loads(f.readline())
+    with open(filepath, "r", encoding="utf-8") as f:
+        history_data = json.load(f)
+    history_data["count"] = len(history_data.pop("results", []))
+    return history_data
+
+def iter_history_records(stream, roots: list):
+    with stream:
+        if len(roots) == 1:
+            for rels in iter_path_batches(stream):
+                yield 0, rels
+            return
+        for rels in iter_path_batches(stream):
+            yield [match_root(roots, rel) for rel in rels], rels
+
+def match_root(roots: list, rel: str) -> int:
+    """Index of the root whose tag starts ``rel`` (the longest one, so nested roots resolve correctly)."""
+    best, best_length = 0, -1
+    for root_id, (tag, _) in enumerate(roots):
+        if len(tag) > best_length and rel.startswith(tag):
+            best, best_length = root_id, len(tag)
+    return best
+
+def fd_executable() -> str:
+    return resource_path("fd.exe") if platform.system() == "Windows" else "fd"
+
+def run_fd_relative(fd_path: str, args: list[str], base: str):
+    """Run fd under ``base`` and yield batches of paths relative to it."""
+    creation_flags = subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0
+    cmd = [fd_path, *args, "--absolute-path", "--print0", ".", base]
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0,
+                          creationflags=creation_flags) as process:
+        prefix_length = None
+        for paths in iter_path_batches(process.stdout):
+            if prefix_length is None:
+                prefix_length = root_prefix_length(paths[0], base) or 0
+            if prefix_length:
+                yield [path[prefix_length:].rstrip("/\\") for path in paths]
+            else:
+                yield [os.path.relpath(path, base) for path in paths]
+
+# 正規表現のうち、一致に必ず含まれる連続した文字列を取り出すための記号
+REGEX_SPECIAL = set("\\|()[]{}")
+REGEX_BREAK = set(".^$+")
+REGEX_OPTIONAL = set("*?")
+
+def required_literal(pattern: str) -> str:
+    """Longest run of plain characters every match of the regex ``pattern`` must contain ('' if unknown)."""
+    if REGEX_SPECIAL & set(pattern):
+        return ""
+    runs, current = [], ""
+    for ch in pattern:
+        if ch in REGEX_OPTIONAL:
+            current = current[:-1]
+        if ch in REGEX_OPTIONAL or ch in REGEX_BREAK:
+            runs.append(current)
+            current = ""
+        else:
+            current += ch
+    runs.append(current)
+    return max(runs, key=len)
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS roots (
+    id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, crawled_at REAL, refreshed_at REAL);
+CREATE TABLE IF NOT EXISTS dirs (
+    id INTEGER PRIMARY KEY, root_id INTEGER NOT NULL, path TEXT NOT NULL,
+    mtime_ns INTEGER, hidden INTEGER NOT NULL, UNIQUE (root_id, path));
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY, dir_id INTEGER NOT NULL, name TEXT NOT NULL,
+    is_dir INTEGER NOT NULL, hidden INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS entries_dir ON entries (dir_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS names USING fts5 (
+    name, content='entries', content_rowid='id', tokenize='trigram');
+CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+    INSERT INTO names (rowid, name) VALUES (new.id, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+    INSERT INTO names (names, rowid, name) VALUES ('delete', old.id, old.name);
+END;
+"""
+INDEX_REFRESH_S = 60  # 同じルートを再確認するまでの最短間隔
+INDEX_STARTUP_DELAY_MS = 3000  # 起動直後の描画を優先し、少し待ってから差分を反映する
+INDEX_BATCH = 1 << 14
+
+class PathIndex:
+    """Persistent index of every path under the configured roots (SQLite, FTS5 trigram).
+
+    A root is crawled once with fd (``--hidden``, same ignore rules as a
+    normal search) and every entry is stored with its directory, type and
+    hidden flag. Keyword searches are then answered from the trigram table
+    and checked against the fd regex on the file name, honoring the type,
+    hidden and case-sensitivity options. ``refresh`` compares directory
+    mtimes and re-lists only the directories that changed.
+    """
+
+    def __init__(self, db_path: str, fd_path: str):
+        self.db_path = db_path
+        self.fd_path = fd_path
+        self.write_lock = threading.Lock()
+        self.busy = set()
+
+    def connect(self) -> sqlite3.Connection:
+        # 接続はスレッドごとに作る (sqlite3 の接続はスレッド間で共有できない)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(INDEX_SCHEMA)
+        return conn
+
+    @staticmethod
+    def normalize(root: str) -> str:
+        return os.path.normcase(os.path.abspath(root))
+
+    def root_row(self, conn: sqlite3.Connection, root: str):
+        return conn.execute("SELECT id, crawled_at, refreshed_at FROM roots WHERE path = ?",
+                            (self.normalize(root),)).fetchone()
+
+    def is_ready(self, root: str) -> bool:
+        if not os.path.exists(self.db_path):
+            return False
+        with closing(self.connect()) as conn:
+            row = self.root_row(conn, root)
+        return row is not None and row[1] is not None
+
+    def remove(self, root: str):
+        with self.write_lock, closing(self.connect()) as conn, conn:
+            row = self.root_row(conn, root)
+            if row is not None:
+                conn.execute("DELETE FROM entries WHERE dir_id IN (SELECT id FROM dirs WHERE root_id = ?)", (row[0],))
+                conn.execute("DELETE FROM dirs WHERE root_id = ?", (row[0],))
+                conn.execute("DELETE FROM roots WHERE id = ?", (row[0],))
+
+    def crawl(self, root: str):
+        """Index ``root`` from scratch."""
+        abs_root = os.path.abspath(root)
+        with self.write_lock, closing(self.connect()) as conn, conn:
+            row = self.root_row(conn, root)
+            if row is None:
+                root_id = conn.execute("INSERT INTO roots (path) VALUES (?)", (self.normalize(root),)).lastrowid
+            else:
+                root_id = row[0]
+                conn.execute("DELETE FROM entries WHERE dir_id IN (SELECT id FROM dirs WHERE root_id = ?)", (root_id,))
+                conn.execute("DELETE FROM dirs WHERE root_id = ?", (root_id,))
+            self.index_subtree(conn, root_id, abs_root, "")
+            now = time.time()
+            conn.execute("UPDATE roots SET crawled_at = ?, refreshed_at = ? WHERE id = ?", (now, now, root_id))
+
+    def index_subtree(self, conn: sqlite3.Connection, root_id: int, abs_root: str, rel_dir: str):
+        """Insert ``rel_dir`` (relative to the root, '' for the root itself) and everything below it."""
+        base = os.path.join(abs_root, rel_dir) if rel_dir else abs_root
+        dir_ids = {rel_dir: self.add_dir(conn, root_id, abs_root, rel_dir)}
+        for batch in run_fd_relative(self.fd_path, ["--hidden", "--type", "d"], base):
+            for rel in batch:
+                path = os.path.join(rel_dir, rel) if rel_dir else rel
+                dir_ids[path] = self.add_dir(conn, root_id, abs_root, path)
+        for batch in run_fd_relative(self.fd_path, ["--hidden"], base):
+            rows = []
+            for rel in batch:
+                path = os.path.join(rel_dir, rel) if rel_dir else rel
+                parent, name = os.path.split(path)
+                parent_id = dir_ids.get(parent)
+                if parent_id is None:
+                    parent_id = dir_ids[parent] = self.add_dir(conn, root_id, abs_root, parent)
+                rows.append((parent_id, name, path in dir_ids, name.startswith(".") or self.is_hidden(parent)))
+            conn.executemany("INSERT INTO entries (dir_id, name, is_dir, hidden) VALUES (?, ?, ?, ?)", rows)
+
+    @staticmethod
+    def is_hidden(rel_dir: str) -> bool:
+        return any(part.startswith(".") for part in rel_dir.split(os.sep) if part)
+
+    def add_dir(self, conn: sqlite3.Connection, root_id: int, abs_root: str, rel_dir: str) -> int:
+        try:
+            mtime = os.stat(os.path.join(abs_root, rel_dir)).st_mtime_ns
+        except OSError:
+            mtime = None
+        conn.execute("INSERT OR IGNORE INTO dirs (root_id, path, mtime_ns, hidden) VALUES (?, ?, ?, ?)",
+                     (root_id, rel_dir, mtime, self.is_hidden(rel_dir)))
+        return conn.execute("SELECT id FROM dirs WHERE root_id = ? AND path = ?", (root_id, rel_dir)).fetchone()[0]
+
+    def search(self, root: str, keyword: str, file_type: str, hidden: bool, case_sensitive: bool):
+        """Yield batches of paths relative to ``root`` whose name matches ``keyword`` like fd would.
+
+        Returns None when the keyword is not a regex Python understands, so
+        the caller can fall back to running fd.
+        """
+        try:
+            regex = re.compile(keyword, 0 if case_sensitive else re.IGNORECASE)
+        except re.error:
+            return None
+        return self.iter_search(root, regex, required_literal(keyword), file_type, hidden)
+
+    def iter_search(self, root: str, regex: re.Pattern, literal: str, file_type: str, hidden: bool):
+        conditions, params = ["d.root_id = ?"], []
+        if file_type in ("f", "d"):
+            conditions.append("e.is_dir = ?")
+            params.append(file_type == "d")
+        if not hidden:
+            conditions.append("e.hidden = 0")
+        if len(literal) >= 3:
+            # トライグラム索引で候補を絞り、正規表現で最終判定する
+            escaped = literal.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            source = "names JOIN entries e ON e.id = names.rowid"
+            conditions.append("names.name LIKE ? ESCAPE '\\'")
+            params.append(f"%{escaped}%")
+        else:
+            source = "entries e"
+        sql = (f"SELECT d.path, e.name, e.is_dir FROM {source} JOIN dirs d ON d.id = e.dir_id "
+               f"WHERE {' AND '.join(conditions)} ORDER BY e.id")
+        search = regex.search
+        with closing(self.connect()) as conn:
+            row = self.root_row(conn, root)
+            if row is None:
+                return
+            cursor = conn.execute(sql, (row[0], *params))
+            while rows := cursor.fetchmany(INDEX_BATCH):
+                # fd と同じく、フォルダには末尾に区切り文字を付ける
+                yield [(os.path.join(parent, name) if parent else name) + (os.sep if is_dir else "")
+                       for parent, name, is_dir in rows if search(name)]
+
+    def refresh(self, root: str, force: bool = False):
+        """Re-list the directories under ``root`` whose mtime changed since they were indexed."""
+        key = self.normalize(root)
+        if key in self.busy:
+            return
+        self.busy.add(key)
+        try:
+            with self.write_lock, closing(self.connect()) as conn, conn:
+                row = self.root_row(conn, root)
+                if row is None or row[1] is None or (not force and time.time() - (row[2] or 0) < INDEX_REFRESH_S):
+                    return
+                root_id, abs_root = row[0], os.path.abspath(root)
+                for dir_id, rel_dir, mtime in conn.execute(
+                        "SELECT id, path, mtime_ns FROM dirs WHERE root_id = ? ORDER BY length(path)", (root_id,)).fetchall():
+                    try:
+                        current = os.stat(os.path.join(abs_root, rel_dir)).st_mtime_ns
+                    except OSError:
+                        current = None
+                    if current != mtime:
+                        self.rescan_dir(conn, root_id, abs_root, dir_id, rel_dir, current)
+                conn.execute("UPDATE roots SET refreshed_at = ? WHERE id = ?", (time.time(), root_id))
+        finally:
+            self.busy.discard(key)
+
+    def rescan_dir(self, conn: sqlite3.Connection, root_id: int, abs_root: str, dir_id: int, rel_dir: str, mtime):
+        """Replace the entries directly inside ``rel_dir``; new subdirectories are indexed in full."""
+        if not conn.execute("SELECT 1 FROM dirs WHERE id = ?", (dir_id,)).fetchone():
+            return  # 親ディレクトリの再走査で既に削除済み
+        old_subdirs = {name for (name,) in conn.execute(
+            "SELECT name FROM entries WHERE dir_id = ? AND is_dir = 1", (dir_id,))}
+        conn.execute("DELETE FROM entries WHERE dir_id = ?", (dir_id,))
+        if mtime is None:
+            self.delete_subtree(conn, root_id, rel_dir)
+            return
+        base = os.path.join(abs_root, rel_dir) if rel_dir else abs_root
+        subdirs = {rel for batch in run_fd_relative(self.fd_path, ["--hidden", "--max-depth", "1", "--type", "d"], base)
+                   for rel in batch}
+        hidden = self.is_hidden(rel_dir)
+        for batch in run_fd_relative(self.fd_path, ["--hidden", "--max-depth", "1"], base):
+            conn.executemany("INSERT INTO entries (dir_id, name, is_dir, hidden) VALUES (?, ?, ?, ?)",
+                             [(dir_id, name, name in subdirs, hidden or name.startswith(".")) for name in batch])
+        for name in old_subdirs - subdirs:
+            self.delete_subtree(conn, root_id, os.path.join(rel_dir, name) if rel_dir else name)
+        for name in subdirs - old_subdirs:
+            self.index_subtree(conn, root_id, abs_root, os.path.join(rel_dir, name) if rel_dir else name)
+        conn.execute("UPDATE dirs SET mtime_ns = ? WHERE id = ?", (mtime, dir_id))
+
+    def delete_subtree(self, conn: sqlite3.Connection, root_id: int, rel_dir: str):
+        escaped = rel_dir.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        subtree = "SELECT id FROM dirs WHERE root_id = ? AND (path = ? OR path LIKE ? ESCAPE '\\')"
+        params = (root_id, rel_dir, escaped + os.sep.replace("\\", "\\\\") + "%")
+        conn.execute(f"DELETE FROM entries WHERE dir_id IN ({subtree})", params)
+        conn.execute(f"DELETE FROM dirs WHERE id IN ({subtree})", params)
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY, file TEXT UNIQUE NOT NULL, mtime_ns INTEGER, bytes INTEGER,
+    saved_at TEXT, search_folder TEXT, keyword TEXT, options TEXT, roots TEXT, count INTEGER,
+    indexed INTEGER NOT NULL DEFAULT 0);
+CREATE TABLE IF NOT EXISTS run_paths (
+    id INTEGER PRIMARY KEY, run_id INTEGER NOT NULL, rel TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS run_paths_run ON run_paths (run_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS run_path_text USING fts5 (
+    rel, content='run_paths', content_rowid='id', tokenize='trigram');
+CREATE TRIGGER IF NOT EXISTS run_paths_ai AFTER INSERT ON run_paths BEGIN
+    INSERT INTO run_path_text (rowid, rel) VALUES (new.id, new.rel);
+END;
+CREATE TRIGGER IF NOT EXISTS run_paths_ad AFTER DELETE ON run_paths BEGIN
+    INSERT INTO run_path_text (run_path_text, rowid, rel) VALUES ('delete', old.id, old.rel);
+END;
+"""
+HISTORY_BUDGET_MB = 512  # 履歴ファイルの合計サイズの既定の上限
+
+class HistoryCatalog:
+    """Catalog of the saved history files: per-run metadata plus a path index across all runs.
+
+    ``sync`` picks up files added, changed or deleted in the history
+    directory; the run list comes from their headers, and the paths of each
+    run are stored once in an FTS5 trigram table so every saved run can be
+    searched at once without opening the files.
+    """
+
+    def __init__(self, history_dir: str):
+        self.history_dir = history_dir
+        self.db_path = os.path.join(history_dir, "catalog.db")
+        self.write_lock = threading.Lock()
+
+    def connect(self) -> sqlite3.Connection:
+        os.makedirs(self.history_dir, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")  # 新しいカタログにだけ効く (既存のものは shrink で切り替える)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(HISTORY_SCHEMA)
+        return conn
+
+    def history_files(self) -> dict:
+        """Stat every history file in the directory, keyed by file name."""
+        files = {}
+        if not os.path.isdir(self.history_dir):
+            return files
+        for entry in os.scandir(self.history_dir):
+            if entry.is_file() and entry.name.endswith((HISTORY_EXTENSION, ".json")):
+                files[entry.name] = entry.stat()
+        return files
+
+    def sync(self, index_paths: bool = True):
+        """Bring the catalog in line with the history directory."""
+        with self.write_lock, closing(self.connect()) as conn:
+            with conn:
+                known = {file: (run_id, mtime) for run_id, file, mtime in conn.execute("SELECT id, file, mtime_ns FROM runs")}
+                files = self.history_files()
+                for file, (run_id, mtime) in known.items():
+                    if file not in files or files[file].st_mtime_ns != mtime:
+                        self.delete_run(conn, run_id)
+                for file, stat in files.items():
+                    if file in known and known[file][1] == stat.st_mtime_ns:
+                        continue
+                    try:
+                        header = read_history_header(os.path.join(self.history_dir, file))
+                    except (OSError, ValueError, EOFError) as e:
+                        print(f"Could not read history file {file}: {e}")
+                        continue
+                    roots = header.get("roots") or [["", os.path.join(header.get("search_folder", ""), "")]]
+                    conn.execute(
+                        "INSERT INTO runs (file, mtime_ns, bytes, saved_at, search_folder, keyword, options, roots, count)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (file, stat.st_mtime_ns, stat.st_size, header.get("saved_at", ""), header.get("search_folder", ""),
+                         header.get("keyword", ""), json.dumps(header.get("options", {})), json.dumps(roots),
+                         header.get("count", 0)))
+            if not index_paths:
+                return
+            for run_id, file in conn.execute("SELECT id, file FROM runs WHERE indexed = 0").fetchall():
+                with conn:
+                    try:
+                        _, batches = read_history(os.path.join(self.history_dir, file))
+                        for _, rels in batches:
+                            conn.executemany("INSERT INTO run_paths (run_id, rel) VALUES (?, ?)",
+                                             [(run_id, rel) for rel in rels])
+                    except (OSError, ValueError, EOFError) as e:
+                        print(f"Could not index history file {file}: {e}")
+                        conn.rollback()
+                        continue
+                    conn.execute("UPDATE runs SET indexed = 1 WHERE id = ?", (run_id,))
+
+    @staticmethod
+    def delete_run(conn: sqlite3.Connection, run_id: int):
+        conn.execute("DELETE FROM run_paths WHERE run_id = ?", (run_id,))
+        conn.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+
+    def runs(self) -> list[dict]:
+        """Every catalogued run, newest first."""
+        if not os.path.exists(self.db_path):
+            return []
+        with closing(self.connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute("SELECT id, file, bytes, saved_at, search_folder, keyword, options, roots, count, indexed "
+                                "FROM runs ORDER BY saved_at DESC, file DESC").fetchall()
+        return [{**row, "options": json.loads(row["options"]), "roots": json.loads(row["roots"])} for row in rows]
+
+    def search(self, keyword: str, case_sensitive: bool):
+        """Yield batches of ``(run_id, rel)`` whose relative path matches ``keyword`` in any indexed run.
+
+        Returns None when the keyword is not a regex Python understands.
+        """
+        try:
+            regex = re.compile(keyword, 0 if case_sensitive else re.IGNORECASE)
+        except re.error:
+            return None
+        return self.iter_search(regex, required_literal(keyword))
+
+    def iter_search(self, regex: re.Pattern, literal: str):
+        if len(literal) >= 3:
+            escaped = literal.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            sql = ("SELECT p.run_id, p.rel FROM run_path_text JOIN run_paths p ON p.id = run_path_text.rowid "
+                   "WHERE run_path_text.rel LIKE ? ESCAPE '\\' ORDER BY p.id")
+            params = (f"%{escaped}%",)
+        else:
+            sql, params = "SELECT run_id, rel FROM run_paths ORDER BY id", ()
+        search = regex.search
+        with closing(self.connect()) as conn:
+            cursor = conn.execute(sql, params)
+            while rows := cursor.fetchmany(INDEX_BATCH):
+                yield [(run_id, rel) for run_id, rel in rows if search(rel)]
+
+    def catalog_bytes(self) -> int:
+        """Size of ``catalog.db`` on disk, including its write-ahead log."""
+        total = 0
+        for path in (self.db_path, self.db_path + "-wal"):
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+        return total
+
+    def prune(self, max_bytes: int) -> list[str]:
+        """Delete the oldest history files until the rest, with their share of the catalog, fit in ``max_bytes``.
+
+        The catalog's path index grows with the number of saved paths, so
+        each run is charged its history file plus its paths' share of
+        ``catalog.db``. Returns the removed names.
+        """
+        removed = []
+        catalog_bytes = self.catalog_bytes()
+        with self.write_lock, closing(self.connect()) as conn:
+            with conn:
+                rows = conn.execute("SELECT id, file, bytes, count FROM runs ORDER BY saved_at DESC, file DESC").fetchall()
+                indexed_paths = conn.execute("SELECT count(*) FROM run_paths").fetchone()[0]
+                # まだ索引していない実行も、いずれ同じ割合で catalog.db を増やす
+                per_path = catalog_bytes / indexed_paths if indexed_paths else 0
+                total = 0 if indexed_paths else catalog_bytes
+                for run_id, file, size, count in rows:
+                    total += (size or 0) + (count or 0) * per_path
+                    if total <= max_bytes:
+                        continue
+                    try:
+                        os.remove(os.path.join(self.history_dir, file))
+                    except FileNotFoundError:
+                        pass
+                    except OSError as e:
+                        print(f"Could not remove history file {file}: {e}")
+                        continue
+                    self.delete_run(conn, run_id)
+                    removed.append(file)
+            if removed:
+                self.shrink(conn)
+        return removed
+
+    @staticmethod
+    def shrink(conn: sqlite3.Connection):
+        """Give the pages freed by deleted runs back to the file system."""
+        # FTS5 は削除を追記で記録するので、索引を作り直してから空きページを返す
+        with conn:
+            conn.execute("INSERT INTO run_path_text (run_path_text) VALUES ('optimize')")
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            conn.executescript("PRAGMA incremental_vacuum;")  # execute では 1 ページずつしか返らない
+        else:
+            # 以前に作ったカタログは一度だけ全体を VACUUM して incremental に切り替える
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+
+def encode_key(text: str) -> bytes:
+    return text.encode("utf-8", "replace")
+
+def case_variants(ch: str) -> list[bytes]:
+    """The encodings of the lower-cased character ``ch`` and its upper-case form, longest first."""
+    return sorted({encode_key(ch), encode_key(ch.upper())}, key=len, reverse=True)
+
+def subsequence_pattern(chars: list[list[bytes]], separator: bytes) -> bytes:
+    """Regex for keys (each ended by ``separator``) containing ``chars`` in order; each item lists its variants.
+
+    The gap before a single-byte character is the negated class ``[^sepX]*``,
+    which stops at the first ``X`` without backtracking; a multi-byte
+    character (whose bytes cannot go in a class) gets a lazy gap instead.
+    The trailing ``[^sep]*`` consumes the rest of the key, so a key matches
+    at most once.
+    """
+    sep = re.escape(separator)
+    pattern = b""
+    for position, variants in enumerate(chars):
+        escaped = [re.escape(variant) for variant in variants]
+        single_byte = all(len(variant) == 1 for variant in variants)
+        if single_byte:
+            target = escaped[0] if len(escaped) == 1 else b"[" + b"".join(escaped) + b"]"
+        else:
+            target = b"(?:" + b"|".join(escaped) + b")"
+        if position:  # 最初の文字はキーのどこから始まってもよい
+            pattern += b"[^" + sep + b"".join(escaped) + b"]*" if single_byte else b"[^" + sep + b"]*?"
+        pattern += target
+    return pattern + b"[^" + sep + b"]*"
+
+# --- スコア付きあいまい一致 ---
+SEPARATORS = b"/\\_-. "
+SCORE_MATCH = 16
+SCORE_CONSECUTIVE = 24
+SCORE_BOUNDARY = 12
+SCORE_BASENAME = 8
+SCORE_IN_BASENAME = 32
+MAX_GAP_PENALTY = 16
+
+# Ranked matches are encoded as one sortable integer: inverted score in the
+# high bits, result index in the low 32 bits (ties keep fd's order).
+SCORE_BIAS = 1 << 30
+INDEX_MASK = (1 << 32) - 1
+RANK_TOP_K = 500
+RANK_PAGE = 500
+RANK_FIRST_BATCH = 8192  # 最初に採点する件数 (ここまでの上位をすぐ表示する)
+
+def match_positions(query: bytes, key: bytes, start: int) -> list[int] | None:
+    """Greedy left-to-right match of ``query`` in ``key[start:]``, then tightened right-to-left."""
+    pos = start - 1
+    for ch in query:
+        pos = key.find(ch, pos + 1)
+        if pos < 0:
+            return None
+    positions = [pos]
+    for ch in reversed(query[:-1]):
+        pos = key.rfind(ch, start, pos)
+        positions.append(pos)
+    positions.reverse()
+    return positions
+
+def fuzzy_score(query: bytes, key: bytes) -> int:
+    """Score ``key`` for ``query`` (both lower-cased); higher is better.
+
+    Rewards consecutive characters, matches right after a path or word
+    separator and matches inside the basename, and penalizes gaps and long
+    paths. Returns ``-SCORE_BIAS`` if ``query`` is not a subsequence.
+    """
+    end = len(key) - 1 if key[-1:] in (b"/", b"\\") else len(key)
+    basename = max(key.rfind(b"/", 0, end), key.rfind(b"\\", 0, end)) + 1
+    best = -SCORE_BIAS
+    for start in ((basename, 0) if basename else (0,)):
+        positions = match_positions(query, key, start)
+        if positions is None:
+            continue
+        score = SCORE_IN_BASENAME if positions[0] >= basename else 0
+        previous = -2
+        for pos in positions:
+            score += SCORE_MATCH
+            if pos == previous + 1:
+                score += SCORE_CONSECUTIVE
+            elif previous >= 0:
+                score -= min(pos - previous - 1, MAX_GAP_PENALTY)
+            if pos == 0 or key[pos - 1] in SEPARATORS:
+                score += SCORE_BOUNDARY
+            if pos >= basename:
+                score += SCORE_BASENAME
+            previous = pos
+        best = max(best, score - (len(key) >> 4))
+    return best
+
+class SpillFile:
+    """Append-only temporary file read back through a memory map.
+
+    Writes go straight to the file; ``view`` maps whatever has been written
+    so far and only re-maps once the file has grown. A map that is replaced
+    stays valid for readers that still hold views of it.
+    """
+
+    def __init__(self, directory: str | None, initial: bytes):
+        import tempfile
+        self.file = tempfile.TemporaryFile(prefix="fd_gui_", dir=directory or None, buffering=0)
+        self.size = 0
+        self.map = None
+        self.mapped = 0
+        self.append(initial)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(self, data):
+        view = memoryview(data).cast("B")
+        while view:
+            view = view[self.file.write(view):]
+        self.size += memoryview(data).nbytes
+
+    def view(self) -> memoryview:
+        if self.mapped < self.size:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.mapped = len(self.map)
+        return memoryview(self.map)[:self.size] if self.map is not None else memoryview(b"")
+
+SPILL_MB = 512  # 結果がこのサイズを超えたらディスク上のファイルへ移す
+
+class ResultStore:
+    """Search results kept as one contiguous UTF-8 buffer instead of a tuple of strings per hit.
+
+    Every path is stored once, as its display path (relative to its root,
+    with the root's tag in front when several roots were searched) followed
+    by a NUL, and ``ends`` holds the offset just past each terminator.
+    ``roots`` lists ``[tag, prefix]`` pairs and ``root_ids`` says which one a
+    path belongs to, so the absolute path is ``prefix + rel[len(tag):]``;
+    ``root_ids`` stays empty while every path belongs to root 0. Views of
+    the results are arrays of indices into the store.
+
+    Once the buffer passes ``spill_bytes`` the paths and their offsets move
+    to memory-mapped temporary files (``spilled``); from then on memory use
+    no longer grows with the number of results, and readers get views of
+    the mapped files instead of copies.
+    """
+
+    def __init__(self, roots: list | None = None, spill_bytes: int | None = None, spill_dir: str | None = None):
+        self.roots = roots or [["", ""]]
+        self.data = bytearray()
+        self.ends = array("Q")
+        self.root_ids = array("I")
+        self.count = 0
+        self.spill_bytes = spill_bytes
+        self.spill_dir = spill_dir
+        self.spilled = False
+
+    def __len__(self) -> int:
+        return self.count
+
+    def buffer(self):
+        """The path bytes (a bytearray, or a view of the mapped file once spilled)."""
+        return self.data.view() if self.spilled else self.data
+
+    def offsets(self):
+        return self.ends.view().cast("Q") if self.spilled else self.ends
+
+    def extend(self, root_ids, rels: list[str]):
+        """Append ``rels``; ``root_ids`` is one root index for all of them or one per path."""
+        if not rels:
+            return
+        count = self.count
+        offset = len(self.data)
+        encoded = ("\0".join(rels) + "\0").encode("utf-8", "surrogateescape")
+        if len(encoded) == sum(map(len, rels)) + len(rels):
+            lengths = map(len, rels)  # ASCII のみ: 文字数がそのままバイト数
+        else:
+            lengths = (len(rel.encode("utf-8", "surrogateescape")) for rel in rels)
+        ends = array("Q", accumulate((length + 1 for length in lengths), initial=offset))
+        del ends[0]  # accumulate の初期値 (直前の終端) を取り除く
+        if self.spilled:
+            self.data.append(encoded)
+            self.ends.append(ends)
+        else:
+            self.data += encoded
+            self.ends.extend(ends)
+        self.count += len(rels)
+        if isinstance(root_ids, int):
+            if root_ids or self.root_ids:
+                self.root_ids.extend([0] * (count - len(self.root_ids)) + [root_ids] * len(rels))
+        elif self.root_ids or any(root_ids):
+            self.root_ids.extend([0] * (count - len(self.root_ids)))
+            self.root_ids.extend(root_ids)
+        if not self.spilled and self.spill_bytes is not None and len(self.data) > self.spill_bytes:
+            self.spill()
+
+    def spill(self):
+        """Move the paths and offsets into memory-mapped temporary files."""
+        data = SpillFile(self.spill_dir, self.data)
+        ends = SpillFile(self.spill_dir, self.ends.tobytes())
+        self.data, self.ends, self.spilled = data, ends, True
+
+    def rel(self, index: int) -> str:
+        ends = self.offsets()
+        start = ends[index - 1] if index else 0
+        return str(self.buffer()[start:ends[index] - 1], "utf-8", "surrogateescape")
+
+    def absolute(self, index: int) -> str:
+        root_id = self.root_ids[index] if index < len(self.root_ids) else 0
+        tag, prefix = self.roots[root_id]
+        return prefix + self.rel(index)[len(tag):]
+
+    def rels(self, start: int, stop: int) -> list[str]:
+        if start >= stop:
+            return []
+        ends = self.offsets()
+        begin = ends[start - 1] if start else 0
+        return str(self.buffer()[begin:ends[stop - 1] - 1], "utf-8", "surrogateescape").split("\0")
+
+    def iter_buffer(self, start: int, stop: int, chunk_bytes: int = READ_CHUNK_BYTES):
+        """Yield the NUL-terminated bytes of paths ``start``..``stop`` as views, without copying."""
+        if start >= stop:
+            return
+        ends = self.offsets()
+        begin = ends[start - 1] if start else 0
+        end = ends[stop - 1]
+        view = memoryview(self.buffer())
+        try:
+            for offset in range(begin, end, chunk_bytes):
+                yield view[offset:min(offset + chunk_bytes, end)]
+        finally:
+            view.release()
+
+    def all_rows(self) -> "ResultRows":
+        return ResultRows(self)
+
+class ResultRows:
+    """Every index of a ``ResultStore``, growing with it (the unfiltered view)."""
+
+    def __init__(self, store: ResultStore):
+        self.store = store
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def __getitem__(self, position: int) -> int:
+        if not 0 <= position < len(self.store):
+            raise IndexError(position)
+        return position
+
+class RankedResults:
+    """Read-only sequence of result indices in score order, ranked lazily page by page.
+
+    Only the best ``top`` entries are sorted up front; the order of the rest
+    comes from a heap that is built the first time a row past them is read,
+    so a long tail nobody scrolls to is never sorted.
+    """
+
+    def __init__(self, encoded: array, top: list[int]):
+        self.encoded = encoded
+        self.order = [value & INDEX_MASK for value in top]
+        self.heap = None
+
+    def __len__(self) -> int:
+        return len(self.encoded)
+
+    def __getitem__(self, position: int):
+        if not 0 <= position < len(self.encoded):
+            raise IndexError(position)
+        while position >= len(self.order):
+            self.rank_more()
+        return self.order[position]
+
+    def rank_more(self):
+        if self.heap is None:
+            self.heap = list(self.encoded)
+            heapq.heapify(self.heap)
+            for _ in range(len(self.order)):
+                heapq.heappop(self.heap)
+        for _ in range(min(RANK_PAGE, len(self.heap))):
+            self.order.append(heapq.heappop(self.heap) & INDEX_MASK)
+
+class PartialRanking:
+    """Read-only sequence shown while ``FuzzyFilter.rank`` is still scoring: the best matches so far, then the rest.
+
+    ``matches`` is the filter's own (sorted) array and is not copied; the
+    other matches follow the top ones in their original order.
+    """
+
+    def __init__(self, top: list[int], matches: array):
+        self.order = [value & INDEX_MASK for value in top]
+        self.matches = matches
+        # 上位に入った位置 (昇順)。残りの行を引くときに飛ばす
+        self.skipped = sorted(bisect_left(matches, index) for index in self.order)
+
+    def __len__(self) -> int:
+        return len(self.matches)
+
+    def __getitem__(self, position: int):
+        if not 0 <= position < len(self.matches):
+            raise IndexError(position)
+        if position < len(self.order):
+            return self.order[position]
+        position -= len(self.order)
+        for skipped in self.skipped:
+            if skipped > position:
+                break
+            position += 1
+        return self.matches[position]
+
+class FuzzyFilter:
+    """Incremental subsequence filter over lower-cased path keys.
+
+    Keys are lower-cased and UTF-8 encoded once when they are added and kept
+    as newline-terminated chunks, so a full scan is one regular-expression
+    search per chunk instead of one Python call per path. Each query is
+    pushed on a stack together with its matches: a query that extends the
+    previous one only re-checks those matches, and backspacing pops back to
+    a result that is already known.
+
+    After ``use_store`` the keys are no longer copied: the filter runs
+    directly on the NUL-terminated, original-case bytes of a spilled
+    ``ResultStore``, with each query character expanded to its case
+    variants.
+    """
+
+    CHUNK_BYTES = 1 << 20
+    NARROW_BATCH = 1 << 16
+    STORE_SCAN_BATCH = 1 << 14
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        # 実行中の filter() は古いリストを参照し続けるため、ここではロック不要
+        self.chunks = []  # [(base index, key bytes, key start offsets)]
+        self.stack = []   # [(query, matches, number of keys scanned)]
+        self.count = 0
+        self.store = None
+
+    def use_store(self, store: "ResultStore"):
+        """Read the keys from ``store`` from now on and drop the in-memory copies."""
+        self.store = store
+        self.chunks = []
+
+    def __len__(self) -> int:
+        return self.count
+
+    def extend(self, texts: list[str]):
+        """Add the keys for ``texts``; they get the next consecutive indices."""
+        if not texts:
+            return
+        if self.store is not None:
+            self.count += len(texts)  # キーは store 側にある
+            return
+        lines = "\n".join(texts).lower().encode("utf-8", "replace").split(b"\n")
+        if len(lines) != len(texts):
+            # 改行を含むパスは行の区切りと衝突するため空白に置き換える
+            lines = [encode_key(text.replace("\n", " ").lower()) for text in texts]
+        data = b"\n".join(lines) + b"\n"
+        starts = array("Q", accumulate((len(line) + 1 for line in lines[:-1]), initial=0))
+        if self.chunks and len(self.chunks[-1][1]) + len(data) <= self.CHUNK_BYTES:
+            base, old_data, old_starts = self.chunks[-1]
+            shift = len(old_data)
+            self.chunks[-1] = (base, old_data + data, old_starts + array("Q", (start + shift for start in starts)))
+        else:
+            self.chunks.append((self.count, data, starts))
+        self.count += len(texts)
+
+    def filter(self, query: str, cancel: threading.Event | None = None, on_chunk=None) -> array | None:
+        """Return the sorted indices of the keys that contain ``query`` as a subsequence.
+
+        Safe to call from a worker thread while ``extend`` runs on another;
+        calls are serialized and see the keys that existed when they started.
+        ``on_chunk`` receives the result slice by slice, in order, as soon as
+        each slice is known. Returns None if ``cancel`` is set first.
+        """
+        query = query.lower()
+        with self.lock:
+            count = self.count
+            chunks, stack, store = self.chunks, self.stack, self.store
+            if not query:
+                return array("Q", range(count))
+            while stack and not query.startswith(stack[-1][0]):
+                stack.pop()
+            if store is not None:
+                source = self.store_source(store, count)
+                regex = self.compile(query, fold_case=True)
+                scan = lambda lo, hi: self.scan_store(source, regex, lo, hi)
+                narrow = lambda candidates: self.narrow_store(source, regex, candidates)
+            else:
+                regex = self.compile(query)
+                scan = lambda lo, hi: self.scan(chunks, regex, lo, hi)
+                narrow = lambda candidates: self.narrow(chunks, regex, candidates)
+            matches = array("Q")
+            if not stack:
+                parts = [scan(0, count)]
+            else:
+                previous_query, previous, scanned = stack[-1]
+                tail = scan(scanned, count)
+                if previous_query == query:
+                    parts = [tail]
+                    matches.extend(previous)
+                elif len(previous) * 4 > scanned:
+                    # 候補が多い場合はチャンク単位の一括走査のほうが速い
+                    parts = [scan(0, scanned), tail]
+                else:
+                    parts = [narrow(previous), tail]
+            if on_chunk is not None and matches:
+                on_chunk(matches[:])
+            for part in chain(*parts):
+                if cancel is not None and cancel.is_set():
+                    return None
+                matches.extend(part)
+                if on_chunk is not None and part:
+                    on_chunk(part)
+            if stack and stack[-1][0] == query:
+                stack.pop()
+            stack.append((query, matches, count))
+            return matches
+
+    @staticmethod
+    def compile(query: str, fold_case: bool = False) -> re.Pattern:
+        if fold_case:
+            # store の元の大文字小文字のままのバイト列に対し、各文字を大文字/小文字の選択にして照合する
+            return re.compile(subsequence_pattern([case_variants(ch) for ch in query], b"\0"))
+        return re.compile(subsequence_pattern([[encode_key(ch)] for ch in query], b"\n"))
+
+    @staticmethod
+    def store_source(store: "ResultStore", count: int) -> tuple:
+        """Views of the first ``count`` keys of ``store`` (offsets first, so the bytes cover them)."""
+        ends = store.offsets()[:count]
+        data = store.buffer()[:ends[count - 1] if count else 0]
+        return data, ends
+
+    @classmethod
+    def scan_store(cls, source: tuple, regex: re.Pattern, lo: int, hi: int):
+        """Like ``scan``, over the store's bytes in slices of ``STORE_SCAN_BATCH`` keys."""
+        data, ends = source
+        for block in range(lo, hi, cls.STORE_SCAN_BATCH):
+            last = min(block + cls.STORE_SCAN_BATCH, hi)
+            start = ends[block - 1] if block else 0
+            # ends[i] はキー i の終端の直後なので、一致位置を bisect するとそのままキーの番号になる
+            yield array("Q", [bisect_right(ends, m.start()) for m in regex.finditer(data, start, ends[last - 1])])
+
+    @classmethod
+    def narrow_store(cls, source: tuple, regex: re.Pattern, candidates: array):
+        data, ends = source
+        search = regex.search
+        for batch_start in range(0, len(candidates), cls.NARROW_BATCH):
+            yield array("Q", [index for index in candidates[batch_start:batch_start + cls.NARROW_BATCH]
+                              if search(data, ends[index - 1] if index else 0, ends[index]) is not None])
+
+    @staticmethod
+    def scan(chunks: list, regex: re.Pattern, lo: int, hi: int):
+        """Search the keys ``lo``..``hi``, yielding the matches of each chunk from one ``finditer`` pass."""
+        for base, data, starts in chunks:
+            n = len(starts)
+            if base + n <= lo or base >= hi:
+                continue
+            first, last = max(lo - base, 0), min(hi - base, n)
+            endpos = starts[last] if last < n else len(data)
+            yield array("Q", [base + bisect_right(starts, m.start()) - 1
+                              for m in regex.finditer(data, starts[first], endpos)])
+
+    def narrow(self, chunks: list, regex: re.Pattern, candidates: array):
+        """Re-check only ``candidates``, with one search bounded to each key."""
+        chunk_bases = [chunk[0] for chunk in chunks]
+        search = regex.search
+        limit = 0
+        for batch_start in range(0, len(candidates), self.NARROW_BATCH):
+            matches = array("Q")
+            for index in candidates[batch_start:batch_start + self.NARROW_BATCH]:
+                if index >= limit:
+                    base, data, starts = chunks[bisect_right(chunk_bases, index) - 1]
+                    limit = base + len(starts)
+                local = index - base
+                end = starts[local + 1] if local + 1 < len(starts) else len(data)
+                if search(data, starts[local], end) is not None:
+                    matches.append(index)
+            yield matches
+
+    def rank(self, query: str, matches: array, cancel: threading.Event | None = None,
+             k: int = RANK_TOP_K, on_partial=None) -> tuple[array, list[int]] | None:
+        """Score ``matches`` for ``query`` and pick the best ``k`` with a bounded heap.
+
+        Returns the encoded scores of all matches and the sorted top ``k``
+        (see ``RankedResults``), or None if ``cancel`` is set first. Scoring
+        runs in batches, the first one small; after each batch but the last,
+        ``on_partial(top)`` gets the top ``k`` so far (see
+        ``PartialRanking``), so the best matches can be shown before every
+        match is scored.
+        """
+        query_key = encode_key(query.lower())
+        store = self.store
+        keys = self.keys if store is None else lambda batch: self.store_keys(store, batch)
+        encoded = array("Q")
+        top = []
+        batch_start = 0
+        while batch_start < len(matches):
+            if cancel is not None and cancel.is_set():
+                return None
+            batch_end = min(batch_start + (self.NARROW_BATCH if batch_start else RANK_FIRST_BATCH), len(matches))
+            batch = matches[batch_start:batch_end]
+            scored = [((SCORE_BIAS - fuzzy_score(query_key, key)) << 32) | index
+                      for index, key in zip(batch, keys(batch))]
+            encoded.extend(scored)
+            # 上位 k 件は直前の上位とこのバッチだけから選び直す
+            top = heapq.nsmallest(k, chain(top, scored))
+            batch_start = batch_end
+            if on_partial is not None and batch_end < len(matches):
+                on_partial(top)
+        return encoded, top
+
+    def keys(self, indices):
+        """Yield the lower-cased key bytes for sorted ``indices``."""
+        chunks = self.chunks
+        chunk_bases = [chunk[0] for chunk in chunks]
+        limit = 0
+        for index in indices:
+            if index >= limit:
+                base, data, starts = chunks[bisect_right(chunk_bases, index) - 1]
+                limit = base + len(starts)
+            local = index - base
+            end = starts[local + 1] if local + 1 < len(starts) else len(data)
+            yield data[starts[local]:end - 1]
+
+    @staticmethod
+    def store_keys(store: "ResultStore", indices):
+        """Yield lower-cased key bytes for ``indices``, decoded from the store's buffer."""
+        ends, data = store.offsets(), store.buffer()
+        for index in indices:
+            key = str(data[ends[index - 1] if index else 0:ends[index] - 1], "utf-8", "replace")
+            yield encode_key(key.lower())
+
+# --- 正規表現 / glob による絞り込み (大きな結果はプロセスに分担させる) ---
+FILTER_MODES = ("fuzzy", "regex", "glob")
+PARALLEL_FILTER_MIN = 250_000  # これより少ない件数はプロセスを使わずその場で照合する
+FILTER_SHARD_MIN = 1 << 16     # 1 つのプロセスに渡す最小の件数
+MAX_FILTER_WORKERS = 8
+
+def glob_regex(pattern: str) -> str:
+    """Regex source for a glob: ``*`` and ``?`` stay within one path component, ``**`` crosses them
+    (``a/**/b`` also matches ``a/b``).
+
+    A glob without a path separator is matched against the last component
+    only (like fd's ``--glob``); directories may end in a separator.
+    """
+    separators = re.escape("/" + os.sep if os.sep != "/" else "/")
+    parts = []
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if pattern.startswith("**", i):
+            # "a/**/b" は a/b にも一致する (途中のフォルダが 0 個)
+            if pattern[i + 2:i + 3] in ("/", os.sep):
+                parts.append(f"(?:.*[{separators}])?")
+                i += 3
+            else:
+                parts.append(".*")
+                i += 2
+            continue
+        if ch == "*":
+            parts.append(f"[^{separators}]*")
+        elif ch == "?":
+            parts.append(f"[^{separators}]")
+        elif ch == "[" and (end := pattern.find("]", i + 2)) >= 0:
+            body = pattern[i + 1:end]
+            negate = body.startswith("!")
+            body = body[negate:].replace("\\", "\\\\").replace("^", "\\^")
+            parts.append("[" + "^" * negate + body + "]")
+            i = end + 1
+            continue
+        else:
+            parts.append(re.escape(ch))
+        i += 1
+    prefix = "" if "/" in pattern or os.sep in pattern else f"(?:.*[{separators}])?"
+    return f"(?s:{prefix}{''.join(parts)})[{separators}]?\\Z"
+
+def compile_pattern(mode: str, query: str):
+    """The per-path test for ``query``: a regex searched anywhere in the path, or a glob (see
+    ``glob_regex``). Case-insensitive like the fuzzy filter; raises ``re.error`` for an invalid regex.
+    """
+    if mode == "regex":
+        return re.compile(query, re.IGNORECASE).search
+    if mode == "glob":
+        return re.compile(glob_regex(query), re.IGNORECASE).match
+    raise ValueError(f"unknown filter mode: {mode}")
+
+def scan_paths(data, ends, lo: int, hi: int, test) -> array:
+    """Indices ``lo``..``hi`` of the NUL-terminated paths in ``data`` for which ``test(path)`` is true."""
+    if lo >= hi:
+        return array("Q")
+    text = str(data[ends[lo - 1] if lo else 0:ends[hi - 1] - 1], "utf-8", "surrogateescape")
+    return array("Q", [lo + i for i, path in enumerate(text.split("\0")) if test(path)])
+
+_worker_segment = None  # プロセス側: 最後に開いた共有メモリ (名前, SharedMemory)
+_worker_tests = {}      # プロセス側: コンパイル済みのパターン
+
+def match_shard(segment: str, count: int, mode: str, query: str, lo: int, hi: int) -> bytes:
+    """Process-pool worker: match paths ``lo``..``hi`` of the shared segment; returns the hits as array bytes."""
+    global _worker_segment
+    if _worker_segment is None or _worker_segment[0] != segment:
+        from multiprocessing import shared_memory
+        if _worker_segment is not None:
+            _worker_segment[1].close()
+        _worker_segment = (segment, shared_memory.SharedMemory(name=segment))
+    if (mode, query) not in _worker_tests:
+        _worker_tests.clear()
+        _worker_tests[mode, query] = compile_pattern(mode, query)
+    buf = _worker_segment[1].buf
+    ends = buf[:count * 8].cast("Q")
+    try:
+        return scan_paths(buf[count * 8:], ends, lo, hi, _worker_tests[mode, query]).tobytes()
+    finally:
+        ends.release()
+
+class SharedPaths:
+    """A copy of the first ``count`` paths of a ``ResultStore`` in shared memory, for ``match_shard``.
+
+    The offsets come first, then the path bytes, so a worker attaches by
+    name and reads both without anything being pickled per query.
+    """
+
+    def __init__(self, store: "ResultStore"):
+        from multiprocessing import shared_memory
+        self.count = len(store)
+        offsets = store.offsets()[:self.count].tobytes()
+        size = store.offsets()[self.count - 1] if self.count else 0
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, len(offsets) + size))
+        self.shm.buf[:len(offsets)] = offsets
+        self.shm.buf[len(offsets):len(offsets) + size] = store.buffer()[:size]
+        self.name = self.shm.name
+
+    def close(self):
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+class PatternFilter:
+    """Regex and glob filtering over a ``ResultStore``, keeping the results in their original order.
+
+    The pattern is compiled once per query. Up to ``parallel_min`` paths
+    are matched right here; larger sets are split into shards matched by a
+    pool of processes that read the paths from shared memory (copied once
+    per result set, see ``SharedPaths``), and the shards are merged back in
+    order. Like ``FuzzyFilter``, repeating the last query only matches the
+    paths added since.
+    """
+
+    def __init__(self, workers: int | None = None, parallel_min: int = PARALLEL_FILTER_MIN):
+        self.workers = workers or min(os.cpu_count() or 1, MAX_FILTER_WORKERS)
+        self.parallel_min = parallel_min
+        self.lock = threading.Lock()
+        self.pool = None
+        self.shared = None
+        self.store = None
+        self.last = None  # (mode, query, matches, 照合済みの件数)
+
+    def use_store(self, store: "ResultStore"):
+        """Filter ``store`` from now on (a new result set)."""
+        with self.lock:
+            self.store = store
+            self.last = None
+            self.drop_shared()
+
+    def drop_shared(self):
+        if self.shared is not None:
+            self.shared.close()
+            self.shared = None
+
+    def filter(self, query: str, mode: str, cancel: threading.Event | None = None, on_chunk=None) -> array | None:
+        """Sorted indices of the paths matching ``query`` in ``mode`` ("regex" or "glob").
+
+        ``on_chunk`` receives the matches slice by slice, in order. Returns
+        None if ``cancel`` is set first; raises ``re.error`` for an invalid regex.
+        """
+        with self.lock:
+            store = self.store
+            if store is None:
+                return array("Q")
+            test = compile_pattern(mode, query)
+            count = len(store)
+            matches, lo = array("Q"), 0
+            if self.last is not None and self.last[:2] == (mode, query):
+                matches, lo = self.last[2][:], self.last[3]
+                if on_chunk is not None and matches:
+                    on_chunk(matches[:])
+            for part in self.shards(store, mode, query, test, lo, count):
+                if cancel is not None and cancel.is_set():
+                    return None
+                matches.extend(part)
+                if on_chunk is not None and part:
+                    on_chunk(part)
+            self.last = (mode, query, matches, count)
+            return matches
+
+    def shards(self, store: "ResultStore", mode: str, query: str, test, lo: int, hi: int):
+        """Yield the matches of ``lo``..``hi`` in order, from the process pool when it pays off."""
+        # ディスクへ移した結果は共有メモリへ複製しない (メモリに収まらない規模のため)
+        if hi - lo < self.parallel_min or self.workers < 2 or store.spilled:
+            yield from self.local_shards(store, test, lo, hi)
+            return
+        try:
+            if self.shared is None or self.shared.count < hi:
+                self.drop_shared()
+                self.shared = SharedPaths(store)
+            pool = self.executor()
+            step = max(FILTER_SHARD_MIN, -(-(hi - lo) // (self.workers * 4)))
+            futures = [pool.submit(match_shard, self.shared.name, self.shared.count, mode, query, start,
+                                   min(start + step, hi)) for start in range(lo, hi, step)]
+        except (OSError, RuntimeError) as e:
+            print(f"Falling back to in-process filtering: {e}", file=sys.stderr)
+            yield from self.local_shards(store, test, lo, hi)
+            return
+        try:
+            for future in futures:
+                yield array("Q", future.result())
+        finally:
+            for future in futures:
+                future.cancel()  # 途中で打ち切られた場合、まだ始まっていない分は捨てる
+
+    @staticmethod
+    def local_shards(store: "ResultStore", test, lo: int, hi: int):
+        data, ends = store.buffer(), store.offsets()
+        for start in range(lo, hi, FILTER_SHARD_MIN):
+            yield scan_paths(data, ends, start, min(start + FILTER_SHARD_MIN, hi), test)
+
+    def executor(self):
+        if self.pool is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # GUI のスレッドを抱えたまま fork しないよう、常に spawn で起動する
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self.pool
+
+    def close(self):
+        with self.lock:
+            self.drop_shared()
+            if self.pool is not None:
+                self.pool.shutdown(wait=False, cancel_futures=True)
+                self.pool = None
+
+# --- フォルダごとにまとめた結果 ---
+class TreeNode:
+    """One folder of a ``ResultTree``."""
+    __slots__ = ("name", "parent", "dirs", "files", "count", "index")
+
+    def __init__(self, name: str, parent: "TreeNode | None"):
+        self.name = name
+        self.parent = parent
+        self.dirs = {}            # 名前 -> TreeNode (最初に届いた順)
+        self.files = array("Q")   # このフォルダ直下の結果 (ストアの番号)
+        self.count = 0            # このフォルダ以下の結果の数
+        self.index = -1           # フォルダ自体も結果ならその番号
+
+    def path(self) -> str:
+        """The folder's display path, ending in a separator ("" for the top)."""
+        names = []
+        node = self
+        while node.parent is not None:
+            names.append(node.name)
+            node = node.parent
+        return "".join(name + os.sep for name in reversed(names))
+
+class ResultTree:
+    """Results grouped by folder: a trie of the folders in their display paths.
+
+    Each folder name is kept once, in its node, however many results lie
+    under it; a result is just its store index in the ``files`` of its
+    folder (a result ending in a separator is a folder and marks its node
+    instead). ``add`` is called again as results stream in, and keeps
+    ``count`` of every folder current; the folders it touched collect in
+    ``changed`` until ``take_changes``.
+    """
+
+    def __init__(self, store: ResultStore):
+        self.store = store
+        self.root = TreeNode("", None)
+        self.changed = set()
+
+    def __len__(self) -> int:
+        return self.root.count
+
+    def child(self, node: TreeNode, name: str) -> TreeNode:
+        found = node.dirs.get(name)
+        if found is None:
+            found = node.dirs[name] = TreeNode(name, node)
+            self.changed.add(node)
+        return found
+
+    def folder(self, rel_dir: str) -> TreeNode:
+        node = self.root
+        for name in rel_dir.split(os.sep)[:-1]:
+            node = self.child(node, name)
+        return node
+
+    def add(self, indices, rels: list[str] | None = None):
+        """Add the results ``indices`` (with their ``rels`` when already at hand)."""
+        if rels is None:
+            rels = [self.store.rel(index) for index in indices]
+        sep = os.sep
+        added = {}
+        last_dir, node, files, run = "", self.root, self.root.files, 0
+        for index, rel in zip(indices, rels):
+            if rel.endswith(sep):
+                target = self.child(self.folder(rel[:rel.rfind(sep, 0, len(rel) - 1) + 1]), rel.rsplit(sep, 2)[-2])
+                target.index = index
+                added[target] = added.get(target, 0) + 1
+                continue
+            cut = rel.rfind(sep) + 1
+            # fd は同じフォルダの結果を続けて出すことが多いので、直前のフォルダを使い回す
+            if len(last_dir) != cut or not rel.startswith(last_dir):
+                if run:
+                    added[node] = added.get(node, 0) + run
+                last_dir = rel[:cut]
+                node = self.folder(last_dir)
+                files, run = node.files, 0
+            files.append(index)
+            run += 1
+        if run:
+            added[node] = added.get(node, 0) + run
+        # 件数はバッチごとにフォルダ単位でまとめて親へ伝える
+        changed = self.changed
+        for target, count in added.items():
+            while target is not None:
+                target.count += count
+                changed.add(target)
+                target = target.parent
+
+    def add_range(self, start: int, stop: int):
+        """Add the store's results ``start``..``stop`` (decoded in one go)."""
+        for lo in range(start, stop, CACHE_BATCH):
+            hi = min(lo + CACHE_BATCH, stop)
+            self.add(range(lo, hi), self.store.rels(lo, hi))
+
+    def take_changes(self) -> set:
+        """The folders whose count or subfolders changed since the last call."""
+        changed, self.changed = self.changed, set()
+        return changed
+
+    def absolute(self, node: TreeNode) -> str:
+        """Absolute path of the folder ``node``."""
+        rel = node.path()
+        tag, prefix = self.store.roots[match_root(self.store.roots, rel)]
+        return prefix + rel[len(tag):]
+
+# --- ファイル情報 (サイズ・更新日時・種類) ---
+STAT_BATCH = 256       # 1 つのジョブでまとめて stat するパスの数
+STAT_WORKERS = 8       # stat は I/O 待ちが主なので CPU 数より多めに並べる
+KIND_UNKNOWN, KIND_PENDING, KIND_FILE, KIND_DIR, KIND_OTHER, KIND_MISSING = range(6)
+SORT_COLUMNS = ("name", "size", "mtime", "type")
+
+def view_indices(view) -> array:
+    """The store indices of a result view (``ResultRows``, ``RankedResults``, ``PartialRanking`` or an array), in view order."""
+    if isinstance(view, ResultRows):
+        return array("Q", range(len(view)))
+    if isinstance(view, RankedResults):
+        # 順位はスコアの昇順 (全件をヒープで取り出すより一括の整列のほうが速い)
+        return array("Q", [value & INDEX_MASK for value in sorted(view.encoded)])
+    if isinstance(view, PartialRanking):
+        top = set(view.order)
+        return array("Q", view.order) + array("Q", [index for index in view.matches if index not in top])
+    return array("Q", view)
+
+class MetadataCache:
+    """Size, modification time and kind of the paths in a ``ResultStore``, looked up on demand.
+
+    Nothing is read until ``request`` asks for some indices (the rows on
+    screen and around them); those are stat-ed in batches on a thread pool
+    and ``on_ready()`` is called from a worker after each batch. Results
+    are kept in flat arrays indexed like the store, so a million rows cost
+    a few bytes each and sorting reads them without any per-row objects.
+    """
+
+    def __init__(self, store: ResultStore, on_ready=None, workers: int = STAT_WORKERS):
+        self.store = store
+        self.on_ready = on_ready
+        self.workers = workers
+        self.kinds = bytearray()   # KIND_*
+        self.sizes = array("q")    # バイト数 (フォルダと取得できなかったものは -1)
+        self.mtimes = array("q")   # 更新日時 (ミリ秒、取得できなかったものは -1)
+        self.lock = threading.Lock()
+        self.pool = None
+        self.closed = False
+
+    def executor(self):
+        with self.lock:
+            if self.pool is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="stat")
+            return self.pool
+
+    def grow(self):
+        # 呼び出し側でロックを取る。ストアに追加された分だけ未取得の枠を足す
+        missing = len(self.store) - len(self.kinds)
+        if missing > 0:
+            self.kinds.extend(bytes(missing))
+            self.sizes.extend([-1] * missing)
+            self.mtimes.extend([-1] * missing)
+
+    def get(self, index: int) -> tuple[int, int, int]:
+        """``(kind, size, mtime_ms)`` of ``index``; kind is ``KIND_UNKNOWN``/``KIND_PENDING`` until it is known."""
+        if index >= len(self.kinds):
+            return KIND_UNKNOWN, -1, -1
+        return self.kinds[index], self.sizes[index], self.mtimes[index]
+
+    def request(self, indices):
+        """Queue the indices that have not been looked up yet; returns at once."""
+        if self.closed:
+            return
+        with self.lock:
+            self.grow()
+            kinds = self.kinds
+            todo = [index for index in indices if kinds[index] == KIND_UNKNOWN]
+            for index in todo:
+                kinds[index] = KIND_PENDING
+        if todo:
+            pool = self.executor()
+            for start in range(0, len(todo), STAT_BATCH):
+                pool.submit(self.fetch, todo[start:start + STAT_BATCH])
+
+    def ensure(self, indices, cancel: threading.Event | None = None, progress=None) -> bool:
+        """Look up every one of ``indices`` that is not known yet and wait for them.
+
+        ``progress(fraction)`` is called between rounds of batches. Returns
+        False if ``cancel`` is set (or the cache closed) first.
+        """
+        with self.lock:
+            self.grow()
+            kinds = self.kinds
+            # 表示用に順番待ちのもの (KIND_PENDING) もここで引き受ける
+            todo = [index for index in indices if kinds[index] < KIND_FILE]
+        pool = self.executor()
+        step = STAT_BATCH * self.workers * 4
+        for start in range(0, len(todo), step):
+            if self.closed or (cancel is not None and cancel.is_set()):
+                return False
+            window = todo[start:start + step]
+            list(pool.map(self.fetch, [window[i:i + STAT_BATCH] for i in range(0, len(window), STAT_BATCH)]))
+            if progress is not None:
+                progress(min(start + step, len(todo)) / len(todo))
+        return not self.closed
+
+    def fetch(self, batch: list[int]):
+        """Worker thread: stat ``batch`` and record the results."""
+        store, kinds, sizes, mtimes = self.store, self.kinds, self.sizes, self.mtimes
+        for index in batch:
+            if self.closed:
+                return
+            try:
+                st = os.stat(store.absolute(index))
+            except (OSError, ValueError):
+                try:
+                    st = os.lstat(store.absolute(index))  # リンク切れのシンボリックリンクなど
+                except (OSError, ValueError):
+                    sizes[index], mtimes[index], kinds[index] = -1, -1, KIND_MISSING
+                    continue
+                kind = KIND_OTHER
+            else:
+                kind = KIND_DIR if S_ISDIR(st.st_mode) else KIND_FILE if S_ISREG(st.st_mode) else KIND_OTHER
+            sizes[index] = st.st_size if kind == KIND_FILE else -1
+            mtimes[index] = st.st_mtime_ns // 1_000_000
+            kinds[index] = kind  # 最後に書き、他のスレッドからは値がそろってから見えるようにする
+        if self.on_ready is not None and not self.closed:
+            self.on_ready()
+
+    @staticmethod
+    def type_key(kind: int, name: str) -> str:
+        # フォルダ、拡張子順のファイル、その他、存在しないものの順に並べる
+        if kind == KIND_DIR:
+            return "0"
+        if kind == KIND_FILE:
+            return "1" + os.path.splitext(name)[1].lower()
+        return "2" if kind == KIND_OTHER else "3"
+
+    def sort_order(self, column: str, indices: array, descending: bool = False,
+                   cancel: threading.Event | None = None, progress=None) -> array | None:
+        """``indices`` reordered by ``column`` (one of ``SORT_COLUMNS``); rows that tie keep their order.
+
+        Missing metadata is looked up first (see ``ensure``). The keys are
+        computed once per row; sizes and times are packed with the row's
+        position into plain ints so the sort compares ints only. Returns
+        None if ``cancel`` is set first.
+        """
+        if column not in SORT_COLUMNS:
+            raise ValueError(f"unknown sort column: {column}")
+        if column != "name" and not self.ensure(indices, cancel, progress):
+            return None
+        n = len(indices)
+        # 降順では位置も逆に数え、同じキーの行が元の順に残るようにする
+        ties = range(INDEX_MASK, INDEX_MASK - n, -1) if descending else range(n)
+        numeric = column in ("size", "mtime")
+        if numeric:
+            values = self.sizes if column == "size" else self.mtimes
+            keyed = [((values[index] + 1) << 32) | tie for index, tie in zip(indices, ties)]
+        else:
+            # 1 件ずつ取り出すより、ストアの該当範囲を一度にデコードするほうが速い
+            names = self.store.rels(0, max(indices, default=-1) + 1)
+            if column == "type":
+                kinds, type_key = self.kinds, self.type_key
+                keyed = [(type_key(kinds[index], names[index]), tie) for index, tie in zip(indices, ties)]
+            else:
+                keyed = [(names[index].lower(), tie) for index, tie in zip(indices, ties)]
+        if cancel is not None and cancel.is_set():
+            return None
+        keyed.sort(reverse=descending)
+        positions = (value & INDEX_MASK for value in keyed) if numeric else (tie for _, tie in keyed)
+        if descending:
+            positions = (INDEX_MASK - tie for tie in positions)
+        return array("Q", [indices[position] for position in positions])
+
+    def close(self):
+        """Stop looking anything up (pending batches are dropped)."""
+        self.closed = True
+        with self.lock:
+            if self.pool is not None:
+                self.pool.shutdown(wait=False, cancel_futures=True)
+
+# --- ファイルの中身の検索 ---
+CONTENT_MAX_BYTES = 64 << 20   # これより大きいファイルは中身を検索しない
+CONTENT_SNIFF_BYTES = 8192     # 先頭のこの範囲に NUL があればバイナリとみなして飛ばす
+CONTENT_MAX_HITS = 100         # 1 ファイルから報告する一致行の上限
+CONTENT_LINE_CHARS = 240       # 一致行として返す文字数の上限
+CONTENT_BATCH = 64             # 1 つのジョブで調べるファイルの数
+CONTENT_THREADS = 8            # 小さいファイルでは open と mmap の待ちが主なので CPU 数より多めに並べる
+CONTENT_PARALLEL_MIN = 4096    # これより少ない候補はプロセスを起動せずスレッドで調べる
+MAX_CONTENT_WORKERS = 8
+
+def content_pattern(text: str, case_sensitive: bool = False) -> re.Pattern:
+    """The bytes pattern for ``text`` matched literally (ignoring ASCII case unless ``case_sensitive``)."""
+    return re.compile(re.escape(text.encode("utf-8")), 0 if case_sensitive else re.IGNORECASE)
+
+def scan_lines(data, pattern: re.Pattern, max_hits: int) -> list[tuple[int, str]]:
+    """``(line_number, line)`` for the first ``max_hits`` lines of ``data`` that contain ``pattern``."""
+    hits = []
+    line_no, counted = 1, 0
+    match = pattern.search(data)
+    while match is not None and len(hits) < max_hits:
+        start = data.rfind(b"\n", 0, match.start()) + 1
+        end = data.find(b"\n", match.end())
+        if end < 0:
+            end = len(data)
+        line_no += data[counted:start].count(b"\n")
+        counted = start
+        # 長い行 (圧縮された JS など) は先頭だけをデコードする
+        line = data[start:min(end, start + CONTENT_LINE_CHARS * 4)]
+        hits.append((line_no, line.decode("utf-8", "replace").strip()[:CONTENT_LINE_CHARS]))
+        match = pattern.search(data, end + 1)
+    return hits
+
+def grep_file(path: str, pattern: re.Pattern, max_bytes: int = CONTENT_MAX_BYTES,
+              max_hits: int = CONTENT_MAX_HITS) -> list[tuple[int, str]]:
+    """Matching lines of the file at ``path`` (see ``scan_lines``), read through mmap.
+
+    Folders, special files, empty files, files over ``max_bytes``, binary
+    files (a NUL near the start) and unreadable files give no lines.
+    """
+    try:
+        # FIFO などを開くと止まるため、先に通常のファイルか確かめる
+        st = os.stat(path)
+        if not S_ISREG(st.st_mode) or not 0 < st.st_size <= max_bytes:
+            return []
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data.find(b"\0", 0, CONTENT_SNIFF_BYTES) >= 0:
+                return []
+            return scan_lines(data, pattern, max_hits)
+    except (OSError, ValueError):
+        return []
+
+def grep_batch(paths: list[str], text: str, case_sensitive: bool, max_bytes: int, max_hits: int) -> list[list]:
+    """Pool worker: the matching lines of each of ``paths``, in the same order."""
+    pattern = content_pattern(text, case_sensitive)  # re のキャッシュで 2 回目以降はコンパイルしない
+    return [grep_file(path, pattern, max_bytes, max_hits) for path in paths]
+
+def grep_paths(count: int, path_of, text: str, case_sensitive: bool = False, cancel: threading.Event | None = None,
+               progress=None, max_bytes: int = CONTENT_MAX_BYTES, max_hits: int = CONTENT_MAX_HITS,
+               workers: int | None = None):
+    """Yield ``(position, hits)`` for each file ``path_of(position)`` (0 <= position < ``count``) containing ``text``.
+
+    Files are read in batches on a bounded pool: threads for small sets,
+    spawned processes (``workers`` of them) from ``CONTENT_PARALLEL_MIN``
+    candidates on, so the scanning is not held back by the GIL. Only a few
+    batches per worker are in flight, and the files come out in
+    ``position`` order as soon as their batch is done. ``progress(done)``
+    is called after every batch; stops early once ``cancel`` is set.
+    """
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+    workers = workers or min(os.cpu_count() or 1, MAX_CONTENT_WORKERS)
+    pool = None
+    if count >= CONTENT_PARALLEL_MIN and workers > 1:
+        try:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        except (OSError, RuntimeError) as e:
+            print(f"Falling back to threads for content search: {e}", file=sys.stderr)
+    if pool is None:
+        workers = CONTENT_THREADS
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="grep")
+    args = (text, case_sensitive, max_bytes, max_hits)
+    pending = deque()
+    submitted = 0
+    try:
+        while submitted < count or pending:
+            while submitted < count and len(pending) < workers * 4:
+                positions = range(submitted, min(submitted + CONTENT_BATCH, count))
+                paths = [path_of(position) for position in positions]
+                pending.append((positions, paths, pool.submit(grep_batch, paths, *args)))
+                submitted = positions.stop
+            if cancel is not None and cancel.is_set():
+                return
+            positions, paths, future = pending[0]
+            try:
+                found = future.result()
+            except BrokenProcessPool as e:
+                # ワーカーが起動できない・落ちた場合は、残りをスレッドで調べ直す
+                print(f"Falling back to threads for content search: {e}", file=sys.stderr)
+                pool.shutdown(wait=False, cancel_futures=True)
+                workers = CONTENT_THREADS
+                pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="grep")
+                pending = deque((positions, paths, pool.submit(grep_batch, paths, *args))
+                                for positions, paths, _ in pending)
+                continue
+            pending.popleft()
+            for position, hits in zip(positions, found):
+                if hits:
+                    yield position, hits
+            if progress is not None:
+                progress(positions.stop)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+# --- 検索の段階ごとの計測 ---
+PERF_LOG_MB = 8              # 計測ログがこのサイズを超えたら .1 に回して新しく始める
+PERF_RATE_INTERVAL_S = 0.25  # 取り込み速度を記録する間隔
+ROOT_PHASES = ("spawn_s", "first_byte_s", "first_result_s")
+ROOT_TOTALS = ("read_s", "parse_s", "post_s")
+
+def duration_stats(seconds: list[float]) -> dict:
+    """Count, mean, 95th percentile and worst of ``seconds``, in milliseconds."""
+    if not seconds:
+        return {"count": 0}
+    ordered = sorted(seconds)
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p95_ms": round(ordered[max(0, -(-len(ordered) * 95 // 100) - 1)] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+class SearchProfile:
+    """Where the time of one result stream goes, in seconds since it started.
+
+    The engine times each root in ``stats[root]["phases"]`` (fd spawn, first
+    byte, and the time spent waiting for fd, parsing its output and handing
+    batches off). The consumer adds the rest: ``mark`` for one-off events
+    such as the first result shown, ``tick`` for every GUI update that
+    ingested results (which also samples the ingest rate), ``handoff`` for
+    the delay between a worker's wake-up and the update that served it, and
+    ``filtered`` for every filter query. ``record`` turns it all into one
+    JSON-ready log entry; no paths or keywords are kept, only their lengths.
+    """
+
+    def __init__(self, kind: str = "search"):
+        self.id = os.urandom(8).hex()
+        self.kind = kind
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.marks = {}
+        self.ticks = []
+        self.handoffs = []
+        self.rate = [(0.0, 0)]
+        self.filters = []
+
+    def now(self) -> float:
+        return time.perf_counter() - self.start
+
+    def mark(self, name: str):
+        """Record the first time ``name`` happened."""
+        self.marks.setdefault(name, self.now())
+
+    def tick(self, seconds: float, total: int):
+        self.ticks.append(seconds)
+        now = self.now()
+        if now - self.rate[-1][0] >= PERF_RATE_INTERVAL_S:
+            self.rate.append((round(now, 3), total))
+
+    def handoff(self, seconds: float):
+        self.handoffs.append(seconds)
+
+    def filtered(self, query: str, seconds: float, matches: int, total: int) -> dict:
+        entry = {"query_length": len(query), "ms": round(seconds * 1000, 3), "matches": matches, "results": total}
+        self.filters.append(entry)
+        return entry
+
+    def current_rate(self, total: int) -> float:
+        """Paths per second ingested since the last rate sample (or overall, early on)."""
+        since, count = self.rate[-1] if len(self.rate) > 1 else self.rate[0]
+        elapsed = self.now() - since
+        return (total - count) / elapsed if elapsed > 0 else 0.0
+
+    @staticmethod
+    def root_phases(stats: dict) -> list[dict]:
+        rows = []
+        for stat in stats.values():
+            phases = stat.get("phases", {})
+            row = {"source": stat.get("source"), "count": stat.get("count", 0), "elapsed_s": stat.get("elapsed"),
+                   "error": bool(stat.get("error"))}
+            row.update({name: phases[name] for name in ROOT_PHASES + ROOT_TOTALS if name in phases})
+            rows.append({key: round(value, 4) if isinstance(value, float) else value for key, value in row.items()})
+        return rows
+
+    def phases(self, stats: dict) -> dict:
+        """Search-wide phases: the earliest of each per-root event, the sum of each per-root total."""
+        roots = self.root_phases(stats)
+        phases = {}
+        for name in ROOT_PHASES:
+            values = [row[name] for row in roots if name in row]
+            if values:
+                phases[name] = min(values)
+        for name in ROOT_TOTALS:
+            values = [row[name] for row in roots if name in row]
+            if values:
+                phases[name] = round(sum(values), 4)
+        phases.update({f"{name}_s": round(value, 4) for name, value in self.marks.items()})
+        if self.ticks:
+            phases["gui_s"] = round(sum(self.ticks), 4)
+        return phases
+
+    def record(self, outcome: str, results: int, stats: dict, query: tuple | None = None) -> dict:
+        """The log entry for this stream; ``query`` is ``(keyword, type, hidden, case_sensitive, options)``.
+
+        Only the names of the fd options in use are logged, not their values.
+        """
+        elapsed = self.now()
+        entry = {
+            "event": "search",
+            "id": self.id,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+            "platform": platform.system(),
+            "kind": self.kind,
+            "outcome": outcome,
+            "roots": len(stats),
+            "results": results,
+            "elapsed_s": round(elapsed, 4),
+            "paths_per_s": round(results / elapsed) if elapsed > 0 else None,
+            "phases": self.phases(stats),
+            "ticks": duration_stats(self.ticks),
+            "handoff": duration_stats(self.handoffs),
+            "rate": [list(sample) for sample in self.rate[1:]],
+            "per_root": self.root_phases(stats),
+        }
+        if query is not None:
+            keyword, file_type, hidden, case_sensitive, options = query
+            entry["query"] = {"keyword_length": len(keyword), "type": file_type, "hidden": hidden,
+                              "case_sensitive": case_sensitive, "fd_options": active_fd_options(options)}
+        return entry
+
+class PerfLog:
+    """Append-only JSON Lines log of ``SearchProfile`` records, rotated to ``<file>.1`` past ``max_bytes``."""
+
+    def __init__(self, filepath: str, max_bytes: int = PERF_LOG_MB << 20):
+        self.filepath = filepath
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+
+    def append(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            try:
+                if os.path.exists(self.filepath) and os.path.getsize(self.filepath) > self.max_bytes:
+                    os.replace(self.filepath, self.filepath + ".1")
+                with open(self.filepath, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError as e:
+                print(f"Could not write performance log: {e}")
+
+# --- GUI を持たない検索エンジン ---
+class SearchError(Exception):
+    """A search that cannot start, e.g. no keyword or no fd executable."""
+
+# fd 自身に枝刈りさせるオプション (設定ファイルのプロファイルにもこの形で保存する)
+FD_OPTIONS = {
+    "threads": 0,          # 0: fd に任せる
+    "max_depth": 0,        # 0: 制限なし
+    "max_results": 0,      # 0: 制限なし (ルートごと)
+    "changed_within": "",  # 例: "2weeks", "1d", "2024-01-01"
+    "exclude": [],         # 除外する glob (一致したフォルダの中は走査しない)
+    "extensions": [],
+    "size": [],            # 例: ["+1m", "-10m"]
+    "fixed_strings": False,
+}
+INDEX_SAFE_OPTIONS = {"threads", "max_results", "fixed_strings"}  # インデックスからも同じ結果を返せるもの
+SIZE_PATTERN = re.compile(r"[+-]?\d+(b|[kmgt]i?)", re.IGNORECASE)
+
+def split_list(value) -> list[str]:
+    """A list option given as a list or as comma-separated text."""
+    items = value.split(",") if isinstance(value, str) else list(value or [])
+    return [str(item).strip() for item in items if str(item).strip()]
+
+def parse_fd_options(options: dict | None) -> dict:
+    """A validated copy of ``options`` with every key of ``FD_OPTIONS`` (defaults for the missing ones).
+
+    Numbers may be given as text and lists as comma-separated text, as
+    typed in the GUI. Raises ``SearchError`` for a value fd would reject.
+    """
+    options = options or {}
+    parsed = {}
+    for name, default in FD_OPTIONS.items():
+        value = options.get(name, default)
+        if isinstance(default, bool):
+            parsed[name] = bool(value)
+        elif isinstance(default, int):
+            try:
+                parsed[name] = int(value or 0)
+            except (TypeError, ValueError):
+                raise SearchError(f"{name} には整数を指定してください: {value}") from None
+            if parsed[name] < 0:
+                raise SearchError(f"{name} には 0 以上の値を指定してください: {value}")
+        elif isinstance(default, list):
+            parsed[name] = split_list(value)
+        else:
+            parsed[name] = str(value or "").strip()
+    parsed["extensions"] = [extension.lstrip(".") for extension in parsed["extensions"]]
+    for size in parsed["size"]:
+        if not SIZE_PATTERN.fullmatch(size):
+            raise SearchError(f"サイズの指定が正しくありません (例: +1m, -500k): {size}")
+    return parsed
+
+def active_fd_options(options: dict | None) -> list[str]:
+    """Names of the options in ``options`` that differ from ``FD_OPTIONS``."""
+    return [name for name, default in FD_OPTIONS.items() if options and options.get(name, default) != default]
+
+def fd_option_args(options: dict | None) -> list[str]:
+    """fd arguments for parsed ``options`` (see ``parse_fd_options``)."""
+    if not options:
+        return []
+    args = []
+    if options.get("threads"): args += ["--threads", str(options["threads"])]
+    if options.get("max_depth"): args += ["--max-depth", str(options["max_depth"])]
+    if options.get("max_results"): args += ["--max-results", str(options["max_results"])]
+    if options.get("changed_within"): args += ["--changed-within", options["changed_within"]]
+    for pattern in options.get("exclude", []): args += ["--exclude", pattern]
+    for extension in options.get("extensions", []): args += ["--extension", extension]
+    for size in options.get("size", []): args += ["--size", size]
+    if options.get("fixed_strings"): args.append("--fixed-strings")
+    return args
+
+def build_fd_command(fd_path: str, keyword: str, folder: str, file_type: str = "all",
+                     hidden: bool = False, case_sensitive: bool = False, options: dict | None = None) -> list[str]:
+    cmd = [fd_path, keyword, folder, "--absolute-path", "--print0"]
+    if file_type in ("f", "d"): cmd += ["-t", file_type]
+    if hidden: cmd.append("--hidden")
+    cmd.append("--case-sensitive" if case_sensitive else "--ignore-case")
+    return cmd + fd_option_args(options)
+
+def result_roots(roots: list[str]) -> list[list[str]]:
+    """``[tag, prefix]`` pairs for a ``ResultStore`` holding the results of ``roots``."""
+    return [[tag, os.path.join(os.path.abspath(root), "")] for root, tag in root_tags(roots).items()]
+
+REGEX_META = set(".^$*+?{}[]\\|()")
+
+def literal_refinement(previous: tuple, query: tuple) -> bool:
+    """True if ``query`` only narrows ``previous`` (both ``(keyword, type, hidden, case_sensitive, options)``).
+
+    That is the case when everything but the keyword is the same and both
+    keywords are plain text, the old one contained in the new one: every
+    name fd would match now was matched before, so the earlier results can
+    be filtered in memory (``refine_results``) instead of walking again.
+    """
+    old_keyword, *old_rest = previous
+    keyword, *rest = query
+    old_keyword, keyword = old_keyword.strip(), keyword.strip()
+    options = rest[-1] or {}
+    # 件数の上限で打ち切られた結果は、絞り込んでも fd の結果と一致しない
+    if old_rest != rest or options.get("max_results") or not old_keyword:
+        return False
+    if "/" in keyword or os.sep in keyword:
+        return False  # fd はパス区切りを含むパターンをエラーにする
+    if not options.get("fixed_strings") and REGEX_META & set(old_keyword + keyword):
+        return False
+    case_sensitive = rest[2]
+    return old_keyword in keyword if case_sensitive else old_keyword.lower() in keyword.lower()
+
+def refine_results(store: "ResultStore", keyword: str, case_sensitive: bool, cancel: threading.Event | None = None,
+                   batch: int = CACHE_BATCH):
+    """Yield ``(root_ids, rels)`` batches of the paths in ``store`` whose name contains ``keyword``.
+
+    The name is matched like fd matches it: the last path component only.
+    Each batch is decoded and searched as one string, so only the hits
+    cost Python work.
+    """
+    separators = re.escape("/" + os.sep if os.sep != "/" else "/")
+    # キーワードの後にパス区切りが現れず (末尾の区切りを除く) パスが終わる = 最後の要素に含まれる
+    tail = rf"[^\0{separators}]*[{separators}]?(?=\0|\Z)"
+    keyword = keyword.strip()
+    regex = re.compile(re.escape(keyword if case_sensitive else keyword.lower()) + tail)
+    # IGNORECASE の照合は遅いため、小文字にした文字列を大文字小文字を区別して探す
+    # (小文字化で長さが変わる文字を含むバッチだけ IGNORECASE に頼る)
+    fallback = re.compile(re.escape(keyword) + tail, re.IGNORECASE)
+    ends = store.offsets()
+    data = store.buffer()
+    for start in range(0, len(store), batch):
+        if cancel is not None and cancel.is_set():
+            return
+        stop = min(start + batch, len(store))
+        text = str(data[ends[start - 1] if start else 0:ends[stop - 1] - 1], "utf-8", "surrogateescape")
+        matches = regex.finditer(text)
+        if not case_sensitive:
+            folded = text.lower()
+            matches = regex.finditer(folded) if len(folded) == len(text) else fallback.finditer(text)
+        rels = []
+        for m in matches:
+            end = text.find("\0", m.end())
+            rels.append(text[text.rfind("\0", 0, m.start()) + 1:end if end >= 0 else len(text)])
+        root_ids = [match_root(store.roots, rel) for rel in rels] if len(store.roots) > 1 else 0
+        yield root_ids, rels
+
+class SearchEngine:
+    """Runs searches without any GUI.
+
+    Every root is searched by its own fd process on a bounded thread pool,
+    or answered from ``path_index`` / ``result_cache`` when possible. Results
+    are handed to ``on_paths(root_id, rels)`` from the worker threads as
+    they arrive, where ``root_id`` is the root's position in ``roots`` and
+    ``rels`` are its paths relative to the root (tagged with the root name
+    when there are several roots, see ``root_tags``).
+    """
+
+    def __init__(self, fd_path: str | None = None, result_cache: ResultCache | None = None,
+                 path_index: PathIndex | None = None, index_roots: list | None = None,
+                 cache_settings: dict | None = None):
+        self.fd_path = fd_path or fd_executable()
+        self.result_cache = result_cache
+        self.path_index = path_index
+        self.index_roots = index_roots if index_roots is not None else []
+        self.cache_settings = cache_settings if cache_settings is not None else {}
+        self.processes = set()
+
+    def cache_enabled_for(self, folder: str) -> bool:
+        """False if caching is off globally or ``folder`` is inside a root listed in ``disabled_roots``."""
+        if self.result_cache is None or not self.cache_settings.get('enabled', True):
+            return False
+        folder = os.path.normcase(os.path.abspath(folder))
+        for root in self.cache_settings.get('disabled_roots', []):
+            root = os.path.normcase(os.path.abspath(root))
+            if folder == root or folder.startswith(root.rstrip(os.sep) + os.sep):
+                return False
+        return True
+
+    def is_indexed_root(self, folder: str) -> bool:
+        folder = PathIndex.normalize(folder)
+        return any(PathIndex.normalize(root) == folder for root in self.index_roots)
+
+    def refresh_index(self, root: str):
+        try:
+            self.path_index.refresh(root)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Could not refresh index for {root}: {e}")
+
+    def stop(self):
+        """Kill every fd process this engine is running."""
+        for process in list(self.processes):
+            kill_process_tree(process)
+
+    def search(self, roots: list[str], keyword: str, file_type: str = "all", hidden: bool = False,
+               case_sensitive: bool = False, cancel: threading.Event | None = None,
+               on_paths=None, stats: dict | None = None, options: dict | None = None) -> dict:
+        """Search ``roots`` for ``keyword`` and return a summary once every root is done.
+
+        ``stats`` (root -> {"count", "elapsed", "error"}) is updated while the
+        search runs. ``options`` are fd's pruning options (see
+        ``FD_OPTIONS``). The summary lists how each root was answered
+        (``"indexed"``, ``"cached"``) and the per-root errors. Raises
+        ``SearchError`` if the search cannot start.
+        """
+        keyword = keyword.strip()
+        if not keyword:
+            raise SearchError("検索キーワードを入力してください。")
+        options = parse_fd_options(options)
+        if platform.system() == "Windows" and not os.path.isfile(self.fd_path):
+            raise SearchError(f"'{os.path.basename(self.fd_path)}' が見つかりません。")
+        cancel = cancel or threading.Event()
+        on_paths = on_paths or (lambda root_id, rels: None)
+        stats = {} if stats is None else stats
+        for root in roots:
+            stats.setdefault(root, {"count": 0, "elapsed": None, "error": None})
+
+        query = (keyword, file_type, hidden, case_sensitive, options)
+        # 複数ルートでは相対パスの先頭にルート名を付け、どのルートの結果か分かるようにする
+        tags = root_tags(roots)
+        if len(roots) == 1:
+            infos = [self.search_root(query, cancel, on_paths, 0, roots[0], "", stats[roots[0]])]
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=min(MAX_ROOT_WORKERS, len(roots))) as pool:
+                futures = [pool.submit(self.search_root, query, cancel, on_paths, root_id, root, tags[root], stats[root])
+                           for root_id, root in enumerate(roots)]
+                infos = [future.result() for future in futures]
+        errors = [f"{root}:\n{stat['error']}" for root, stat in stats.items() if stat["error"]]
+        return {"roots": infos, "errors": errors}
+
+    def iter_search(self, roots: list[str], keyword: str, file_type: str = "all", hidden: bool = False,
+                    case_sensitive: bool = False, cancel: threading.Event | None = None, stats: dict | None = None,
+                    options: dict | None = None):
+        """Generator form of ``search``: yields ``(root_id, rels)`` batches and returns the summary.
+
+        Closing the generator early cancels the search and kills its fd processes.
+        """
+        cancel = cancel or threading.Event()
+        batches = queue.SimpleQueue()
+        outcome = {}
+
+        def run():
+            try:
+                outcome["summary"] = self.search(roots, keyword, file_type, hidden, case_sensitive, cancel,
+                                                 on_paths=lambda root_id, rels: batches.put((root_id, rels)),
+                                                 stats=stats, options=options)
+            except BaseException as e:
+                outcome["error"] = e
+            finally:
+                batches.put(None)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        try:
+            while (batch := batches.get()) is not None:
+                yield batch
+        finally:
+            if "summary" not in outcome and "error" not in outcome:
+                cancel.set()
+                self.stop()
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["summary"]
+
+    def search_root(self, query: tuple, cancel: threading.Event, on_paths, root_id: int, folder: str,
+                    tag: str, stat: dict) -> dict:
+        """Pool worker: stream the results for one root; returns how it was answered."""
+        keyword, file_type, hidden, case_sensitive, options = query
+        started = time.perf_counter()
+        info = {"root": folder}
+        phases = stat.setdefault("phases", {})
+        phases.setdefault("post_s", 0.0)
+
+        def post(rels: list[str]):
+            t0 = time.perf_counter()
+            phases.setdefault("first_result_s", t0 - started)
+            stat["count"] += len(rels)
+            on_paths(root_id, [tag + rel for rel in rels] if tag else rels)
+            phases["post_s"] += time.perf_counter() - t0
+
+        try:
+            # インデックス化済みのルートは fd を起動せずインデックスから答え、裏で差分を反映する
+            # (インデックスでは再現できない枝刈りの指定があれば fd に任せる)
+            if (self.path_index is not None and self.is_indexed_root(folder)
+                    and set(active_fd_options(options)) <= INDEX_SAFE_OPTIONS
+                    and self.serve_from_index(cancel, folder, query, post, stat)):
+                info["indexed"] = True
+                stat["source"] = "indexed"
+                threading.Thread(target=self.refresh_index, args=(folder,), daemon=True).start()
+                return info
+
+            # 同じコマンドの結果がキャッシュにあり、フォルダが変わっていなければ fd を起動しない
+            cmd = build_fd_command(self.fd_path, keyword, folder, file_type, hidden, case_sensitive, options)
+            cache_key = tuple(cmd)
+            stamps = directory_stamps(folder) if self.cache_enabled_for(folder) else None
+            cached = self.result_cache.get(cache_key, stamps) if stamps is not None else None
+            if cached is not None:
+                for start in range(0, len(cached), CACHE_BATCH):
+                    post(cached[start:start + CACHE_BATCH])
+                info["cached"] = True
+                stat["source"] = "cached"
+                return info
+
+            stat["source"] = "fd"
+
+            results = self.run_fd(cancel, cmd, folder, post, stat,
+                                  collect_bytes=self.result_cache.max_bytes if stamps is not None else 0,
+                                  started=started)
+            if results is not None and stamps is not None and not cancel.is_set():
+                size = 2 * sum(map(len, results)) + RESULT_OVERHEAD_BYTES * len(results)
+                self.result_cache.put(cache_key, stamps, results, size)
+            return info
+        finally:
+            stat["elapsed"] = time.perf_counter() - started
+
+    def run_fd(self, cancel: threading.Event, cmd: list[str], folder: str, post, stat: dict,
+               collect_bytes: int = 0, started: float | None = None) -> list | None:
+        """Run one fd process and pass its batches of relative paths to ``post``.
+
+        Returns every relative path for the cache, or None on error or once
+        they would take more than ``collect_bytes``. The phase timings go to
+        ``stat["phases"]``, in seconds since ``started``: ``spawn_s`` and
+        ``first_byte_s``, plus the totals ``read_s`` (waiting for fd's walk)
+        and ``parse_s`` (decoding its output).
+        """
+        fd_path = cmd[0]
+        process = None
+        results = []
+        collected = 0
+        started = time.perf_counter() if started is None else started
+        phases = stat.setdefault("phases", {})
+        phases.update(read_s=0.0, parse_s=0.0)
+        try:
+            creation_flags = subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0
+            # bufsize=0: 届いた分だけ readinto で受け取り、最初の結果を待たせない
+            process = subprocess.Popen(
+                cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0,
+                creationflags=creation_flags, start_new_session=platform.system() != "Windows"
+            )
+            phases["spawn_s"] = time.perf_counter() - started
+            self.processes.add(process)
+            # stderr を別スレッドで読み切り、パイプ詰まりで fd が止まらないようにする
+            stderr_chunks = []
+            stderr_reader = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+            stderr_reader.start()
+            if cancel.is_set():
+                kill_process_tree(process)
+            prefix_length = None
+            for paths in iter_path_batches(process.stdout, timings=phases):
+                if cancel.is_set():
+                    break
+                t0 = time.perf_counter()
+                if prefix_length is None:
+                    phases["first_byte_s"] = t0 - started
+                    prefix_length = root_prefix_length(paths[0], folder) or 0
+                if prefix_length:
+                    rels = [path[prefix_length:] for path in paths]
+                else:
+                    rels = [os.path.relpath(path, folder) for path in paths]
+                phases["parse_s"] += time.perf_counter() - t0
+                if results is not None:
+                    collected += 2 * sum(map(len, rels)) + RESULT_OVERHEAD_BYTES * len(rels)
+                    # キャッシュに入りきらない結果は集めない (ディスクへ移す規模の検索でメモリを抱えない)
+                    if collected > collect_bytes:
+                        results = None
+                    else:
+                        results.extend(rels)
+                post(rels)
+            if cancel.is_set():
+                kill_process_tree(process)
+            process.wait()
+            stderr_reader.join()
+            stderr_output = b"".join(stderr_chunks).decode("utf-8", "ignore")
+            if not cancel.is_set() and process.returncode not in (0, 1) and stderr_output:
+                stat["error"] = f"fd 実行エラー:\n{stderr_output}"
+                return None
+            return results
+        except FileNotFoundError:
+            stat["error"] = f"'{os.path.basename(fd_path)}' が見つかりません。"
+        except Exception as e:
+            stat["error"] = f"予期せぬエラーが発生しました: {e}"
+        finally:
+            self.processes.discard(process)
+        return None
+
+    def serve_from_index(self, cancel: threading.Event, folder: str, query: tuple, post, stat: dict) -> bool:
+        """Answer one root from ``path_index``; False if it cannot, so fd runs instead."""
+        keyword, file_type, hidden, case_sensitive, options = query
+        if options["fixed_strings"]:
+            keyword = re.escape(keyword)
+        remaining = options["max_results"] or None
+        try:
+            if not self.path_index.is_ready(folder):
+                return False
+            batches = self.path_index.search(folder, keyword, file_type, hidden, case_sensitive)
+            if batches is None:
+                return False
+            for rels in batches:
+                if cancel.is_set():
+                    break
+                if remaining is not None:
+                    rels = rels[:remaining]
+                    remaining -= len(rels)
+                if rels:
+                    post(rels)
+                if remaining == 0:
+                    break
+        except sqlite3.Error as e:
+            stat["error"] = f"インデックスの読み込みに失敗しました: {e}"
+        return True
+
+# --- コマンドライン (main.py --headless) ---
+def load_settings(settings_file: str) -> dict:
+    if not os.path.exists(settings_file):
+        return {}
+    try:
+        with open(settings_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (IOError, json.JSONDecodeError) as e:
+        print(f"Could not load settings file: {e}", file=sys.stderr)
+        return {}
+
+def main(argv: list[str] | None = None) -> int:
+    """Search without the GUI and write the matching paths to stdout."""
+    import argparse
+    parser = argparse.ArgumentParser(prog="main.py --headless",
+                                     description="Search with fd and print the matching paths, without the GUI.")
+    parser.add_argument("--headless", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("keyword", help="fd search pattern (regular expression)")
+    parser.add_argument("roots", nargs="+", help=f"folders to search ('{ROOT_SEPARATOR}'-separated lists are accepted)")
+    parser.add_argument("-t", "--type", choices=("all", "f", "d"), help="all (default), files (f) or directories (d)")
+    parser.add_argument("-H", "--hidden", action="store_true", default=None, help="include hidden files")
+    parser.add_argument("-s", "--case-sensitive", action="store_true", default=None)
+    parser.add_argument("-f", "--filter", metavar="QUERY", help="fuzzy-filter the results and print them best match first")
+    parser.add_argument("--filter-mode", choices=FILTER_MODES, default="fuzzy",
+                        help="how --filter matches; regex and glob keep the order of the results")
+    parser.add_argument("-g", "--grep", metavar="TEXT",
+                        help="print the lines of the (filtered) files that contain TEXT, as PATH:LINE:TEXT")
+    parser.add_argument("-r", "--relative", action="store_true", help="print paths relative to their root")
+    parser.add_argument("-0", "--print0", action="store_true", help="separate paths with NUL instead of newline")
+    parser.add_argument("--no-index", action="store_true", help="always run fd, even for indexed roots")
+    pruning = parser.add_argument_group("fd options", "passed to fd so it skips what is not wanted while it walks")
+    pruning.add_argument("-p", "--profile", help="start from a search profile saved in settings.json")
+    pruning.add_argument("-F", "--fixed-strings", action="store_true", default=None,
+                         help="treat the keyword as a literal string instead of a regular expression")
+    pruning.add_argument("-e", "--extension", action="append", dest="extensions", metavar="EXT")
+    pruning.add_argument("-E", "--exclude", action="append", metavar="GLOB", help="skip matching files and folders")
+    pruning.add_argument("-d", "--max-depth", type=int, metavar="N")
+    pruning.add_argument("--max-results", type=int, metavar="N", help="stop after N results per root")
+    pruning.add_argument("--changed-within", metavar="WHEN", help="e.g. 2weeks, 1d, 2024-01-01")
+    pruning.add_argument("-S", "--size", action="append", metavar="SIZE", help="e.g. +1m, -500k")
+    pruning.add_argument("-j", "--threads", type=int, metavar="N", help="number of fd threads")
+    args = parser.parse_args(argv)
+
+    roots = [root for arg in args.roots for root in parse_roots(arg)]
+    missing = [root for root in roots if not os.path.isdir(root)]
+    if not roots or missing:
+        print("指定された検索フォルダは存在しません。" + "".join(f"\n{root}" for root in missing), file=sys.stderr)
+        return 2
+
+    settings = load_settings(resource_path('settings.json'))
+    options = {}
+    if args.profile is not None:
+        profiles = settings.get('profiles', {})
+        if args.profile not in profiles:
+            print(f"プロファイルが見つかりません: {args.profile}", file=sys.stderr)
+            return 2
+        options.update(profiles[args.profile])
+    # コマンドラインで指定した値がプロファイルより優先する
+    for name in (*FD_OPTIONS, "type", "hidden", "case_sensitive"):
+        if getattr(args, name, None) is not None:
+            options[name] = getattr(args, name)
+    file_type, hidden = options.get("type", "all"), bool(options.get("hidden"))
+    case_sensitive = bool(options.get("case_sensitive"))
+    try:
+        options = parse_fd_options(options)
+    except SearchError as e:
+        print(e, file=sys.stderr)
+        return 2
+    path_index = None if args.no_index else PathIndex(resource_path('index.db'), fd_executable())
+    engine = SearchEngine(path_index=path_index, index_roots=settings.get('index', {}).get('roots', []))
+    store = ResultStore(result_roots(roots))
+    fuzzy = FuzzyFilter() if args.filter is not None and args.filter_mode == "fuzzy" else None
+    patterns = PatternFilter() if args.filter is not None and fuzzy is None else None
+    out = sys.stdout.buffer
+    end = b"\0" if args.print0 else b"\n"
+
+    def write(paths: list[str]):
+        out.write(end.join(path.encode("utf-8", "surrogateescape") for path in paths) + end)
+
+    def path_of(index: int) -> str:
+        return store.rel(index) if args.relative else store.absolute(index)
+
+    batches = engine.iter_search(roots, args.keyword, file_type, hidden, case_sensitive, options=options)
+    try:
+        while True:
+            try:
+                root_id, rels = next(batches)
+            except StopIteration as stop:
+                summary = stop.value
+                break
+            if args.filter is not None or args.grep is not None:
+                store.extend(root_id, rels)
+                if fuzzy is not None:
+                    fuzzy.extend(rels)
+            elif args.relative:
+                write(rels)
+            else:
+                tag, prefix = store.roots[root_id]
+                write([prefix + rel[len(tag):] for rel in rels])
+        ordered = store.all_rows()
+        if fuzzy is not None:
+            matches = fuzzy.filter(args.filter)
+            ranked = fuzzy.rank(args.filter, matches) if matches else None
+            ordered = RankedResults(*ranked) if ranked else matches
+        elif patterns is not None:
+            patterns.use_store(store)
+            try:
+                ordered = patterns.filter(args.filter, args.filter_mode)
+            finally:
+                patterns.close()
+        if args.grep is not None:
+            found = grep_paths(len(ordered), lambda position: store.absolute(ordered[position]), args.grep,
+                               case_sensitive)
+            for position, hits in found:
+                path = path_of(ordered[position])
+                write([f"{path}:{line_no}:{line}" for line_no, line in hits])
+        elif args.filter is not None:
+            for start in range(0, len(ordered), CACHE_BATCH):
+                write([path_of(ordered[i]) for i in range(start, min(start + CACHE_BATCH, len(ordered)))])
+        out.flush()
+    except SearchError as e:
+        print(e, file=sys.stderr)
+        return 2
+    except re.error as e:
+        print(f"invalid pattern: {e}", file=sys.stderr)
+        return 2
+    except KeyboardInterrupt:
+        batches.close()
+        return 130
+    except BrokenPipeError:
+        # head などで出力先が閉じられた場合は静かに終わる
+        batches.close()
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    for error in summary["errors"]:
+        print(error, file=sys.stderr)
+    return 1 if summary["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,59 @@
+import time
+STARTUP_T0 = time.time()  # 起動時間の計測 (--startup-report) の基準
+import sys
+
+if __name__ == "__main__" and getattr(sys, "frozen", False):
+    # ビルドした exe が絞り込み用のワーカープロセスとして起動された場合は、ここで処理して終わる
+    import multiprocessing
+    multiprocessing.freeze_support()
+
+if __name__ == "__main__" and "--headless" in sys.argv[1:]:
+    # GUI を使わない実行では tkinter / ttkbootstrap を読み込まない (ディスプレイのないビルドサーバ向け)
+    from engine import main as headless_main
+    sys.exit(headless_main(sys.argv[1:]))
+
+if __name__ == "__main__" and "--startup-report" in sys.argv[1:]:
+    import json
+    import os
+    from startup import app_file, startup_report
+    command = [sys.executable] if getattr(sys, "frozen", False) else [sys.executable, os.path.abspath(__file__)]
+    report = startup_report(command + ["--new-instance"], app_file("startup_report.json"))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    sys.exit(1 if "error" in report else 0)
+
+if __name__ == "__main__" and not {"--new-instance", "--startup-probe"} & set(sys.argv[1:]):
+    # 起動済みのウィンドウがあれば引数を渡して終わる (tkinter を読み込む前に確かめる)
+    from startup import INSTANCE_FILE, app_file, hand_off
+    if hand_off(app_file(INSTANCE_FILE), sys.argv[1:]):
+        sys.exit(0)
+
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from tkinter import messagebox, font as tkfont
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 import subprocess
 import threading
 import os
 import platform
-import sys
-import time
 import json
+import sqlite3
+import re
+from array import array
 from collections import deque
 from datetime import datetime
+from itertools import islice
+
+from engine import (
+    FD_OPTIONS, HISTORY_BUDGET_MB, HISTORY_EXTENSION, INDEX_STARTUP_DELAY_MS, PERF_LOG_MB, SPILL_MB,
+    KIND_DIR, KIND_FILE, KIND_MISSING, KIND_OTHER,
+    FuzzyFilter, HistoryCatalog, MetadataCache, PartialRanking, PathIndex, PatternFilter, PerfLog, RankedResults,
+    ResultCache, ResultRows, ResultStore, ResultTree, SearchEngine, SearchError, SearchProfile,
+    ROOT_SEPARATOR, fd_executable, match_root, parse_roots, read_history, resource_path, result_roots, root_labels,
+    grep_paths, literal_refinement, parse_fd_options, refine_results, view_indices, write_history,
+)
+from startup import INSTANCE_FILE, InstanceServer, parse_gui_args
+
+STARTUP_MARKS = {"imports": time.time()}  # 起動の各段階に達した時刻 (--startup-report 用)
 
 # --- Language translations ---
 translations = {
@@ -25,20 +68,65 @@ translations = {
         'dir_only': 'Directories Only',
         'hidden': 'Hidden Files',
         'case_sensitive': 'Case Sensitive',
+        'fd_options': 'fd Options (applied while walking)',
+        'exclude': 'Exclude:',
+        'extensions': 'Extensions:',
+        'size': 'Size:',
+        'max_depth': 'Max depth:',
+        'max_results': 'Max results:',
+        'changed_within': 'Changed within:',
+        'threads': 'Threads:',
+        'fixed_strings': 'Literal keyword (no regex)',
+        'profile': 'Profile:',
+        'profile_save': 'Save',
+        'profile_delete': 'Delete',
         'start_search': 'Start Search',
+        'stop_search': 'Stop',
         'search_results': 'Search Results',
-        'fuzzy_filter': 'Fuzzy Filter:',
+        'fuzzy_filter': 'Filter:',
+        'filter_fuzzy': 'Fuzzy',
+        'filter_regex': 'Regex',
+        'filter_glob': 'Glob',
+        'content_search': 'Contains text:',
+        'content_search_start': 'Search Contents',
+        'content_files': 'files',
         'status_ready': 'Please enter folder and keyword',
         'status_searching': '🔍 Searching...',
         'status_done': '✅ Search complete',
+        'status_stopped': '⏹ Search stopped',
+        'cached': 'cached',
+        'indexed': 'index',
+        'refined': 'refined',
+        'live_search': 'Search as you type',
+        'menu_index': 'Index',
+        'menu_index_add': 'Index this folder',
+        'menu_index_remove': 'Remove this folder from the index',
+        'status_indexing': '🗂 Indexing...',
+        'status_index_ready': '✅ Index ready',
         'status_no_results': 'No matching files found.',
         'context_open': 'Open location in Explorer',
         'context_copy': 'Copy path',
         'menu_file': 'File',
         'menu_exit': 'Exit',
+        'menu_perf_panel': 'Show performance stats',
+        'menu_details': 'Show size, date and type',
+        'menu_tree': 'Group by folder',
+        'column_hits': 'Hits',
+        'column_name': 'Name',
+        'column_size': 'Size',
+        'column_mtime': 'Modified',
+        'column_type': 'Type',
+        'type_folder': 'Folder',
+        'type_file': 'File',
+        'type_other': 'Other',
+        'status_sorting': '↕ Sorting...',
+        'status_content': '📄 Searching contents...',
         'menu_history': 'History',
         'menu_save_history': 'Save current search results',
         'menu_open_history': 'Open history file',
+        'menu_search_history': 'Search all saved results',
+        'menu_list_history': 'Saved searches...',
+        'menu_prune_history': 'Prune old history',
         'menu_theme': 'Theme',
         'menu_language': 'Language',
         'lang_en': 'English',
@@ -55,20 +143,65 @@ translations = {
         'dir_only': 'ディレクトリのみ',
         'hidden': '隠しファイル',
         'case_sensitive': '大文字/小文字を区別',
+        'fd_options': 'fd オプション (走査中に適用)',
+        'exclude': '除外:',
+        'extensions': '拡張子:',
+        'size': 'サイズ:',
+        'max_depth': '最大深さ:',
+        'max_results': '最大件数:',
+        'changed_within': '更新期間:',
+        'threads': 'スレッド数:',
+        'fixed_strings': 'キーワードを文字列として扱う (正規表現なし)',
+        'profile': 'プロファイル:',
+        'profile_save': '保存',
+        'profile_delete': '削除',
         'start_search': '検索開始',
+        'stop_search': '中止',
         'search_results': '検索結果',
-        'fuzzy_filter': 'あいまい検索で絞り込み:',
+        'fuzzy_filter': '結果を絞り込み:',
+        'filter_fuzzy': 'あいまい',
+        'filter_regex': '正規表現',
+        'filter_glob': 'glob',
+        'content_search': 'ファイルの中身:',
+        'content_search_start': '中身を検索',
+        'content_files': 'ファイル',
         'status_ready': 'フォルダとキーワードを入力してください',
         'status_searching': '🔍 検索中...',
         'status_done': '✅ 検索完了',
+        'status_stopped': '⏹ 検索を中止しました',
+        'cached': 'キャッシュ',
+        'indexed': 'インデックス',
+        'refined': '再絞り込み',
+        'live_search': '入力中に検索',
+        'menu_index': 'インデックス',
+        'menu_index_add': 'このフォルダをインデックス化',
+        'menu_index_remove': 'このフォルダをインデックスから削除',
+        'status_indexing': '🗂 インデックス作成中...',
+        'status_index_ready': '✅ インデックス作成完了',
         'status_no_results': '一致するファイルは見つかりませんでした。',
         'context_open': 'この場所をエクスプローラーで開く',
         'context_copy': 'パスをコピー',
         'menu_file': 'ファイル',
         'menu_exit': '終了',
+        'menu_perf_panel': 'パフォーマンス統計を表示',
+        'menu_details': 'サイズ・更新日時・種類を表示',
+        'menu_tree': 'フォルダごとに表示',
+        'column_hits': '件数',
+        'column_name': '名前',
+        'column_size': 'サイズ',
+        'column_mtime': '更新日時',
+        'column_type': '種類',
+        'type_folder': 'フォルダ',
+        'type_file': 'ファイル',
+        'type_other': 'その他',
+        'status_sorting': '↕ 並べ替え中...',
+        'status_content': '📄 中身を検索中...',
         'menu_history': '履歴',
         'menu_save_history': '現在の検索結果を保存',
         'menu_open_history': '履歴ファイルを開く',
+        'menu_search_history': '保存済みの結果をすべて検索',
+        'menu_list_history': '保存済みの検索一覧...',
+        'menu_prune_history': '古い履歴を整理',
         'menu_theme': 'テーマ切替',
         'menu_language': '言語',
         'lang_en': 'English',
@@ -76,35 +209,400 @@ translations = {
     }
 }
 
-# Utility function to resolve resource file paths depending on the execution environment.
-def resource_path(relative_path: str) -> str:
-    try:
-        base_path = sys._MEIPASS
-    except AttributeError:
-        base_path = os.path.abspath(".")
-    return os.path.join(base_path, relative_path)
+class VirtualListbox(tk.Canvas):
+    """Listbox-like widget that draws only the rows currently in view.
+
+    Rows are read by index from ``source`` (any sequence) through ``key``,
+    so the widget never holds a copy of the results and its cost does not
+    depend on how many rows there are. Optional extra columns (see
+    ``set_columns``) are drawn the same way, for the visible rows only.
+    """
+
+    def __init__(self, master, xscrollcommand=None, yscrollcommand=None, **kwargs):
+        super().__init__(master, highlightthickness=0, takefocus=1, **kwargs)
+        self.xscrollcommand = xscrollcommand
+        self.yscrollcommand = yscrollcommand
+        self.font = tkfont.nametofont("TkDefaultFont")
+        self.row_height = self.font.metrics("linespace") + 2
+        self.source = []
+        self.key = str
+        self.placeholder = ""
+        self.top = 0
+        self.x_offset = 0
+        self.content_width = 1
+        self.selected = None
+        self.redraw_job = None
+        self.fg, self.bg, self.select_fg, self.select_bg = "black", "white", "white", "#0078d7"
+        self.columns = []         # [(名前, 見出しを返す関数, 幅, anchor, セルの文字列を返す関数)]
+        self.header_height = 0
+        self.sort_indicator = None
+        self.on_header_click = None
+        self.on_rows_shown = None
+
+        self.bind("<Configure>", lambda e: self.refresh())
+        self.bind("<Button-1>", self._on_click)
+        self.bind("<MouseWheel>", self._on_mousewheel)
+        self.bind("<Shift-MouseWheel>", self._on_shift_mousewheel)
+        self.bind("<Button-4>", lambda e: self.yview_scroll(-3, "units"))
+        self.bind("<Button-5>", lambda e: self.yview_scroll(3, "units"))
+        self.bind("<Up>", lambda e: self._move_selection(-1))
+        self.bind("<Down>", lambda e: self._move_selection(1))
+        self.bind("<Prior>", lambda e: self._move_selection(-self.visible_rows()))
+        self.bind("<Next>", lambda e: self._move_selection(self.visible_rows()))
+        self.bind("<Home>", lambda e: self._move_selection(-self.size()))
+        self.bind("<End>", lambda e: self._move_selection(self.size()))
+
+    # --- データソース ---
+    def set_source(self, source, key=str, keep_position: bool = False):
+        """Display ``source`` from the top (or where the view is, with ``keep_position``), rendering each row with ``key``."""
+        self.source = source
+        self.key = key
+        self.placeholder = ""
+        if not keep_position:
+            self.top = 0
+            self.x_offset = 0
+            self.content_width = 1
+        self.selected = None  # 行が並べ替わるため、同じ位置を選んだままにしない
+        self.refresh()
+
+    def set_placeholder(self, text: str):
+        """Show ``text`` in place of the rows while the source is empty."""
+        self.placeholder = text
+        self.refresh()
+
+    def set_columns(self, columns: list, on_header_click=None, on_rows_shown=None):
+        """Draw ``columns`` under a header row; an empty list goes back to a plain list.
+
+        Each column is ``(name, title, width, anchor, text)``. The first one
+        is the row text itself and takes the remaining width (its width and
+        ``text`` are ignored); the others are ``width`` pixels wide at the
+        right and show ``text(item)`` for each row of the source.
+        ``title()`` is read at every redraw. ``on_header_click(name)`` is
+        called for a click on a header and ``on_rows_shown(first, last)``
+        after every redraw with the range of rows on screen.
+        """
+        self.columns = columns
+        self.header_height = self.row_height if columns else 0
+        self.on_header_click = on_header_click
+        self.on_rows_shown = on_rows_shown
+        self.refresh()
+
+    def set_sort_indicator(self, name: str | None, descending: bool = False):
+        """Mark the header of column ``name`` with the sort direction (None clears it)."""
+        self.sort_indicator = (name, descending) if name else None
+        self.refresh()
+
+    def set_colors(self, fg: str, bg: str, select_fg: str, select_bg: str):
+        self.fg, self.bg, self.select_fg, self.select_bg = fg, bg, select_fg, select_bg
+        self.configure(background=bg)
+        self.refresh()
+
+    def refresh(self):
+        """Schedule a redraw; cheap to call after every change to the source."""
+        if self.redraw_job is None:
+            self.redraw_job = self.after_idle(self._redraw)
+
+    # --- Listbox 互換 API ---
+    def size(self) -> int:
+        return len(self.source)
+
+    def visible_rows(self) -> int:
+        return max(1, (self.winfo_height() - self.header_height) // self.row_height)
+
+    def nearest(self, y: int) -> int:
+        if not self.size():
+            return -1
+        return min(self.top + max(0, y - self.header_height) // self.row_height, self.size() - 1)
+
+    def curselection(self) -> tuple:
+        if self.selected is None or self.selected >= self.size():
+            return ()
+        return (self.selected,)
+
+    def selection_includes(self, index: int) -> bool:
+        return self.selected == index
+
+    def selection_clear(self, first=0, last=None):
+        self.selected = None
+        self.refresh()
+
+    def selection_set(self, index: int):
+        if 0 <= index < self.size():
+            self.selected = index
+            self.refresh()
+
+    def activate(self, index: int):
+        self.see(index)
+
+    def see(self, index: int):
+        rows = self.visible_rows()
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + rows:
+            self.top = index - rows + 1
+        self.refresh()
+
+    def yview(self, *args):
+        n = self.size()
+        rows = self.visible_rows()
+        if not args:
+            if not n:
+                return (0.0, 1.0)
+            return (self.top / n, min(1.0, (self.top + rows) / n))
+        if args[0] == "moveto":
+            self._scroll_to(int(float(args[1]) * n))
+        elif args[0] == "scroll":
+            self.yview_scroll(int(args[1]), args[2])
+
+    def yview_scroll(self, number: int, what: str):
+        step = self.visible_rows() if what == "pages" else 1
+        self._scroll_to(self.top + number * step)
+
+    def xview(self, *args):
+        width = max(1, self.winfo_width())
+        if not args:
+            return (self.x_offset / self.content_width, min(1.0, (self.x_offset + width) / self.content_width))
+        if args[0] == "moveto":
+            offset = int(float(args[1]) * self.content_width)
+        else:
+            step = width if args[2] == "pages" else self.font.measure("0") * 4
+            offset = self.x_offset + int(args[1]) * step
+        self.x_offset = max(0, min(offset, self.content_width - width))
+        self.refresh()
+
+    # --- 描画 ---
+    def _scroll_to(self, top: int):
+        self.top = max(0, min(top, self.size() - self.visible_rows()))
+        self.refresh()
+
+    def _redraw(self):
+        self.redraw_job = None
+        self.delete("all")
+        n = self.size()
+        rows = self.visible_rows()
+        self.top = max(0, min(self.top, n - rows))
+        width = self.winfo_width()
+        extra = self.columns[1:]
+        name_width = width - sum(column[2] for column in extra)
+        if not n and self.placeholder:
+            self.create_text(2, self.header_height + 1, anchor=NW, text=self.placeholder, font=self.font, fill=self.fg)
+        last = min(n, self.top + rows + 1)
+        for index in range(self.top, last):
+            y = self.header_height + (index - self.top) * self.row_height
+            item = self.source[index]
+            text = self.key(item)
+            fill, background = self.fg, self.bg
+            if index == self.selected:
+                self.create_rectangle(0, y, width, y + self.row_height, fill=self.select_bg, width=0)
+                fill, background = self.select_fg, self.select_bg
+            self.create_text(2 - self.x_offset, y + 1, anchor=NW, text=text, font=self.font, fill=fill)
+            self.content_width = max(self.content_width, self.font.measure(text) + 4 + width - name_width)
+            if extra:
+                # 長いパスが右の列に重ならないよう、列の部分を背景色で塗ってから描く
+                self.create_rectangle(name_width, y, width, y + self.row_height, fill=background, width=0)
+                x = name_width
+                for _, _, column_width, anchor, cell in extra:
+                    tx = x + column_width - 6 if anchor == NE else x + 6
+                    self.create_text(tx, y + 1, anchor=anchor, text=cell(item), font=self.font, fill=fill)
+                    x += column_width
+        if self.columns:
+            self._draw_header(width, name_width)
+            if self.on_rows_shown is not None and n:
+                self.on_rows_shown(self.top, last)
+        if self.yscrollcommand:
+            self.yscrollcommand(*self.yview())
+        if self.xscrollcommand:
+            self.xscrollcommand(*self.xview())
+
+    def _draw_header(self, width: int, name_width: int):
+        self.create_rectangle(0, 0, width, self.header_height, fill=self.bg, width=0)
+        self.create_line(0, self.header_height - 1, width, self.header_height - 1, fill=self.fg)
+        x = 0
+        for name, title, column_width, anchor, _ in self.columns:
+            text = title()
+            if self.sort_indicator and self.sort_indicator[0] == name:
+                text += " ▼" if self.sort_indicator[1] else " ▲"
+            if column_width is None:
+                column_width = name_width
+                self.create_text(2, 1, anchor=NW, text=text, font=self.font, fill=self.fg)
+            else:
+                tx = x + column_width - 6 if anchor == NE else x + 6
+                self.create_text(tx, 1, anchor=anchor, text=text, font=self.font, fill=self.fg)
+                self.create_line(x, 2, x, self.header_height - 3, fill=self.fg)
+            x += column_width
+
+    def header_at(self, x: int) -> str | None:
+        """Name of the column whose header is at ``x``."""
+        right = self.winfo_width()
+        for name, _, column_width, _, _ in reversed(self.columns[1:]):
+            right -= column_width
+            if x >= right:
+                return name
+        return self.columns[0][0] if self.columns else None
+
+    # --- イベント処理 ---
+    def _on_click(self, event):
+        self.focus_set()
+        if event.y < self.header_height:
+            name = self.header_at(event.x)
+            if name is not None and self.on_header_click is not None:
+                self.on_header_click(name)
+            return
+        index = self.nearest(event.y)
+        if index >= 0:
+            self.selection_set(index)
+            self.event_generate("<<ListboxSelect>>")
+
+    def _wheel_units(self, event) -> int:
+        # Windows は 120 単位、macOS は 1 単位で delta が届く
+        if platform.system() == "Windows":
+            return -3 * (event.delta // 120)
+        return -event.delta
+
+    def _on_mousewheel(self, event):
+        self.yview_scroll(self._wheel_units(event), "units")
+
+    def _on_shift_mousewheel(self, event):
+        self.xview("scroll", self._wheel_units(event), "units")
+
+    def _move_selection(self, delta: int):
+        if not self.size():
+            return
+        current = self.selected if self.selected is not None else self.top - (delta > 0)
+        index = max(0, min(current + delta, self.size() - 1))
+        self.selection_set(index)
+        self.see(index)
+        self.event_generate("<<ListboxSelect>>")
+        return "break"
+
+FRAME_BUDGET_S = 0.008    # 1 回の GUI 更新で結果の取り込みに使う時間の上限
+INGEST_SLICE = 4096       # 1 度に取り込む結果の最大件数
+FALLBACK_POLL_MS = 250    # 通知が届かなかった場合に備えたポーリング間隔
+FILTER_DEBOUNCE_MS = 120  # 最後のキー入力から絞り込み開始までの待ち時間
+FILTER_POLL_MS = 15       # 絞り込みジョブの途中結果を画面へ反映する間隔
+LIVE_SEARCH_DEBOUNCE_MS = 300  # 入力中に検索する場合、最後のキー入力から検索開始までの待ち時間
+METADATA_PREFETCH_PAGES = 1  # 表示中の行の前後に先読みするファイル情報のページ数
+CONTENT_POST_LINES = 1024   # 中身の検索の一致行をまとめて画面へ送る件数
+TREE_PAGE_ROWS = 500        # フォルダごとの表示で、1 つのフォルダに一度に並べるファイルの数
+TREE_REFRESH_MS = 100       # 検索中にフォルダごとの件数と中身を更新する間隔
+CLOSE_POLL_MS = 50          # 終了時に読み込みスレッドの後始末を確かめる間隔
+CLOSE_WAIT_S = 2            # 終了時に読み込みスレッドを待つ最長の時間
+
+def format_size(size: int) -> str:
+    if size < 1024:
+        return f"{size} B"
+    for unit in ("KB", "MB", "GB", "TB"):
+        size /= 1024
+        if size < 1024 or unit == "TB":
+            return f"{size:.1f} {unit}"
 
 class FdSearchApp(ttk.Window):
     """Main window class for the fd command GUI wrapper application."""
 
-    def __init__(self):
+    def __init__(self, argv: list[str] | None = None):
+        """Show the folder and keyword boxes first, then build the rest of the window.
+
+        ``argv`` are the launch arguments: an optional folder and keyword,
+        and ``--startup-probe FILE`` to record the startup milestones and exit.
+        """
+        self.launch_args, self.startup_probe = parse_gui_args(argv or [])
         self.language = 'en'  # Default language
         self.settings_file = resource_path('settings.json')
         self.history_dir = resource_path('history')
         settings = self.load_settings()
         initial_theme = settings.get('theme', 'superhero')
+        self.cache_settings = settings.get('cache', {})
+        self.index_settings = settings.get('index', {})
+        self.history_settings = settings.get('history', {})
+        self.result_settings = settings.get('results', {})
+        self.perf_settings = settings.get('perf', {})
+        self.startup_settings = settings.get('startup', {})
+        self.profiles = settings.get('profiles', {})
 
         super().__init__(themename=initial_theme)
-        self.title(translations[self.language]['title'])
+        STARTUP_MARKS["window"] = time.time()
         self.geometry("800x750")
 
         # --- インスタンス変数 ---
-        self.search_process = None
+        self.localized = []  # 言語の切り替え時に付け直す (ラベルを設定する関数, 翻訳キー)
+        self.localize_with(self.title, 'title')
+        self.search_thread = None
+        self.search_cancel = threading.Event()
+        self.search_generation = 0
         self.results_queue = deque()
         self.update_job = None
+        self.results_wakeup_pending = False
         self.found_count = 0
-        self.all_results = []
-        self.displayed_results = []
+        self.root_stats = {}
+        self.results = ResultStore()
+        self.displayed_results = self.results.all_rows()
+        self.engine = SearchEngine(
+            result_cache=ResultCache(
+                max_bytes=int(self.cache_settings.get('max_mb', 256)) << 20,
+                ttl=float(self.cache_settings.get('ttl_seconds', 300)),
+            ),
+            path_index=PathIndex(resource_path('index.db'), fd_executable()),
+            index_roots=self.index_settings.setdefault('roots', []),
+            cache_settings=self.cache_settings,
+        )
+        self.history_catalog = HistoryCatalog(self.history_dir)
+        self.history_window = None
+        self.status_message = ""
+        self.filter_engine = FuzzyFilter()
+        self.pattern_filter = PatternFilter()
+        self.filter_mode_var = tk.StringVar(value=settings.get('filter_mode', 'fuzzy'))
+        self.filter_queue = deque()
+        self.filter_job = None
+        self.filter_update_job = None
+        self.filter_thread = None
+        self.filter_cancel = threading.Event()
+        self.filter_generation = 0
+        self.filter_replace_pending = False
+        self.filter_stale = False
+        self.shown_query = ""
+        self.search_running = False
+        self.profile = None
+        self.profile_query = None
+        self.results_wakeup_time = None
+        self.filter_started = None
+        self.perf_panel_updated = 0.0
+        self.perf_log = PerfLog(resource_path('perf.jsonl'),
+                                max_bytes=int(self.perf_settings.get('log_max_mb', PERF_LOG_MB)) << 20)
+        self.perf_panel_var = tk.BooleanVar(value=self.perf_settings.get('panel', False))
+        self.search_button = None
+        self.live_search_var = tk.BooleanVar(value=settings.get('live_search', False))
+        self.live_search_job = None
+        self.setting_keyword = False  # set_keyword による変更では入力中の検索を起こさない
+        self.stream_query = None  # 表示中の結果の (ルート, 検索条件)
+        self.refinable = None     # 完了した検索の (ルート, 検索条件)。キーワードを伸ばしただけなら再走査せず絞り込む
+        self.stream_live = False
+        self.details_var = tk.BooleanVar(value=self.result_settings.get('details', False))
+        self.metadata = None
+        self.content_lines = None  # 中身の検索結果では、結果と同じ順の (行番号, 行) のリスト
+        self.tree_var = tk.BooleanVar(value=self.result_settings.get('tree', False))
+        self.tree_widget = None
+        self.result_tree = None   # フォルダごとの表示中だけ作る ResultTree
+        self.tree_source = None   # result_tree の元の一覧 (displayed_results、順位付きの場合はその番号の配列)
+        self.tree_added = 0       # tree_source のうち result_tree に入れた件数
+        self.tree_open = {}       # 中身を表示したフォルダ -> [表示したフォルダ数, 表示したファイル数, ファイルの表示上限]
+        self.tree_nodes = {}      # Treeview の項目 ID -> TreeNode
+        self.tree_sync_job = None
+        self.metadata_wakeup_pending = False
+        self.sort_cancel = threading.Event()
+        self.sort_done = None
+        self.sorted_results = None
+        self.sort_state = None
+        self.instance_server = None
+        self.pending_launches = deque()
+
+        # --- 検索フォルダとキーワード欄を先に表示し、残りは描画の後で作る ---
+        self.main_frame = ttk.Frame(self, padding="10")
+        self.main_frame.pack(fill=BOTH, expand=True)
+        self.create_settings_widgets(self.main_frame)
+        self.folder_var.set(settings.get('folder', ''))
+        self.keyword_entry.focus_set()
+        self.update()
+        STARTUP_MARKS["first_paint"] = time.time()
 
         # --- ウィジェットの作成 ---
         self.set_icon()
@@ -114,6 +612,59 @@ class FdSearchApp(ttk.Window):
         # --- 設定の適用と終了処理 ---
         self.apply_settings(settings)
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
+        self.bind("<<ResultsReady>>", self.on_results_ready)
+        self.bind("<Escape>", self.stop_search)
+        self.bind("<<StatusMessage>>", lambda e: self.status_var.set(self.status_message))
+        self.bind("<<Launched>>", self.on_launched)
+        self.bind("<<MetadataReady>>", self.on_metadata_ready)
+        self.bind("<<SortReady>>", self.on_sort_ready)
+        self.apply_launch_args(self.launch_args, os.getcwd())
+        STARTUP_MARKS["ready"] = time.time()
+        if self.startup_probe:
+            self.write_startup_probe()
+            return
+        if self.startup_settings.get('single_instance', True):
+            self.instance_server = InstanceServer(resource_path(INSTANCE_FILE), self.notify_launch)
+            self.instance_server.start()
+        self.after(INDEX_STARTUP_DELAY_MS, self.refresh_indexes)
+        self.after(INDEX_STARTUP_DELAY_MS, lambda: threading.Thread(target=self.sync_history_catalog, daemon=True).start())
+
+    def write_startup_probe(self):
+        """``--startup-probe``: save the startup milestones for ``--startup-report`` and close."""
+        try:
+            with open(self.startup_probe, 'w', encoding='utf-8') as f:
+                json.dump({"started_at": STARTUP_T0, "marks": STARTUP_MARKS}, f)
+        except IOError as e:
+            print(f"Could not write startup probe: {e}")
+        self.after_idle(self.destroy)
+
+    def notify_launch(self, argv: list[str], cwd: str):
+        """Server thread: another launch handed over its arguments."""
+        self.pending_launches.append((argv, cwd))
+        try:
+            self.event_generate("<<Launched>>", when="tail")
+        except (tk.TclError, RuntimeError):
+            pass
+
+    def on_launched(self, event=None):
+        """Bring the window to the front for a launch that was handed over, and apply its arguments."""
+        while self.pending_launches:
+            argv, cwd = self.pending_launches.popleft()
+            self.apply_launch_args(parse_gui_args(argv)[0], cwd)
+        self.deiconify()
+        self.lift()
+        self.focus_force()
+        self.keyword_entry.focus_set()
+        self.keyword_entry.select_range(0, END)
+
+    def apply_launch_args(self, args: list[str], cwd: str):
+        """``[FOLDER] [KEYWORD]`` from the command line; with both, the search starts right away."""
+        if not args:
+            return
+        self.folder_var.set(ROOT_SEPARATOR.join(os.path.normpath(os.path.join(cwd, root)) for root in parse_roots(args[0])))
+        if len(args) > 1:
+            self.set_keyword(args[1])
+            self.start_search()
 
     def load_settings(self) -> dict:
         """Load application settings from the settings file (JSON)."""
@@ -134,6 +685,31 @@ class FdSearchApp(ttk.Window):
             'hidden': self.include_hidden_var.get(),
             'case_sensitive': self.case_sensitive_var.get(),
             'type': self.type_var.get(),
+            'live_search': self.live_search_var.get(),
+            'filter_mode': self.filter_mode_var.get(),
+            'fd_options': self.fd_options_form(),
+            'profile': self.profile_var.get(),
+            'profiles': self.profiles,
+            'cache': {
+                'enabled': self.cache_settings.get('enabled', True),
+                'max_mb': self.engine.result_cache.max_bytes >> 20,
+                'ttl_seconds': self.engine.result_cache.ttl,
+                'disabled_roots': self.cache_settings.get('disabled_roots', []),
+            },
+            'index': {'roots': self.index_settings.get('roots', [])},
+            'history': {'max_mb': self.history_settings.get('max_mb', HISTORY_BUDGET_MB)},
+            'results': {
+                'spill_mb': self.result_settings.get('spill_mb', SPILL_MB),
+                'spill_dir': self.result_settings.get('spill_dir', ''),
+                'details': self.details_var.get(),
+                'tree': self.tree_var.get(),
+            },
+            'startup': {'single_instance': self.startup_settings.get('single_instance', True)},
+            'perf': {
+                'log': self.perf_settings.get('log', True),
+                'log_max_mb': self.perf_log.max_bytes >> 20,
+                'panel': self.perf_panel_var.get(),
+            },
         }
         try:
             with open(self.settings_file, 'w', encoding='utf-8') as f:
@@ -146,10 +722,68 @@ class FdSearchApp(ttk.Window):
         self.include_hidden_var.set(settings.get('hidden', False))
         self.case_sensitive_var.set(settings.get('case_sensitive', False))
         self.type_var.set(settings.get('type', 'all'))
+        self.set_fd_options_form(settings.get('fd_options', {}))
+        self.profile_var.set(settings.get('profile', ''))
         self.on_keyword_change()
 
+    def add_index_root(self):
+        """Add the current folder to the index roots and crawl it in the background."""
+        folder = self.folder_var.get()
+        if not os.path.isdir(folder):
+            messagebox.showerror("エラー", "指定された検索フォルダは存在しません。")
+            return
+        if not self.engine.is_indexed_root(folder):
+            self.engine.index_roots.append(folder)
+        self.status_var.set(translations[self.language]['status_indexing'])
+        threading.Thread(target=self.build_index, args=(folder,), daemon=True).start()
+
+    def remove_index_root(self):
+        folder = PathIndex.normalize(self.folder_var.get())
+        roots = self.engine.index_roots
+        roots[:] = [root for root in roots if PathIndex.normalize(root) != folder]
+        threading.Thread(target=self.engine.path_index.remove, args=(self.folder_var.get(),), daemon=True).start()
+
+    def build_index(self, folder: str):
+        try:
+            self.engine.path_index.crawl(folder)
+            self.notify_status(f"{translations[self.language]['status_index_ready']}: {folder}")
+        except (OSError, sqlite3.Error) as e:
+            self.notify_status(f"❌ {e}")
+
+    def refresh_indexes(self):
+        """Refresh every configured index root on a background thread."""
+        roots = list(self.engine.index_roots)
+        if roots:
+            threading.Thread(target=lambda: [self.engine.refresh_index(root) for root in roots], daemon=True).start()
+
+    def notify_status(self, message: str):
+        """Worker thread: show ``message`` in the status bar."""
+        self.status_message = message
+        try:
+            self.event_generate("<<StatusMessage>>", when="tail")
+        except (tk.TclError, RuntimeError):
+            pass
+
     def on_closing(self):
         self.save_settings()
+        if self.instance_server is not None:
+            self.instance_server.close()
+        self.filter_cancel.set()
+        self.sort_cancel.set()
+        if self.metadata is not None:
+            self.metadata.close()
+        self.pattern_filter.close()
+        self.stop_search()
+        self.withdraw()
+        self.finish_closing(time.perf_counter() + CLOSE_WAIT_S)
+
+    def finish_closing(self, deadline: float):
+        """Destroy the window once the reader thread has cleaned up (or ``deadline`` passes)."""
+        # fd を孤児プロセスとして残さないよう後始末を待つ。join で止めると、読み込みスレッドの
+        # event_generate がイベントループを待ったままになるので、after で様子を見る
+        if self.search_thread is not None and self.search_thread.is_alive() and time.perf_counter() < deadline:
+            self.after(CLOSE_POLL_MS, self.finish_closing, deadline)
+            return
         self.destroy()
 
     def set_icon(self):
@@ -164,18 +798,24 @@ class FdSearchApp(ttk.Window):
     def create_context_menu(self):
         """Create the right-click context menu for result list."""
         self.context_menu = tk.Menu(self, tearoff=0)
-        self.context_menu.add_command(label=translations[self.language]['context_open'], command=self.open_file_location)
-        self.context_menu.add_command(label=translations[self.language]['context_copy'], command=self.copy_path_to_clipboard)
+        self.context_menu.add_command(command=self.open_file_location)
+        self.localize_entry(self.context_menu, 'context_open')
+        self.context_menu.add_command(command=self.copy_path_to_clipboard)
+        self.localize_entry(self.context_menu, 'context_copy')
 
     def create_widgets(self):
+        """Build the menu and everything below the keyword box (which is shown first, see ``__init__``)."""
         self.create_menu()
-        main_frame = ttk.Frame(self, padding="10")
-        main_frame.pack(fill=BOTH, expand=True)
-        self.create_settings_widgets(main_frame)
+        main_frame = self.main_frame
         self.create_options_widgets(main_frame)
-        self.search_button = ttk.Button(main_frame, text=translations[self.language]['start_search'], command=self.start_search, bootstyle=(SUCCESS, OUTLINE))
-        self.search_button.pack(fill=X, pady=10, ipady=5)
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(fill=X, pady=10)
+        self.search_button = ttk.Button(button_frame, command=self.start_search, bootstyle=(SUCCESS, OUTLINE))
+        self.localize(self.search_button, lambda: 'status_searching' if self.search_running else 'start_search')
+        self.search_button.pack(side=LEFT, fill=X, expand=True, ipady=5)
         self.search_button.config(state=DISABLED)
+        self.stop_button = self.localize(ttk.Button(button_frame, command=self.stop_search, bootstyle=(DANGER, OUTLINE), state=DISABLED), 'stop_search')
+        self.stop_button.pack(side=LEFT, padx=(10, 0), ipady=5)
         self.create_results_widgets(main_frame)
         self.create_statusbar()
 
@@ -185,56 +825,116 @@ class FdSearchApp(ttk.Window):
         self.config(menu=menubar)
 
         file_menu = ttk.Menu(menubar, tearoff=False)
-        file_menu.add_command(label=translations[self.language]['menu_exit'], command=self.on_closing)
-        menubar.add_cascade(label=translations[self.language]['menu_file'], menu=file_menu)
+        file_menu.add_checkbutton(variable=self.perf_panel_var, command=self.toggle_perf_panel)
+        self.localize_entry(file_menu, 'menu_perf_panel')
+        file_menu.add_checkbutton(variable=self.details_var, command=self.toggle_details)
+        self.localize_entry(file_menu, 'menu_details')
+        file_menu.add_checkbutton(variable=self.tree_var, command=self.toggle_tree)
+        self.localize_entry(file_menu, 'menu_tree')
+        file_menu.add_separator()
+        file_menu.add_command(command=self.on_closing)
+        self.localize_entry(file_menu, 'menu_exit')
+        menubar.add_cascade(menu=file_menu)
+        self.localize_entry(menubar, 'menu_file')
 
         self.history_menu = ttk.Menu(menubar, tearoff=False)
-        self.history_menu.add_command(label=translations[self.language]['menu_save_history'], command=self.save_history, state="disabled")
+        self.history_menu.add_command(command=self.save_history, state="disabled")
+        self.localize_entry(self.history_menu, 'menu_save_history')
         self.save_history_index = 0  # Save the index for later reference
-        self.history_menu.add_command(label=translations[self.language]['menu_open_history'], command=self.load_history)
-        menubar.add_cascade(label=translations[self.language]['menu_history'], menu=self.history_menu)
-
+        self.history_menu.add_command(command=self.load_history)
+        self.localize_entry(self.history_menu, 'menu_open_history')
+        self.history_menu.add_command(command=self.search_history)
+        self.localize_entry(self.history_menu, 'menu_search_history')
+        self.history_menu.add_command(command=self.show_history_runs)
+        self.localize_entry(self.history_menu, 'menu_list_history')
+        self.history_menu.add_separator()
+        self.history_menu.add_command(command=self.prune_history)
+        self.localize_entry(self.history_menu, 'menu_prune_history')
+        menubar.add_cascade(menu=self.history_menu)
+        self.localize_entry(menubar, 'menu_history')
+
+        index_menu = ttk.Menu(menubar, tearoff=False)
+        index_menu.add_command(command=self.add_index_root)
+        self.localize_entry(index_menu, 'menu_index_add')
+        index_menu.add_command(command=self.remove_index_root)
+        self.localize_entry(index_menu, 'menu_index_remove')
+        menubar.add_cascade(menu=index_menu)
+        self.localize_entry(menubar, 'menu_index')
+
+        # テーマ一覧は起動時には作らず、メニューを初めて開いた時に作る
         theme_menu = ttk.Menu(menubar, tearoff=False)
-        menubar.add_cascade(label=translations[self.language]['menu_theme'], menu=theme_menu)
-        for theme in self.style.theme_names():
-            theme_menu.add_radiobutton(label=theme, command=lambda t=theme: self.change_theme(t))
+        theme_menu.configure(postcommand=lambda: self.fill_theme_menu(theme_menu))
+        menubar.add_cascade(menu=theme_menu)
+        self.localize_entry(menubar, 'menu_theme')
 
         # Language menu
         lang_menu = ttk.Menu(menubar, tearoff=False)
         lang_menu.add_radiobutton(label=translations['en']['lang_en'], command=lambda: self.set_language('en'))
         lang_menu.add_radiobutton(label=translations['ja']['lang_ja'], command=lambda: self.set_language('ja'))
-        menubar.add_cascade(label=translations[self.language]['menu_language'], menu=lang_menu)
+        menubar.add_cascade(menu=lang_menu)
+        self.localize_entry(menubar, 'menu_language')
+
+    def fill_theme_menu(self, theme_menu):
+        if theme_menu.index("end") is not None:
+            return
+        for theme in self.style.theme_names():
+            theme_menu.add_radiobutton(label=theme, command=lambda t=theme: self.change_theme(t))
+
+    def localize_with(self, setter, key):
+        """Call ``setter(text)`` with the translation of ``key`` now and after every language switch.
+
+        ``key`` may also be a function returning the key, for labels that
+        depend on state (e.g. the search button while a search runs).
+        """
+        self.localized.append((setter, key))
+        setter(translations[self.language][key() if callable(key) else key])
+
+    def localize(self, widget, key, option: str = "text"):
+        """Label ``widget`` with ``key`` (see ``localize_with``); returns the widget."""
+        self.localize_with(lambda text: widget.configure(**{option: text}), key)
+        return widget
+
+    def localize_entry(self, menu, key):
+        """Label the entry just added to ``menu`` with ``key`` (see ``localize_with``)."""
+        index = menu.index("end")
+        self.localize_with(lambda text: menu.entryconfigure(index, label=text), key)
 
     def set_language(self, lang):
-        if lang not in translations:
+        if lang not in translations or lang == self.language:
             return
+        previous = translations[self.language]
         self.language = lang
-        self.update_language()
-
-    def update_language(self):
-        # --- Save current entry values ---
-        folder_value = self.folder_var.get() if hasattr(self, 'folder_var') else ''
-        keyword_value = self.keyword_var.get() if hasattr(self, 'keyword_var') else ''
-        # Update window title and all widget labels
-        self.title(translations[self.language]['title'])
-        # Re-create all widgets and menus
-        for widget in self.winfo_children():
-            widget.destroy()
-        self.create_context_menu()
-        self.create_widgets()
-        # --- Restore entry values ---
-        if hasattr(self, 'folder_var'):
-            self.folder_var.set(folder_value)
-        if hasattr(self, 'keyword_var'):
-            self.keyword_var.set(keyword_value)
+        self.update_language(previous)
+
+    def update_language(self, previous: dict | None = None):
+        """Relabel the registered widgets and menu entries in place.
+
+        Nothing is rebuilt, so the results, their scroll position and a
+        running search are kept. Status texts still showing a message of
+        the ``previous`` language are switched as well.
+        """
+        current = translations[self.language]
+        for setter, key in self.localized:
+            setter(current[key() if callable(key) else key])
+        self.result_listbox.refresh()  # 列の見出しと種類の表示は描画の度に翻訳を引く
+        if previous is None:
+            return
+        status = self.status_var.get()
+        for key in ('status_ready', 'status_searching', 'status_done', 'status_stopped',
+                    'status_indexing', 'status_index_ready', 'status_sorting', 'status_content'):
+            if status.startswith(previous[key]):
+                self.status_var.set(current[key] + status[len(previous[key]):])
+                break
+        if self.result_listbox.placeholder == previous['status_no_results']:
+            self.result_listbox.set_placeholder(current['status_no_results'])
 
     def save_history(self):
-        """Save the current search results to a history file (JSON)."""
-        if not self.all_results:
+        """Save the current search results to a compressed history file on a background thread."""
+        if not self.results:
             messagebox.showinfo("Info", "No search results to save.")
             return
 
-        history_data = {
+        header = {
             "saved_at": datetime.now().isoformat(),
             "search_folder": self.folder_var.get(),
             "keyword": self.keyword_var.get(),
@@ -243,158 +943,750 @@ class FdSearchApp(ttk.Window):
                 "hidden": self.include_hidden_var.get(),
                 "case_sensitive": self.case_sensitive_var.get(),
             },
-            "results": self.all_results
         }
 
         if not os.path.exists(self.history_dir):
             os.makedirs(self.history_dir)
 
-        filename = datetime.now().strftime("%Y-%m-%d_%H-%M-%S") + ".json"
+        filename = datetime.now().strftime("%Y-%m-%d_%H-%M-%S") + HISTORY_EXTENSION
         filepath = os.path.join(self.history_dir, filename)
+        # 次の検索は新しい ResultStore に書き込むため、このストアはそのまま読み出せる
+        store = self.results
 
-        try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(history_data, f, indent=4, ensure_ascii=False)
-            self.status_var.set(f"✅ History saved: {filename}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to save history: {e}")
-
-    def load_history(self):
-        """Load search results from a history file (JSON)."""
-        filepath = filedialog.askopenfilename(
-            title=translations[self.language]['menu_open_history'],
-            initialdir=self.history_dir,
-            filetypes=[("JSON files", "*.json")]
-        )
+        def write():
+            try:
+                write_history(filepath, header, store)
+                self.notify_status(f"✅ History saved: {filename}")
+            except Exception as e:
+                self.notify_status(f"❌ Failed to save history: {e}")
+                return
+            self.sync_history_catalog(prune=True)
+
+        threading.Thread(target=write, daemon=True).start()
+
+    def load_history(self, filepath: str | None = None):
+        """Load search results from a history file, streaming them into the result view."""
+        if filepath is None:
+            from tkinter import filedialog
+            filepath = filedialog.askopenfilename(
+                title=translations[self.language]['menu_open_history'],
+                initialdir=self.history_dir,
+                filetypes=[("History files", f"*{HISTORY_EXTENSION} *.json"), ("All files", "*.*")]
+            )
         if not filepath:
             return
 
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                history_data = json.load(f)
+            history_data, batches = read_history(filepath)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load history: {e}")
+            return
 
-            self.folder_var.set(history_data.get("search_folder", ""))
-            self.keyword_var.set(history_data.get("keyword", ""))
+        self.folder_var.set(history_data.get("search_folder", ""))
+        self.set_keyword(history_data.get("keyword", ""))
 
-            options = history_data.get("options", {})
-            self.type_var.set(options.get("type", "all"))
-            self.include_hidden_var.set(options.get("hidden", False))
-            self.case_sensitive_var.set(options.get("case_sensitive", False))
+        options = history_data.get("options", {})
+        self.type_var.set(options.get("type", "all"))
+        self.include_hidden_var.set(options.get("hidden", False))
+        self.case_sensitive_var.set(options.get("case_sensitive", False))
 
-            self.all_results = history_data.get("results", [])
-            self.displayed_results = self.all_results[:]
+        self.root_stats = {}
+        self.begin_results_stream(history_data["roots"], self.run_history_reader, batches, os.path.basename(filepath),
+                                  kind="history")
 
-            self.result_listbox.delete(0, "end")
-            relative_paths = [item[1] for item in self.all_results]
-            self.result_listbox.insert("end", *relative_paths)
+    def run_history_reader(self, generation: int, cancel: threading.Event, batches, filename: str):
+        """Reader thread: feed the batches of a history file into ``results_queue``."""
+        try:
+            for batch in batches:
+                if cancel.is_set():
+                    break
+                if batch[1]:
+                    self.post_result((generation, "paths", batch))
+        except Exception as e:
+            self.post_result((generation, "error", f"Failed to load history: {e}"))
+        finally:
+            batches.close()
+            self.post_result((generation, "done", {"history": filename}))
 
-            self.found_count = len(self.all_results)
-            self.found_count_var.set(f"{self.found_count} items")
-            self.time_var.set(f"(History: {os.path.basename(filepath)})")
+    def sync_history_catalog(self, prune: bool = False):
+        """Worker thread: catalog new history files and, if asked, enforce the disk budget."""
+        try:
+            if prune:
+                self.history_catalog.sync(index_paths=False)
+                max_bytes = int(self.history_settings.get('max_mb', HISTORY_BUDGET_MB)) << 20
+                removed = self.history_catalog.prune(max_bytes)
+                if removed:
+                    self.notify_status(f"🗑 History pruned: {len(removed)} files")
+            self.history_catalog.sync()
+        except (OSError, sqlite3.Error) as e:
+            print(f"Could not update history catalog: {e}")
+
+    def prune_history(self):
+        threading.Thread(target=self.sync_history_catalog, kwargs={"prune": True}, daemon=True).start()
+
+    def search_history(self):
+        """Search the paths of every saved run with the current keyword."""
+        keyword = self.keyword_var.get().strip()
+        if not keyword:
+            messagebox.showerror("エラー", "検索キーワードを入力してください。")
+            return
+        self.root_stats = {}
+        self.begin_results_stream(None, self.run_history_search, keyword, self.case_sensitive_var.get(),
+                                  kind="history_search")
 
-            self.status_var.set(f"✅ History loaded (Press Enter to filter results)")
-            self.filter_entry.focus_set()
-            self.history_menu.entryconfig(self.save_history_index, state="normal")
+    def run_history_search(self, generation: int, cancel: threading.Event, keyword: str, case_sensitive: bool):
+        """Reader thread: stream the matches from every saved run, each tagged with its file name."""
+        runs = []
+        try:
+            self.history_catalog.sync()
+            runs = self.history_catalog.runs()
+            # 結果の相対パスの先頭に履歴ファイル名を付ける (そのまま履歴として保存し直せる形)
+            tags = {}
+            result_roots = []
+            for run in runs:
+                run_tag = os.path.join(os.path.splitext(run["file"])[0], "")
+                tags[run["id"]] = (run_tag, len(result_roots), run["roots"])
+                result_roots += [[run_tag + tag, prefix] for tag, prefix in run["roots"]]
+            self.post_result((generation, "roots", result_roots))
+            batches = self.history_catalog.search(keyword, case_sensitive)
+            if batches is None:
+                self.post_result((generation, "error", f"正規表現が正しくありません: {keyword}"))
+                return
+            for rows in batches:
+                if cancel.is_set():
+                    break
+                root_ids, rels = [], []
+                for run_id, rel in rows:
+                    run_tag, first_root, roots = tags[run_id]
+                    root_ids.append(first_root + match_root(roots, rel))
+                    rels.append(run_tag + rel)
+                if rels:
+                    self.post_result((generation, "paths", (root_ids, rels)))
+        except (OSError, sqlite3.Error) as e:
+            self.post_result((generation, "error", f"履歴の検索に失敗しました: {e}"))
+        finally:
+            self.post_result((generation, "done", {"history": f"{len(runs)} runs"}))
 
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load history: {e}")
+    def show_history_runs(self):
+        """List the catalogued runs; double-click one to load it."""
+        if self.history_window is not None and self.history_window.winfo_exists():
+            self.history_window.lift()
+            return
+        window = self.history_window = ttk.Toplevel(self)
+        window.title(translations[self.language]['menu_list_history'])
+        window.geometry("760x360")
+        columns = ("saved_at", "search_folder", "keyword", "count", "size")
+        tree = ttk.Treeview(window, columns=columns, show="headings")
+        for column, width in zip(columns, (150, 300, 120, 80, 80)):
+            tree.heading(column, text=column)
+            tree.column(column, width=width, anchor=E if column in ("count", "size") else W)
+        scrollbar = ttk.Scrollbar(window, orient=VERTICAL, command=tree.yview, bootstyle="round")
+        tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=RIGHT, fill=Y)
+        tree.pack(fill=BOTH, expand=True)
+
+        def open_run(event=None):
+            selection = tree.selection()
+            if selection:
+                self.load_history(os.path.join(self.history_dir, selection[0]))
+
+        tree.bind("<Double-Button-1>", open_run)
+        # 一覧はカタログのヘッダ情報だけで作り、履歴ファイル本体は開かない
+        try:
+            runs = self.history_catalog.runs()
+        except sqlite3.Error as e:
+            messagebox.showerror("Error", f"Failed to read history catalog: {e}", parent=window)
+            runs = []
+        for run in runs:
+            tree.insert("", END, iid=run["file"], values=(
+                run["saved_at"][:19].replace("T", " "), run["search_folder"], run["keyword"],
+                run["count"], f"{(run['bytes'] or 0) / 1024:.0f} KB"))
 
     def create_settings_widgets(self, parent):
         settings_frame = ttk.Frame(parent)
         settings_frame.pack(fill=X, pady=(0, 10))
         settings_frame.columnconfigure(1, weight=1)
-        ttk.Label(settings_frame, text=translations[self.language]['search_folder']).grid(row=0, column=0, padx=(0, 5), sticky=W)
+        self.localize(ttk.Label(settings_frame), 'search_folder').grid(row=0, column=0, padx=(0, 5), sticky=W)
         self.folder_var = tk.StringVar()
         folder_entry = ttk.Entry(settings_frame, textvariable=self.folder_var)
         folder_entry.grid(row=0, column=1, sticky=EW, padx=(0, 5))
-        ttk.Button(settings_frame, text=translations[self.language]['browse'], command=self.browse_folder, bootstyle=SECONDARY).grid(row=0, column=2)
-        ttk.Label(settings_frame, text=translations[self.language]['search_keyword']).grid(row=1, column=0, padx=(0, 5), pady=(5,0), sticky=W)
+        self.localize(ttk.Button(settings_frame, command=self.browse_folder, bootstyle=SECONDARY), 'browse').grid(row=0, column=2)
+        self.localize(ttk.Label(settings_frame), 'search_keyword').grid(row=1, column=0, padx=(0, 5), pady=(5,0), sticky=W)
         self.keyword_var = tk.StringVar()
         self.keyword_var.trace_add("write", self.on_keyword_change)
-        keyword_entry = ttk.Entry(settings_frame, textvariable=self.keyword_var)
-        keyword_entry.grid(row=1, column=1, columnspan=2, sticky=EW, pady=(5,0))
-        keyword_entry.bind("<Return>", self.start_search)
+        self.keyword_entry = ttk.Entry(settings_frame, textvariable=self.keyword_var)
+        self.keyword_entry.grid(row=1, column=1, columnspan=2, sticky=EW, pady=(5,0))
+        self.keyword_entry.bind("<Return>", self.start_search)
 
     def create_options_widgets(self, parent):
-        options_frame = ttk.LabelFrame(parent, text=translations[self.language]['search_options'], padding=10)
+        options_frame = self.localize(ttk.LabelFrame(parent, padding=10), 'search_options')
         options_frame.pack(fill=X, pady=5)
         type_frame = ttk.Frame(options_frame)
         type_frame.pack(side=LEFT, fill=X, expand=True)
         self.type_var = tk.StringVar(value="all")
-        ttk.Radiobutton(type_frame, text=translations[self.language]['all'], value="all", variable=self.type_var, bootstyle="outline-toolbutton").pack(side=LEFT, padx=(0,5), expand=True, fill=X)
-        ttk.Radiobutton(type_frame, text=translations[self.language]['file_only'], value="f", variable=self.type_var, bootstyle="outline-toolbutton").pack(side=LEFT, padx=5, expand=True, fill=X)
-        ttk.Radiobutton(type_frame, text=translations[self.language]['dir_only'], value="d", variable=self.type_var, bootstyle="outline-toolbutton").pack(side=LEFT, padx=5, expand=True, fill=X)
+        self.localize(ttk.Radiobutton(type_frame, value="all", variable=self.type_var, bootstyle="outline-toolbutton"), 'all').pack(side=LEFT, padx=(0,5), expand=True, fill=X)
+        self.localize(ttk.Radiobutton(type_frame, value="f", variable=self.type_var, bootstyle="outline-toolbutton"), 'file_only').pack(side=LEFT, padx=5, expand=True, fill=X)
+        self.localize(ttk.Radiobutton(type_frame, value="d", variable=self.type_var, bootstyle="outline-toolbutton"), 'dir_only').pack(side=LEFT, padx=5, expand=True, fill=X)
         check_frame = ttk.Frame(options_frame)
         check_frame.pack(side=LEFT, padx=(20,0))
         self.include_hidden_var = tk.BooleanVar(value=False)
-        ttk.Checkbutton(check_frame, text=translations[self.language]['hidden'], variable=self.include_hidden_var, bootstyle="round-toggle").pack(side=LEFT, padx=10)
+        self.localize(ttk.Checkbutton(check_frame, variable=self.include_hidden_var, bootstyle="round-toggle"), 'hidden').pack(side=LEFT, padx=10)
         self.case_sensitive_var = tk.BooleanVar(value=False)
-        ttk.Checkbutton(check_frame, text=translations[self.language]['case_sensitive'], variable=self.case_sensitive_var, bootstyle="round-toggle").pack(side=LEFT, padx=10)
+        self.localize(ttk.Checkbutton(check_frame, variable=self.case_sensitive_var, bootstyle="round-toggle"), 'case_sensitive').pack(side=LEFT, padx=10)
+        self.localize(ttk.Checkbutton(check_frame, variable=self.live_search_var, bootstyle="round-toggle"), 'live_search').pack(side=LEFT, padx=10)
+        self.create_fd_options_widgets(parent)
+
+    def create_fd_options_widgets(self, parent):
+        """fd's own pruning options and the saved profiles (see ``engine.FD_OPTIONS``)."""
+        fd_frame = self.localize(ttk.LabelFrame(parent, padding=10), 'fd_options')
+        fd_frame.pack(fill=X, pady=5)
+        for column in (1, 3, 5):
+            fd_frame.columnconfigure(column, weight=1)
+        self.fd_option_vars = {name: tk.BooleanVar() if isinstance(default, bool) else tk.StringVar()
+                               for name, default in FD_OPTIONS.items()}
+        # (行, 列, 翻訳キー, オプション名, 入力欄の幅)
+        fields = [
+            (0, 0, 'exclude', 'exclude', None), (0, 2, 'extensions', 'extensions', None), (0, 4, 'size', 'size', None),
+            (1, 0, 'max_depth', 'max_depth', 6), (1, 2, 'max_results', 'max_results', 8),
+            (1, 4, 'changed_within', 'changed_within', None), (1, 6, 'threads', 'threads', 4),
+        ]
+        for row, column, key, name, width in fields:
+            self.localize(ttk.Label(fd_frame), key).grid(row=row, column=column, padx=(0 if column == 0 else 10, 5), pady=2, sticky=W)
+            entry = ttk.Entry(fd_frame, textvariable=self.fd_option_vars[name], **({'width': width} if width else {}))
+            entry.grid(row=row, column=column + 1, pady=2, sticky=EW if width is None else W)
+            entry.bind("<Return>", self.start_search)
+        profile_frame = ttk.Frame(fd_frame)
+        profile_frame.grid(row=2, column=0, columnspan=8, sticky=EW, pady=(5, 0))
+        self.localize(ttk.Checkbutton(profile_frame, variable=self.fd_option_vars['fixed_strings'], bootstyle="round-toggle"), 'fixed_strings').pack(side=LEFT)
+        self.localize(ttk.Button(profile_frame, command=self.delete_profile, bootstyle=(SECONDARY, OUTLINE)), 'profile_delete').pack(side=RIGHT)
+        self.localize(ttk.Button(profile_frame, command=self.save_profile, bootstyle=(SECONDARY, OUTLINE)), 'profile_save').pack(side=RIGHT, padx=5)
+        self.profile_var = tk.StringVar()
+        self.profile_combo = ttk.Combobox(profile_frame, textvariable=self.profile_var, values=sorted(self.profiles), width=20)
+        self.profile_combo.pack(side=RIGHT)
+        self.profile_combo.bind("<<ComboboxSelected>>", self.apply_profile)
+        self.localize(ttk.Label(profile_frame), 'profile').pack(side=RIGHT, padx=5)
+
+    def fd_options_form(self) -> dict:
+        """The fd options as entered (numbers and lists still as text, see ``parse_fd_options``)."""
+        return {name: var.get() for name, var in self.fd_option_vars.items()}
+
+    def set_fd_options_form(self, options: dict):
+        for name, default in FD_OPTIONS.items():
+            value = options.get(name, default)
+            if isinstance(default, list) and not isinstance(value, str):
+                value = ", ".join(value)
+            elif not isinstance(default, bool) and isinstance(default, int) and not value:
+                value = ""  # 0 (制限なし) は空欄で表す
+            self.fd_option_vars[name].set(value)
+
+    def save_profile(self):
+        """Save the search options under the name in the profile box."""
+        name = self.profile_var.get().strip()
+        if not name:
+            messagebox.showerror("エラー", "プロファイル名を入力してください。")
+            return
+        try:
+            options = parse_fd_options(self.fd_options_form())
+        except SearchError as e:
+            messagebox.showerror("エラー", str(e))
+            return
+        self.profiles[name] = {'type': self.type_var.get(), 'hidden': self.include_hidden_var.get(),
+                               'case_sensitive': self.case_sensitive_var.get(), **options}
+        self.profile_combo.configure(values=sorted(self.profiles))
+        self.status_var.set(f"💾 プロファイルを保存しました: {name}")
+
+    def apply_profile(self, event=None):
+        profile = self.profiles.get(self.profile_var.get())
+        if profile is None:
+            return
+        self.type_var.set(profile.get('type', 'all'))
+        self.include_hidden_var.set(profile.get('hidden', False))
+        self.case_sensitive_var.set(profile.get('case_sensitive', False))
+        self.set_fd_options_form(profile)
+
+    def delete_profile(self):
+        name = self.profile_var.get().strip()
+        if self.profiles.pop(name, None) is None:
+            return
+        self.profile_combo.configure(values=sorted(self.profiles))
+        self.profile_var.set("")
 
     def create_results_widgets(self, parent):
-        result_frame = ttk.LabelFrame(parent, text=translations[self.language]['search_results'], padding=10)
+        self.result_frame = result_frame = self.localize(ttk.LabelFrame(parent, padding=10), 'search_results')
         result_frame.pack(fill=BOTH, expand=True)
 
         filter_frame = ttk.Frame(result_frame)
         filter_frame.pack(fill=X, pady=(0, 5))
-        ttk.Label(filter_frame, text=translations[self.language]['fuzzy_filter']).pack(side=LEFT, padx=(0,5))
+        self.localize(ttk.Label(filter_frame), 'fuzzy_filter').pack(side=LEFT, padx=(0,5))
+        for mode in ('glob', 'regex', 'fuzzy'):
+            self.localize(ttk.Radiobutton(filter_frame, value=mode, variable=self.filter_mode_var, command=self.on_filter_mode_change,
+                                          bootstyle="outline-toolbutton"), f'filter_{mode}').pack(side=RIGHT, padx=(5, 0))
         self.filter_var = tk.StringVar()
         self.filter_entry = ttk.Entry(filter_frame, textvariable=self.filter_var)
         self.filter_entry.pack(fill=X, expand=True)
         self.filter_entry.bind("<Return>", self.filter_results)
-
-        list_frame = ttk.Frame(result_frame)
+        self.filter_var.trace_add("write", self.on_filter_change)
+
+        content_frame = ttk.Frame(result_frame)
+        content_frame.pack(fill=X, pady=(0, 5))
+        self.localize(ttk.Label(content_frame), 'content_search').pack(side=LEFT, padx=(0,5))
+        self.localize(ttk.Button(content_frame, command=self.search_contents, bootstyle="secondary"),
+                      'content_search_start').pack(side=RIGHT, padx=(5, 0))
+        self.content_var = tk.StringVar()
+        content_entry = ttk.Entry(content_frame, textvariable=self.content_var)
+        content_entry.pack(fill=X, expand=True)
+        content_entry.bind("<Return>", self.search_contents)
+
+        self.list_frame = list_frame = ttk.Frame(result_frame)
         list_frame.pack(fill=BOTH, expand=True)
         x_scrollbar = ttk.Scrollbar(list_frame, orient=HORIZONTAL, bootstyle="round")
         x_scrollbar.pack(side=BOTTOM, fill=X)
         y_scrollbar = ttk.Scrollbar(list_frame, orient=VERTICAL, bootstyle="round")
         y_scrollbar.pack(side=RIGHT, fill=Y)
-        self.result_listbox = tk.Listbox(list_frame, xscrollcommand=x_scrollbar.set, yscrollcommand=y_scrollbar.set)
+        self.result_listbox = VirtualListbox(list_frame, xscrollcommand=x_scrollbar.set, yscrollcommand=y_scrollbar.set)
         self.result_listbox.pack(side=LEFT, fill=BOTH, expand=True)
         x_scrollbar.config(command=self.result_listbox.xview)
         y_scrollbar.config(command=self.result_listbox.yview)
         self.result_listbox.bind("<Double-Button-1>", self.open_selected_path)
         self.result_listbox.bind("<Button-3>", self.show_context_menu)
+        colors = self.style.colors
+        self.result_listbox.set_colors(colors.inputfg, colors.inputbg, colors.selectfg, colors.selectbg)
+        if self.details_var.get():
+            self.toggle_details()
+        if self.tree_var.get():
+            self.toggle_tree()
+
+    def show_results(self, keep_position: bool = False):
+        """Point the result view at ``displayed_results`` (indices into ``results``; no rows are copied).
+
+        ``keep_position`` keeps the scroll position (and the folder tree) when
+        the same matches are only reordered.
+        """
+        self.result_listbox.set_source(self.displayed_results, key=self.result_text, keep_position=keep_position)
+        if self.displayed_results is self.sorted_results:
+            self.result_listbox.set_sort_indicator(*self.sort_state)
+        else:
+            self.sort_cancel.set()  # 並べ替え中の一覧は置き換えられた
+            self.sorted_results = self.sort_state = None
+            self.result_listbox.set_sort_indicator(None)
+        if self.tree_var.get() and not keep_position:
+            self.show_tree()
+
+    def result_text(self, index: int) -> str:
+        """The row text of result ``index``: its path, followed by the matching line for content hits."""
+        if self.content_lines is None:
+            return self.results.rel(index)
+        line_no, line = self.content_lines[index]
+        return f"{self.results.rel(index)}:{line_no}: {line}"
+
+    # --- フォルダごとの表示 ---
+    def toggle_tree(self):
+        """Switch the results between the flat list and the folder tree."""
+        if not self.tree_var.get():
+            if self.tree_sync_job is not None:
+                self.after_cancel(self.tree_sync_job)
+                self.tree_sync_job = None
+            self.result_tree = self.tree_source = None
+            self.tree_open, self.tree_nodes = {}, {}
+            if self.tree_widget is not None:
+                self.tree_widget.delete(*self.tree_widget.get_children())
+                self.tree_frame.pack_forget()
+            self.list_frame.pack(fill=BOTH, expand=True)
+            return
+        if self.tree_widget is None:
+            self.create_tree_widgets()
+        self.list_frame.pack_forget()
+        self.tree_frame.pack(fill=BOTH, expand=True)
+        self.show_tree()
+
+    def create_tree_widgets(self):
+        # フォルダごとの表示を使うまで作らない
+        self.tree_frame = ttk.Frame(self.result_frame)
+        y_scrollbar = ttk.Scrollbar(self.tree_frame, orient=VERTICAL, bootstyle="round")
+        y_scrollbar.pack(side=RIGHT, fill=Y)
+        self.tree_widget = ttk.Treeview(self.tree_frame, columns=("count",), selectmode="browse",
+                                        yscrollcommand=y_scrollbar.set)
+        self.tree_widget.pack(side=LEFT, fill=BOTH, expand=True)
+        y_scrollbar.config(command=self.tree_widget.yview)
+        self.tree_widget.column("count", width=self.result_listbox.font.measure("0,000,000") + 16, stretch=False, anchor=E)
+        self.localize_with(lambda text: self.tree_widget.heading("#0", text=text), 'column_name')
+        self.localize_with(lambda text: self.tree_widget.heading("count", text=text), 'column_hits')
+        self.tree_widget.bind("<<TreeviewOpen>>", self.on_tree_open)
+        self.tree_widget.bind("<Double-Button-1>", self.on_tree_double_click)
+        self.tree_widget.bind("<Button-3>", self.show_tree_context_menu)
+
+    def show_tree(self):
+        """Start a new folder tree for ``displayed_results``; ``sync_tree`` fills it in."""
+        view = self.displayed_results
+        self.tree_source = view_indices(view) if isinstance(view, (RankedResults, PartialRanking)) else view
+        self.result_tree = ResultTree(self.results)
+        self.tree_added = 0
+        root = self.result_tree.root
+        self.tree_open = {root: [0, 0, TREE_PAGE_ROWS]}
+        self.tree_nodes = {self.tree_iid(root): root}
+        self.tree_widget.delete(*self.tree_widget.get_children())
+        self.schedule_tree_sync(0)
+
+    def schedule_tree_sync(self, delay_ms: int | None = None):
+        if self.result_tree is not None and self.tree_sync_job is None:
+            self.tree_sync_job = self.after(TREE_REFRESH_MS if delay_ms is None else delay_ms, self.sync_tree)
+
+    def sync_tree(self):
+        """Add the rows that reached ``tree_source`` since the last call, then bring the open folders up to date.
+
+        Rows are added for at most one frame budget at a time, so turning the
+        tree on over a million results does not freeze the window.
+        """
+        self.tree_sync_job = None
+        tree, source = self.result_tree, self.tree_source
+        if tree is None:
+            return
+        deadline = time.perf_counter() + FRAME_BUDGET_S
+        stop = len(source)
+        while self.tree_added < stop and time.perf_counter() < deadline:
+            end = min(self.tree_added + INGEST_SLICE, stop)
+            if isinstance(source, ResultRows):
+                tree.add_range(self.tree_added, end)
+            else:
+                tree.add(source[self.tree_added:end])
+            self.tree_added = end
+        widget = self.tree_widget
+        for node in tree.take_changes():
+            if node is not tree.root:
+                iid = self.tree_iid(node)
+                if not widget.exists(iid):
+                    continue  # 親フォルダがまだ開かれていない
+                widget.set(iid, "count", f"{node.count:,}")
+            if node in self.tree_open:
+                self.fill_tree_node(node)
+        if self.tree_added < len(source):
+            self.schedule_tree_sync(1)
+
+    @staticmethod
+    def tree_iid(node) -> str:
+        return f"d{id(node)}"
+
+    def fill_tree_node(self, node):
+        """Insert the subfolders and files of the open folder ``node`` that are not shown yet.
+
+        Subfolders come first, then the files, both in the order they arrived;
+        past the page limit a "… +N" row stands for the rest.
+        """
+        widget = self.tree_widget
+        iid = self.tree_iid(node)
+        parent = "" if node is self.result_tree.root else iid
+        state = self.tree_open[node]
+        dirs_shown, files_shown, limit = state
+        for child in islice(node.dirs.values(), dirs_shown, None):
+            child_iid = self.tree_iid(child)
+            self.tree_nodes[child_iid] = child
+            widget.insert(parent, dirs_shown, iid=child_iid, text=child.name, values=(f"{child.count:,}",))
+            widget.insert(child_iid, END, iid="p" + child_iid[1:], text="…")  # 開くまで中身は入れない
+            dirs_shown += 1
+        folder = len(node.path())
+        stop = min(len(node.files), limit)
+        for position in range(files_shown, stop):
+            index = node.files[position]
+            widget.insert(parent, dirs_shown + position, iid=f"f{index}", text=self.result_text(index)[folder:])
+        files_shown = max(files_shown, stop)
+        more_iid = "m" + iid[1:]
+        remaining = len(node.files) - files_shown
+        if remaining and widget.exists(more_iid):
+            widget.item(more_iid, text=f"… +{remaining:,}")
+        elif remaining:
+            widget.insert(parent, END, iid=more_iid, text=f"… +{remaining:,}")
+        elif widget.exists(more_iid):
+            widget.delete(more_iid)
+        state[:] = dirs_shown, files_shown, limit
+
+    def on_tree_open(self, event=None):
+        iid = self.tree_widget.focus()
+        node = self.tree_nodes.get(iid)
+        if node is None or node in self.tree_open:
+            return
+        self.tree_widget.delete("p" + iid[1:])
+        self.tree_open[node] = [0, 0, TREE_PAGE_ROWS]
+        self.fill_tree_node(node)
+
+    def on_tree_double_click(self, event):
+        iid = self.tree_widget.identify_row(event.y)
+        if iid.startswith("m"):
+            # 「… +N」の行: 次のページを表示する
+            node = self.tree_nodes["d" + iid[1:]]
+            self.tree_open[node][2] += TREE_PAGE_ROWS
+            self.fill_tree_node(node)
+            return "break"
+        if iid.startswith("f"):
+            self.open_selected_path()
+            return "break"
+        # フォルダはダブルクリックで開閉する (Treeview の既定の動作)
+
+    def show_tree_context_menu(self, event):
+        iid = self.tree_widget.identify_row(event.y)
+        if not iid:
+            return
+        self.tree_widget.selection_set(iid)
+        self.tree_widget.focus(iid)
+        if self.get_selected_absolute_path():
+            try:
+                self.context_menu.tk_popup(event.x_root, event.y_root)
+            finally:
+                self.context_menu.grab_release()
+
+    def tree_selected_path(self) -> str | None:
+        selection = self.tree_widget.selection()
+        if not selection or self.result_tree is None:
+            return None
+        iid = selection[0]
+        if iid.startswith("f"):
+            return self.results.absolute(int(iid[1:]))
+        if iid.startswith("d"):
+            return self.result_tree.absolute(self.tree_nodes[iid])
+        return None
+
+    # --- ファイル情報の列 ---
+    def toggle_details(self):
+        """Show or hide the size / modified / type columns."""
+        if not self.details_var.get():
+            self.result_listbox.set_columns([])
+            return
+        tr = lambda key: lambda: translations[self.language][key]
+        measure = self.result_listbox.font.measure
+        self.result_listbox.set_columns([
+            ("name", tr('column_name'), None, NW, None),
+            ("size", tr('column_size'), measure("0000.0 MB") + 16, NE, lambda index: self.metadata_text("size", index)),
+            ("mtime", tr('column_mtime'), measure("0000-00-00 00:00") + 16, NW, lambda index: self.metadata_text("mtime", index)),
+            ("type", tr('column_type'), measure("Directory") + 16, NW, lambda index: self.metadata_text("type", index)),
+        ], on_header_click=self.sort_results, on_rows_shown=self.prefetch_metadata)
+
+    def results_metadata(self) -> MetadataCache:
+        """The metadata of the current ``results``, created on first use."""
+        if self.metadata is None or self.metadata.store is not self.results:
+            if self.metadata is not None:
+                self.metadata.close()
+            self.metadata = MetadataCache(self.results, on_ready=self.notify_metadata)
+        return self.metadata
+
+    def prefetch_metadata(self, first: int, last: int):
+        """Ask for the metadata of the rows on screen and a page either side of them."""
+        margin = (last - first) * METADATA_PREFETCH_PAGES
+        view = self.displayed_results
+        rows = range(max(0, first - margin), min(len(view), last + margin))
+        self.results_metadata().request([view[position] for position in rows])
+
+    def notify_metadata(self):
+        """Stat thread: a batch of metadata is ready; wake the Tk loop once until it redraws."""
+        if not self.metadata_wakeup_pending:
+            self.metadata_wakeup_pending = True
+            try:
+                self.event_generate("<<MetadataReady>>", when="tail")
+            except (tk.TclError, RuntimeError):
+                pass
+
+    def on_metadata_ready(self, event=None):
+        self.metadata_wakeup_pending = False
+        self.result_listbox.refresh()
+
+    def metadata_text(self, column: str, index: int) -> str:
+        kind, size, mtime = self.results_metadata().get(index)
+        if kind < KIND_FILE:
+            return "…"
+        if kind == KIND_MISSING:
+            return "-"
+        if column == "size":
+            return format_size(size) if kind == KIND_FILE else ""
+        if column == "mtime":
+            return datetime.fromtimestamp(mtime / 1000).strftime("%Y-%m-%d %H:%M")
+        if kind == KIND_DIR:
+            return translations[self.language]['type_folder']
+        if kind == KIND_OTHER:
+            return translations[self.language]['type_other']
+        extension = os.path.splitext(self.results.rel(index))[1][1:]
+        return extension.upper() if extension else translations[self.language]['type_file']
+
+    def sort_results(self, column: str):
+        """Sort the shown results by ``column`` on a worker thread; a second click reverses the order."""
+        if self.search_running or not self.displayed_results:
+            return  # 検索中は結果が増え続けるため並べ替えない
+        descending = self.sort_state == (column, False)
+        self.sort_cancel.set()
+        self.sort_cancel = threading.Event()
+        self.status_var.set(translations[self.language]['status_sorting'])
+        threading.Thread(
+            target=self.run_sort,
+            args=(self.displayed_results, self.results_metadata(), column, descending, self.sort_cancel),
+            daemon=True,
+        ).start()
+
+    def run_sort(self, view, metadata: MetadataCache, column: str, descending: bool, cancel: threading.Event):
+        """Worker thread: compute the sorted order of ``view`` and hand it to the Tk thread."""
+        sorting = translations[self.language]['status_sorting']
+        order = metadata.sort_order(column, view_indices(view), descending, cancel,
+                                    progress=lambda done: self.notify_status(f"{sorting} {done:.0%}"))
+        if order is None or cancel.is_set():
+            return
+        self.sort_done = (view, column, descending, order)
+        try:
+            self.event_generate("<<SortReady>>", when="tail")
+        except (tk.TclError, RuntimeError):
+            pass
+
+    def on_sort_ready(self, event=None):
+        if self.sort_done is None:
+            return
+        view, column, descending, order = self.sort_done
+        self.sort_done = None
+        if view is not self.displayed_results:
+            return  # 並べ替えている間に絞り込みや検索で一覧が変わった
+        self.displayed_results = self.sorted_results = order
+        self.sort_state = (column, descending)
+        self.shown_query = None  # 同じクエリの再実行で、並べ替えた一覧の末尾に追記しない
+        self.show_results()
+        self.update_filter_status()
 
     def get_selected_absolute_path(self) -> str | None:
+        if self.result_tree is not None:
+            return self.tree_selected_path()
         selection_indices = self.result_listbox.curselection()
         if not selection_indices:
             return None
         selected_index = selection_indices[0]
         if selected_index < len(self.displayed_results):
-            return self.displayed_results[selected_index][0]
+            return self.results.absolute(self.displayed_results[selected_index])
         return None
 
-    def fuzzy_match(self, query: str, target: str) -> bool:
-        query = query.lower()
-        target = target.lower()
-        query_idx = 0
-        target_idx = 0
-        while query_idx < len(query) and target_idx < len(target):
-            if query[query_idx] == target[target_idx]:
-                query_idx += 1
-            target_idx += 1
-        return query_idx == len(query)
+    def on_filter_change(self, *args):
+        """Debounce filter input so that only the last keystroke starts a job."""
+        if self.filter_job is not None:
+            self.after_cancel(self.filter_job)
+        self.filter_job = self.after(FILTER_DEBOUNCE_MS, self.filter_results)
+
+    def on_filter_mode_change(self):
+        self.shown_query = None  # 同じ文字列でも照合の方法が変わったので一覧を作り直す
+        if self.filter_var.get():
+            self.on_filter_change()
 
     def filter_results(self, event=None):
+        """Start a filter job for the current query, superseding any running one."""
+        if self.filter_job is not None:
+            self.after_cancel(self.filter_job)
+            self.filter_job = None
         query = self.filter_var.get()
-        self.result_listbox.delete(0, "end")
+        self.filter_cancel.set()
+        self.filter_generation += 1
 
         if not query:
-            self.displayed_results = self.all_results[:]
-        else:
-            self.displayed_results = [item for item in self.all_results if self.fuzzy_match(query, item[1])]
+            self.displayed_results = self.results.all_rows()
+            self.shown_query = ""
+            self.show_results()
+            self.update_filter_status()
+            return
 
+        self.filter_started = time.perf_counter()
+        # 検索中に同じクエリを再実行する場合は、追加された結果の一致分だけを末尾に足す
+        append_from = None
+        if query == self.shown_query and isinstance(self.displayed_results, array):
+            append_from = len(self.displayed_results)
+        self.filter_replace_pending = append_from is None
+        if self.filter_replace_pending:
+            self.shown_query = None
+        self.filter_cancel = threading.Event()
+        self.filter_thread = threading.Thread(
+            target=self.run_filter,
+            args=(query, self.filter_cancel, self.filter_generation, append_from, not self.search_running,
+                  self.filter_mode_var.get()),
+            daemon=True,
+        )
+        self.filter_thread.start()
+        if self.filter_update_job is None:
+            self.filter_update_job = self.after(FILTER_POLL_MS, self.apply_filter_updates)
+
+    def run_filter(self, query: str, cancel: threading.Event, generation: int, append_from: int | None, rank: bool,
+                   mode: str = "fuzzy"):
+        """Worker thread: stream the matches of ``query`` into ``filter_queue``, then rank them.
+
+        Regex and glob matches keep the order of the results and are not ranked.
+        """
+        on_chunk = None
+        if append_from is None:
+            on_chunk = lambda part: self.filter_queue.append((generation, "part", part))
+        if mode == "fuzzy":
+            matches = self.filter_engine.filter(query, cancel, on_chunk)
+        else:
+            rank = False
+            try:
+                matches = self.pattern_filter.filter(query, mode, cancel, on_chunk)
+            except re.error as e:
+                self.filter_queue.append((generation, "error", f"正規表現が正しくありません: {e}"))
+                return
+        if matches is None:
+            return
+        if append_from is not None:
+            self.filter_queue.append((generation, "part", matches[append_from:]))
+        if rank and matches:
+            # 採点の途中でもそれまでの上位を送り、最良の候補をすぐに表示する
+            ranked = self.filter_engine.rank(query, matches, cancel,
+                                             on_partial=lambda top: self.filter_queue.append((generation, "partial", (top, matches))))
+            if ranked is None:
+                return
+            self.filter_queue.append((generation, "ranked", ranked))
+        self.filter_queue.append((generation, "done", query))
+
+    def apply_filter_updates(self):
+        """Move streamed filter matches into ``displayed_results`` on the Tk thread."""
+        self.filter_update_job = None
+        while self.filter_queue:
+            generation, kind, data = self.filter_queue.popleft()
+            if generation != self.filter_generation:
+                continue
+            if self.filter_replace_pending and kind != "error":
+                self.filter_replace_pending = False
+                self.displayed_results = array("Q")
+                self.show_results()
+            if kind == "part":
+                self.displayed_results.extend(data)
+                self.result_listbox.refresh()
+                self.schedule_tree_sync()
+            elif kind in ("partial", "ranked"):
+                if kind == "partial" and self.filter_queue and self.filter_queue[0][0] == generation \
+                        and self.filter_queue[0][1] in ("partial", "ranked"):
+                    continue  # より新しい順位が届いている
+                # 最初の順位付けでは先頭に戻し、その後の差し替えではスクロール位置を保つ
+                refine = isinstance(self.displayed_results, PartialRanking)
+                self.displayed_results = PartialRanking(*data) if kind == "partial" else RankedResults(*data)
+                self.show_results(keep_position=refine)
+            elif kind == "error":
+                self.status_var.set(f"❌ {data}")
+                if self.filter_stale:
+                    self.filter_stale = False
+                    self.on_filter_change()
+            else:
+                self.shown_query = data
+                self.update_filter_status()
+                self.record_filter_time(data)
+                if self.filter_stale:
+                    self.filter_stale = False
+                    self.on_filter_change()
+        if self.filter_queue or (self.filter_thread is not None and self.filter_thread.is_alive()):
+            self.filter_update_job = self.after(FILTER_POLL_MS, self.apply_filter_updates)
+
+    def record_filter_time(self, query: str):
+        if self.profile is None or self.filter_started is None:
+            return
+        entry = self.profile.filtered(query, time.perf_counter() - self.filter_started,
+                                      len(self.displayed_results), len(self.results))
+        self.filter_started = None
+        # 検索中の追従による再絞り込みは記録せず、入力に応じた絞り込みだけをログに残す
+        if not self.search_running and self.perf_settings.get('log', True):
+            self.perf_log.append({"event": "filter", "search_id": self.profile.id, **entry})
+        self.update_perf_panel(force=True)
+
+    def update_filter_status(self):
         if not self.displayed_results:
-            self.result_listbox.insert("end", translations[self.language]['status_no_results'])
+            self.result_listbox.set_placeholder(translations[self.language]['status_no_results'])
             self.status_var.set(f"{translations[self.language]['status_done']} 0")
         else:
-            relative_paths = [item[1] for item in self.displayed_results]
-            self.result_listbox.insert("end", *relative_paths)
-            if not query:
-                self.status_var.set(f"{translations[self.language]['status_done']} {len(self.all_results)}")
-            else:
-                self.status_var.set(f"{translations[self.language]['status_done']} {len(self.displayed_results)}")
+            self.status_var.set(f"{translations[self.language]['status_done']} {len(self.displayed_results)}")
 
     def create_statusbar(self):
         status_frame = ttk.Frame(self, padding=(5, 2))
@@ -410,158 +1702,464 @@ class FdSearchApp(ttk.Window):
         self.found_count_var = tk.StringVar()
         self.found_count_label = ttk.Label(right_frame, textvariable=self.found_count_var)
         self.found_count_label.pack(side=RIGHT)
+        # 段階ごとの計測値 (メニューで表示を切り替える)
+        self.perf_frame = ttk.Frame(self, padding=(5, 0))
+        self.perf_var = tk.StringVar()
+        ttk.Label(self.perf_frame, textvariable=self.perf_var, font="TkFixedFont", justify=LEFT).pack(side=LEFT)
+        if self.perf_panel_var.get():
+            self.perf_frame.pack(side=BOTTOM, fill=X)
+            self.update_perf_panel(force=True)
+
+    def toggle_perf_panel(self):
+        if self.perf_panel_var.get():
+            self.perf_frame.pack(side=BOTTOM, fill=X)
+            self.update_perf_panel(force=True)
+        else:
+            self.perf_frame.pack_forget()
+
+    def update_perf_panel(self, force: bool = False):
+        """Show the current search's phase timings; at most a few times a second unless ``force``."""
+        now = time.perf_counter()
+        if not self.perf_panel_var.get() or (not force and now - self.perf_panel_updated < 0.25):
+            return
+        self.perf_panel_updated = now
+        if self.profile is None:
+            self.perf_var.set("-")
+            return
+
+        def ms(seconds):
+            return "-" if seconds is None else f"{seconds * 1000:.0f} ms"
+
+        def s(seconds):
+            return "-" if seconds is None else f"{seconds:.2f} s"
+
+        phases = self.profile.phases(self.root_stats)
+        ticks = self.profile.ticks
+        handoffs = self.profile.handoffs
+        rate = self.profile.current_rate(self.found_count) if self.search_running else (
+            self.found_count / phases["done_s"] if phases.get("done_s") else 0)
+        lines = [
+            f"spawn {ms(phases.get('spawn_s'))} | first byte {ms(phases.get('first_byte_s'))}"
+            f" | first result {ms(phases.get('first_result_s'))} | first shown {ms(phases.get('first_shown_s'))}"
+            f" | done {s(phases.get('done_s'))}",
+            f"ingest {rate:,.0f}/s | {self.found_count:,} paths | backlog {len(self.results_queue)} batches"
+            f" | tick {ms(sum(ticks) / len(ticks) if ticks else None)} avg, {ms(max(ticks, default=None))} max"
+            f" | hand-off {ms(max(handoffs, default=None))} max",
+            f"fd read {s(phases.get('read_s'))} | parse {s(phases.get('parse_s'))}"
+            f" | post {s(phases.get('post_s'))} | GUI {s(phases.get('gui_s'))}",
+        ]
+        if self.profile.filters:
+            last = self.profile.filters[-1]
+            lines.append(f"filter {last['ms']:.0f} ms ({last['query_length']} chars, {last['matches']:,} of {last['results']:,})")
+        self.perf_var.set("\n".join(lines))
+
+    def finish_profile(self, outcome: str):
+        """Log the finished stream's timings as one line of ``perf.jsonl``."""
+        if self.profile is None:
+            return
+        self.profile.mark("done")
+        if self.perf_settings.get('log', True):
+            self.perf_log.append(self.profile.record(outcome, self.found_count, self.root_stats, self.profile_query))
+        self.update_perf_panel(force=True)
 
     def change_theme(self, theme_name: str):
         self.style.theme_use(theme_name)
-        select_bg = self.style.colors.selectbg
-        self.result_listbox.config(selectbackground=select_bg)
+        colors = self.style.colors
+        self.result_listbox.set_colors(colors.inputfg, colors.inputbg, colors.selectfg, colors.selectbg)
 
     def change_language(self, lang_code: str):
-        if lang_code not in translations:
+        self.set_language(lang_code)
+
+    def start_search(self, event=None, live: bool = False):
+        """Search for the keyword; ``live`` searches (while typing) report problems in the status bar only.
+
+        A live search whose keyword merely extends the one of the finished
+        search on screen filters those results in memory instead of running fd.
+        """
+        if self.search_button is None or self.search_button["state"] == "disabled": return
+        if self.live_search_job is not None:
+            self.after_cancel(self.live_search_job)
+            self.live_search_job = None
+
+        def fail(message: str):
+            if live:
+                self.status_var.set(f"❌ {message.splitlines()[0]}")
+            else:
+                messagebox.showerror("エラー", message)
+
+        roots = parse_roots(self.folder_var.get())
+        missing = [root for root in roots if not os.path.isdir(root)]
+        if not roots or missing:
+            fail("指定された検索フォルダは存在しません。" + "".join(f"\n{root}" for root in missing))
             return
-        for key, value in translations[lang_code].items():
-            if hasattr(self, key):
-                getattr(self, key).set(value)
-        self.apply_settings(self.load_settings())
 
-    def start_search(self, event=None):
-        if self.search_button["state"] == "disabled": return
+        try:
+            options = parse_fd_options(self.fd_options_form())
+        except SearchError as e:
+            fail(str(e))
+            return
 
-        if not os.path.isdir(self.folder_var.get()):
-            messagebox.showerror("エラー", "指定された検索フォルダは存在しません。")
+        query = (self.keyword_var.get(), self.type_var.get(), self.include_hidden_var.get(), self.case_sensitive_var.get(),
+                 options)
+        tagged_roots = result_roots(roots)
+        if live and self.stream_query == (tagged_roots, query):
+            return  # 表示中 (または実行中) の検索と同じ
+        self.root_stats = {root: {"count": 0, "elapsed": None, "error": None} for root in roots}
+        if live and self.refinable is not None and self.refinable[0] == tagged_roots \
+                and literal_refinement(self.refinable[1], query):
+            self.begin_results_stream(tagged_roots, self.run_refine, self.results, roots, query, self.root_stats,
+                                      kind="refine", query=query, live=True)
             return
+        self.begin_results_stream(tagged_roots, self.run_fd_search, roots, query, self.root_stats, query=query, live=live)
+
+    def live_search(self):
+        self.live_search_job = None
+        self.start_search(live=True)
+
+    def begin_results_stream(self, roots: list | None, target, *args, kind: str = "search", query: tuple | None = None,
+                             live: bool = False):
+        """Start a new result set for ``roots`` and run ``target(generation, cancel, *args)`` on a reader thread.
+
+        ``kind`` and ``query`` describe the stream in the performance log;
+        ``live`` marks a search started by typing.
+        """
+        # 実行中の検索があれば fd ごと打ち切り、その結果は世代番号で破棄する
+        self.stop_search()
+        self.search_generation += 1
+        self.search_cancel = threading.Event()
+        self.stream_query = (roots, query) if query is not None else None
+        self.stream_live = live
+        self.refinable = None
+        self.content_lines = [] if kind == "content" else None
 
         self.history_menu.entryconfig(self.save_history_index, state="disabled")
-        self.search_button.config(state=DISABLED, text=translations[self.language]['status_searching'])
+        self.search_button.config(text=translations[self.language]['status_searching'])
+        self.stop_button.config(state=NORMAL)
         self.status_var.set(translations[self.language]['status_searching'])
         self.found_count_var.set("")
         self.time_var.set("")
 
-        self.result_listbox.delete(0, "end")
         self.filter_var.set("")
-        self.all_results.clear()
-        self.displayed_results.clear()
+        self.filter_cancel.set()
+        self.filter_generation += 1
+        self.shown_query = ""
+        if self.metadata is not None:
+            self.metadata.close()
+            self.metadata = None
+        # 保存中の履歴がまだ読んでいるかもしれないので、ストアは空にせず作り直す
+        self.results = ResultStore(roots, spill_bytes=int(self.result_settings.get('spill_mb', SPILL_MB)) << 20,
+                                   spill_dir=self.result_settings.get('spill_dir') or None)
+        self.displayed_results = self.results.all_rows()
+        self.filter_engine.clear()
+        self.pattern_filter.use_store(self.results)
+        self.show_results()
 
         self.update_idletasks()
+        self.search_running = True
         self.results_queue.clear()
         self.found_count = 0
         self.search_start_time = time.time()
-        threading.Thread(target=self.run_fd_search, daemon=True).start()
+        self.results_wakeup_pending = False
+        self.results_wakeup_time = None
+        self.filter_started = None
+        self.profile = SearchProfile(kind)
+        self.profile_query = query
+        self.search_thread = threading.Thread(
+            target=target, args=(self.search_generation, self.search_cancel, *args), daemon=True
+        )
+        self.search_thread.start()
         self.periodic_gui_updater()
 
-    def run_fd_search(self):
-        folder = self.folder_var.get()
-        keyword = self.keyword_var.get().strip()
-        fd_path = resource_path("fd.exe") if platform.system() == "Windows" else "fd"
-
-        if not keyword:
-            self.results_queue.append(("error", "検索キーワードを入力してください。"))
-            return
-        if platform.system() == "Windows" and not os.path.isfile(fd_path):
-            self.results_queue.append(("error", f"'{os.path.basename(fd_path)}' が見つかりません。"))
-            return
-
-        cmd = [fd_path, keyword, folder, "--absolute-path"]
-        if self.type_var.get() in ("f", "d"): cmd += ["-t", self.type_var.get()]
-        if self.include_hidden_var.get(): cmd.append("--hidden")
-        cmd.append("--case-sensitive" if self.case_sensitive_var.get() else "--ignore-case")
-
+    def stop_search(self, event=None):
+        """Cancel the running search and kill its fd process; results so far are kept."""
+        if self.live_search_job is not None:
+            # 待機中の入力中の検索が、後から始まった結果 (履歴など) を置き換えないようにする
+            self.after_cancel(self.live_search_job)
+            self.live_search_job = None
+        self.search_cancel.set()
+        self.engine.stop()
+
+    def run_fd_search(self, generation: int, cancel: threading.Event, roots: list[str], query: tuple, stats: dict):
+        """Reader thread: run the search on ``engine`` and forward its batches to ``results_queue``."""
+        keyword, file_type, hidden, case_sensitive, options = query
         try:
-            creation_flags = subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0
-            self.search_process = subprocess.Popen(
-                cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                text=True, encoding="utf-8", errors='ignore', creationflags=creation_flags
+            summary = self.engine.search(
+                roots, keyword, file_type, hidden, case_sensitive, cancel=cancel, stats=stats, options=options,
+                on_paths=lambda root_id, rels: self.post_result((generation, "paths", (root_id, rels))),
             )
-            for line in iter(self.search_process.stdout.readline, ''):
-                abs_path = line.strip()
-                if abs_path:
-                    rel_path = os.path.relpath(abs_path, folder)
-                    self.results_queue.append(("path", (abs_path, rel_path)))
-            self.search_process.wait()
-            stderr_output = self.search_process.stderr.read()
-            if self.search_process.returncode not in (0, 1) and stderr_output:
-                 self.results_queue.append(("error", f"fd 実行エラー:\n{stderr_output}"))
-        except FileNotFoundError:
-             self.results_queue.append(("error", f"'{os.path.basename(fd_path)}' が見つかりません。"))
+        except SearchError as e:
+            self.post_result((generation, "error", str(e)))
+            return
         except Exception as e:
-            self.results_queue.append(("error", f"予期せぬエラーが発生しました: {e}"))
-        finally:
-            self.results_queue.append(("done", None))
-            self.search_process = None
+            self.post_result((generation, "error", f"予期せぬエラーが発生しました: {e}"))
+            summary = None
+        if len(roots) == 1 and stats[roots[0]]["error"]:
+            self.post_result((generation, "error", stats[roots[0]]["error"]))
+        self.post_result((generation, "done", summary))
+
+    def run_refine(self, generation: int, cancel: threading.Event, store: ResultStore, roots: list[str], query: tuple,
+                   stats: dict):
+        """Reader thread: stream the paths of the previous results that match the longer keyword."""
+        keyword, file_type, hidden, case_sensitive, options = query
+        started = time.perf_counter()
+        for stat in stats.values():
+            stat["source"] = "refined"
+        for root_ids, rels in refine_results(store, keyword, case_sensitive, cancel):
+            if not rels:
+                continue
+            if isinstance(root_ids, int):
+                stats[roots[root_ids]]["count"] += len(rels)
+            else:
+                for root_id in root_ids:
+                    stats[roots[root_id]]["count"] += 1
+            self.post_result((generation, "paths", (root_ids, rels)))
+        for stat in stats.values():
+            stat["elapsed"] = time.perf_counter() - started
+        self.post_result((generation, "done", {"roots": [{"root": root, "refined": True} for root in roots], "errors": []}))
+
+    def search_contents(self, event=None):
+        """Search the files of the shown results for the text in the content field; the hits become the new results."""
+        text = self.content_var.get()
+        if not text or self.search_running or not self.displayed_results:
+            return  # 検索中は対象のファイルが増え続けるため始めない
+        store = self.results
+        self.root_stats = {}
+        self.begin_results_stream([list(root) for root in store.roots], self.run_content_search, store,
+                                  self.displayed_results, text, self.case_sensitive_var.get(), kind="content")
+        self.status_var.set(translations[self.language]['status_content'])
+
+    def run_content_search(self, generation: int, cancel: threading.Event, store: ResultStore, view, text: str,
+                           case_sensitive: bool):
+        """Reader thread: stream the lines of the files in ``view`` that contain ``text``, one result per line."""
+        indices = view_indices(view)
+        total = len(indices)
+        searching = translations[self.language]['status_content']
+        root_ids = store.root_ids
+        root_of = lambda index: root_ids[index] if index < len(root_ids) else 0
+        matched = 0
+        ids, rels, lines = [], [], []
+        for position, hits in grep_paths(total, lambda position: store.absolute(indices[position]), text,
+                                         case_sensitive, cancel,
+                                         progress=lambda done: self.notify_status(f"{searching} {done}/{total}")):
+            index = indices[position]
+            matched += 1
+            ids.extend([root_of(index)] * len(hits))
+            rels.extend([store.rel(index)] * len(hits))
+            lines.extend(hits)
+            if len(rels) >= CONTENT_POST_LINES:
+                self.post_result((generation, "hits", (ids, rels, lines)))
+                ids, rels, lines = [], [], []
+        if rels:
+            self.post_result((generation, "hits", (ids, rels, lines)))
+        self.post_result((generation, "done", {"roots": [], "errors": [], "content": (matched, total)}))
+
+    def post_result(self, message: tuple):
+        """Reader thread: queue ``message`` and wake the Tk loop if it is not already woken."""
+        self.results_queue.append(message)
+        if not self.results_wakeup_pending:
+            self.results_wakeup_pending = True
+            self.results_wakeup_time = time.perf_counter()
+            try:
+                self.event_generate("<<ResultsReady>>", when="tail")
+            except (tk.TclError, RuntimeError):
+                pass  # 終了処理中など。フォールバックのポーリングで拾われる
+
+    def on_results_ready(self, event=None):
+        self.results_wakeup_pending = False
+        if self.search_running:
+            self.schedule_gui_update(0)
+
+    def schedule_gui_update(self, delay_ms: int):
+        if self.update_job is not None:
+            self.after_cancel(self.update_job)
+        self.update_job = self.after(delay_ms, self.periodic_gui_updater)
 
     def periodic_gui_updater(self):
-        items_to_add = []
+        """Drain ``results_queue`` for at most one frame budget, then yield to the Tk loop."""
+        self.update_job = None
+        tick_start = time.perf_counter()
+        deadline = tick_start + FRAME_BUDGET_S
+        if self.results_wakeup_time is not None:
+            # 読み込みスレッドが起こしてから、この更新が始まるまでの待ち時間
+            self.profile.handoff(tick_start - self.results_wakeup_time)
+            self.results_wakeup_time = None
         is_done = False
         error_msg = None
-        while self.results_queue:
-            msg_type, data = self.results_queue.popleft()
-            if msg_type == "path":
-                items_to_add.append(data)
+        summary = None
+        added = 0
+        while self.results_queue and time.perf_counter() < deadline:
+            generation, msg_type, data = self.results_queue.popleft()
+            if generation != self.search_generation:
+                continue  # 打ち切られた検索の残り
+            if msg_type == "paths":
+                root_ids, rels = data
+                # 大きなバッチは分割し、1 フレームの予算を超えないようにする
+                if len(rels) > INGEST_SLICE:
+                    rest_ids = root_ids if isinstance(root_ids, int) else root_ids[INGEST_SLICE:]
+                    self.results_queue.appendleft((generation, "paths", (rest_ids, rels[INGEST_SLICE:])))
+                    if not isinstance(root_ids, int):
+                        root_ids = root_ids[:INGEST_SLICE]
+                    rels = rels[:INGEST_SLICE]
+                self.add_results(root_ids, rels)
+                added += len(rels)
+            elif msg_type == "hits":
+                # 中身の検索の一致行 (1 回の量は読み込みスレッド側で抑えてある)
+                root_ids, rels, lines = data
+                self.content_lines.extend(lines)
+                self.add_results(root_ids, rels)
+                added += len(rels)
+            elif msg_type == "roots":
+                self.results.roots = data
             elif msg_type == "error":
                 error_msg = data
                 is_done = True
                 break
             elif msg_type == "done":
                 is_done = True
+                summary = data
                 break
-        if items_to_add:
-            relative_paths = [item[1] for item in items_to_add]
-            self.result_listbox.insert("end", *relative_paths)
-            self.all_results.extend(items_to_add)
-            self.displayed_results.extend(items_to_add) # ★ 修正: displayed_resultsもリアルタイムで更新
-            self.found_count += len(items_to_add)
+        if added:
             self.found_count_var.set(f"{self.found_count} 件")
+            self.profile.tick(time.perf_counter() - tick_start, self.found_count)
+            self.profile.mark("first_shown")
+            self.update_perf_panel()
+        if len(self.root_stats) > 1:
+            self.time_var.set(self.root_stats_text())
         if error_msg:
             self.show_error(error_msg)
             return
         if is_done:
-            self.finalize_search()
+            self.finalize_search(summary)
             return
-        self.update_job = self.after(300, self.periodic_gui_updater)
+        # 残りがあればすぐ次のフレームで、なければ読み込みスレッドからの通知を待つ
+        self.schedule_gui_update(1 if self.results_queue else FALLBACK_POLL_MS)
+
+    def root_stats_text(self) -> str:
+        """Per-root counts and timings for the status bar; roots still running show no time yet."""
+        labels = root_labels(list(self.root_stats))
+        parts = []
+        for root, stat in self.root_stats.items():
+            state = "❌" if stat["error"] else ("…" if stat["elapsed"] is None else f"{stat['elapsed']:.2f}秒")
+            parts.append(f"{labels[root]}: {stat['count']} 件 ({state})")
+        return " | ".join(parts)
+
+    def add_results(self, root_ids, rels: list[str]):
+        start = len(self.results)
+        self.results.extend(root_ids, rels)
+        if self.result_tree is not None and self.tree_source is self.displayed_results \
+                and isinstance(self.tree_source, ResultRows) and self.tree_added == start:
+            # フォルダごとの表示は取り込んだバッチのパスをそのまま木に入れる (デコードし直さない)
+            self.result_tree.add(range(start, start + len(rels)), rels)
+            self.tree_added += len(rels)
+        if self.results.spilled and self.filter_engine.store is not self.results:
+            # ディスクへ移した後は絞り込みもストアのファイルを直接読み、キーの複製を持たない
+            self.filter_engine.use_store(self.results)
+        self.filter_engine.extend(rels)
+        if self.filter_var.get():
+            # 絞り込み中は新しい結果だけを走査させる (実行中のジョブは完了後に追従)
+            if self.filter_thread is not None and self.filter_thread.is_alive():
+                self.filter_stale = True
+            else:
+                self.on_filter_change()
+        else:
+            self.result_listbox.refresh()  # 絞り込みなしの表示はストアと一緒に伸びる
+            self.schedule_tree_sync()
+        self.found_count += len(rels)
 
-    def finalize_search(self):
-        self.displayed_results = self.all_results[:]
+    def finalize_search(self, summary: dict | None = None):
+        self.search_running = False
+        self.stop_button.config(state=DISABLED)
         elapsed_time = time.time() - self.search_start_time
+        stopped = self.search_cancel.is_set()
+        done_text = translations[self.language]['status_stopped' if stopped else 'status_done']
         if self.found_count == 0:
-            self.result_listbox.insert("end", translations[self.language]['status_no_results'])
-            self.status_var.set(translations[self.language]['status_done'])
+            self.result_listbox.set_placeholder(translations[self.language]['status_no_results'])
+            self.status_var.set(done_text)
             self.history_menu.entryconfig(self.save_history_index, state="disabled")
         else:
-            self.status_var.set(f"{translations[self.language]['status_done']} (Enterで結果を絞り込めます)")
+            self.status_var.set(f"{done_text} (Enterで結果を絞り込めます)")
             self.history_menu.entryconfig(self.save_history_index, state="normal")
 
         self.found_count_var.set(f"{self.found_count} 件")
+        infos = summary.get("roots", []) if summary else []
         self.time_var.set(f"({elapsed_time:.2f}秒)")
+        if summary and summary.get("history"):
+            self.time_var.set(f"(History: {summary['history']})")
+        elif len(self.root_stats) > 1:
+            self.time_var.set(f"{self.root_stats_text()} ({elapsed_time:.2f}秒)")
+        elif infos and infos[0].get("cached"):
+            self.time_var.set(f"({translations[self.language]['cached']} {elapsed_time:.2f}秒)")
+        elif infos and infos[0].get("indexed"):
+            self.time_var.set(f"({translations[self.language]['indexed']} {elapsed_time:.2f}秒)")
+        elif infos and infos[0].get("refined"):
+            self.time_var.set(f"({translations[self.language]['refined']} {elapsed_time:.2f}秒)")
+        elif summary and summary.get("content"):
+            matched, total = summary["content"]
+            self.time_var.set(f"({matched}/{total} {translations[self.language]['content_files']} {elapsed_time:.2f}秒)")
+        if self.content_lines is not None:
+            # 履歴には行番号を残せないため、中身の検索結果は保存しない
+            self.history_menu.entryconfig(self.save_history_index, state="disabled")
+        if not stopped and summary is not None and not summary.get("errors"):
+            self.refinable = self.stream_query
         self.on_keyword_change()
         self.search_button.config(text=translations[self.language]['start_search'])
         self.change_theme(self.style.theme.name)
-        if self.found_count > 0:
-             self.filter_entry.focus_set()
+        self.finish_profile("stopped" if stopped else "done")
+        if self.found_count > 0 and not self.stream_live:
+             self.filter_entry.focus_set()  # 入力中の検索ではキーワード欄から移さない
+        if self.filter_var.get():
+            self.shown_query = None  # 検索完了後はスコア順に並べ直す
+            self.filter_results()
+        if summary and summary.get("errors") and len(self.root_stats) > 1:
+            messagebox.showwarning("警告", "一部のフォルダで検索に失敗しました:\n\n" + "\n\n".join(summary["errors"]))
 
     def show_error(self, msg: str):
-        messagebox.showerror("エラー", msg)
-        self.status_var.set("❌ エラーが発生しました")
+        self.search_running = False
+        self.stop_button.config(state=DISABLED)
+        self.finish_profile("error")
+        if self.stream_live:
+            # 入力途中のキーワード (閉じていない括弧など) でダイアログを出さない
+            self.status_var.set(f"❌ {msg.splitlines()[0]}")
+        else:
+            messagebox.showerror("エラー", msg)
+            self.status_var.set("❌ エラーが発生しました")
         self.found_count_var.set("")
         self.time_var.set("")
         self.on_keyword_change()
         self.search_button.config(text=translations[self.language]['start_search'])
 
     def on_keyword_change(self, *args):
+        if self.search_button is None:
+            return  # 起動中 (検索ボタンはまだ作られていない)
         folder_exists = self.folder_var.get()
         keyword_exists = self.keyword_var.get().strip()
         if folder_exists and keyword_exists:
             self.search_button.config(state=NORMAL)
         else:
             self.search_button.config(state=DISABLED)
+        if args and not self.setting_keyword and self.live_search_var.get() and folder_exists and keyword_exists:
+            # キーワード欄の変更 (trace から呼ばれた場合) だけが入力中の検索を起こす
+            if self.live_search_job is not None:
+                self.after_cancel(self.live_search_job)
+            self.live_search_job = self.after(LIVE_SEARCH_DEBOUNCE_MS, self.live_search)
+
+    def set_keyword(self, keyword: str):
+        """Fill in the keyword field from code (history, launch arguments) without starting a live search."""
+        self.setting_keyword = True
+        try:
+            self.keyword_var.set(keyword)
+        finally:
+            self.setting_keyword = False
 
     def browse_folder(self):
+        from tkinter import filedialog
         folder = filedialog.askdirectory()
         if folder:
             self.folder_var.set(folder)
             self.on_keyword_change()
 
     def show_context_menu(self, event):
-        if self.result_listbox.size() == 0 or self.result_listbox.get(0).startswith("（"): return
+        if self.result_listbox.size() == 0 or event.y < self.result_listbox.header_height: return
         selection_idx = self.result_listbox.nearest(event.y)
         if not self.result_listbox.selection_includes(selection_idx):
             self.result_listbox.selection_clear(0, 'end')
@@ -597,6 +2195,8 @@ class FdSearchApp(ttk.Window):
         self.status_var.set(f"📋 パスをコピーしました: {path}")
 
     def open_selected_path(self, event=None):
+        if event is not None and event.y < self.result_listbox.header_height:
+            return  # 列の見出しのダブルクリック
         path = self.get_selected_absolute_path()
         if not path: return
         if not os.path.exists(path):
@@ -610,5 +2210,5 @@ class FdSearchApp(ttk.Window):
             messagebox.showerror("エラー", f"ファイル/フォルダを開けませんでした: {e}")
 
 if __name__ == "__main__":
-    app = FdSearchApp()
+    app = FdSearchApp(sys.argv[1:])
     app.mainloop()
\ No newline at end of file
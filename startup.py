@@ -0,0 +1,175 @@
+"""Cold-start helpers: single-instance hand-off and the startup time report.
+
+Kept apart from main.py and free of heavy imports, so that a launch which
+only hands its arguments to the running window stays cheap.
+"""
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+HANDOFF_TIMEOUT_S = 1.0   # 起動中のウィンドウが応答しなければ自分で起動する
+REPORT_TIMEOUT_S = 60     # 起動時間の計測で子プロセスを待つ上限
+REPORT_TOP_IMPORTS = 20   # レポートに載せる読み込みの遅いモジュールの数
+INSTANCE_FILE = "instance.json"
+
+def app_file(name: str) -> str:
+    """``name`` next to settings.json, resolved like ``engine.resource_path`` but without importing engine."""
+    return os.path.join(getattr(sys, "_MEIPASS", os.path.abspath(".")), name)
+
+# --- 単一インスタンス ---
+
+def hand_off(filepath: str, argv: list[str]) -> bool:
+    """Pass ``argv`` to the instance described by ``filepath``; True if it took them."""
+    try:
+        with open(filepath, "r", encoding="utf-8") as f:
+            info = json.load(f)
+        with socket.create_connection(("127.0.0.1", int(info["port"])), timeout=HANDOFF_TIMEOUT_S) as conn:
+            message = {"token": info["token"], "argv": argv, "cwd": os.getcwd()}
+            conn.sendall(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n")
+            return conn.makefile("rb").readline().strip() == b"ok"
+    except (OSError, ValueError, KeyError, TypeError):
+        # ファイルがない、古い (プロセスが終了済み)、応答しない: いずれも自分で起動する
+        return False
+
+class InstanceServer:
+    """Accepts hand-offs from later launches on a loopback socket.
+
+    The port and a random token are written to ``filepath`` (only the
+    token holder may hand over arguments); ``on_invoke(argv, cwd)`` is
+    called on the server thread for every accepted launch.
+    """
+
+    def __init__(self, filepath: str, on_invoke):
+        self.filepath = filepath
+        self.on_invoke = on_invoke
+        self.token = os.urandom(16).hex()
+        self.sock = None
+
+    def start(self) -> bool:
+        try:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.sock.bind(("127.0.0.1", 0))
+            self.sock.listen(8)
+            temp_path = self.filepath + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"port": self.sock.getsockname()[1], "token": self.token, "pid": os.getpid()}, f)
+            os.chmod(temp_path, 0o600)
+            os.replace(temp_path, self.filepath)
+        except OSError as e:
+            print(f"Could not start single-instance server: {e}")
+            self.close()
+            return False
+        threading.Thread(target=self.serve, daemon=True).start()
+        return True
+
+    def serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return  # close() でソケットが閉じられた
+            with conn:
+                try:
+                    conn.settimeout(HANDOFF_TIMEOUT_S)
+                    message = json.loads(conn.makefile("rb").readline())
+                    if message.get("token") != self.token:
+                        continue
+                    conn.sendall(b"ok\n")
+                except (OSError, ValueError, AttributeError):
+                    continue
+            self.on_invoke(list(message.get("argv", [])), message.get("cwd") or os.getcwd())
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        try:
+            with open(self.filepath, "r", encoding="utf-8") as f:
+                ours = json.load(f).get("token") == self.token
+            if ours:
+                os.remove(self.filepath)
+        except (OSError, ValueError):
+            pass
+
+def parse_gui_args(argv: list[str]) -> tuple[list[str], str | None]:
+    """Split a GUI launch's arguments into ``[FOLDER] [KEYWORD]`` and the ``--startup-probe`` file."""
+    positional, probe = [], None
+    args = iter(argv)
+    for arg in args:
+        if arg == "--startup-probe":
+            probe = next(args, None)
+        elif not arg.startswith("--"):
+            positional.append(arg)
+    return positional, probe
+
+# --- 起動時間の計測 ---
+
+def parse_import_times(stderr: str) -> list[dict]:
+    """Modules from ``-X importtime`` output, slowest (cumulative) first."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            modules.append({"module": name.strip(), "self_ms": int(self_us) / 1000,
+                            "cumulative_ms": int(cumulative_us) / 1000, "top_level": not name[1:].startswith(" ")})
+        except ValueError:
+            continue  # 見出し行
+    modules.sort(key=lambda module: module["cumulative_ms"], reverse=True)
+    return modules
+
+def startup_report(command: list[str], report_path: str) -> dict:
+    """Start the GUI once with ``command`` (which must accept ``--startup-probe FILE``) and time it.
+
+    The child records its own milestones (imports done, window created,
+    first paint, fully built) against the wall clock and exits once ready;
+    imports are profiled with ``PYTHONPROFILEIMPORTTIME``. The report is
+    also written to ``report_path``.
+    """
+    import subprocess
+    probe_path = report_path + ".probe"
+    env = dict(os.environ, PYTHONPROFILEIMPORTTIME="1")
+    launched = time.time()
+    try:
+        proc = subprocess.run([*command, "--startup-probe", probe_path], env=env, capture_output=True,
+                              text=True, errors="replace", timeout=REPORT_TIMEOUT_S)
+        stderr = proc.stderr
+    except subprocess.TimeoutExpired as e:
+        stderr = e.stderr or ""
+        if isinstance(stderr, bytes):
+            stderr = stderr.decode("utf-8", "replace")
+    exited = time.time()
+    try:
+        with open(probe_path, "r", encoding="utf-8") as f:
+            probe = json.load(f)
+        os.remove(probe_path)
+    except (OSError, ValueError):
+        probe = {}
+
+    # 子プロセスの各時点は壁時計で受け取り、起動を指示した時刻からの秒数に直す
+    phases = {"interpreter_s": probe["started_at"] - launched} if "started_at" in probe else {}
+    for name, at in probe.get("marks", {}).items():
+        phases[f"{name}_s"] = at - launched
+    phases["exit_s"] = exited - launched
+    modules = parse_import_times(stderr)
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "command": command,
+        "frozen": bool(getattr(sys, "frozen", False)),
+        "phases": {name: round(value, 4) for name, value in phases.items()},
+        "imports_total_ms": round(sum(m["cumulative_ms"] for m in modules if m["top_level"]), 3) if modules else None,
+        "slowest_imports": [{key: m[key] for key in ("module", "self_ms", "cumulative_ms")}
+                            for m in modules[:REPORT_TOP_IMPORTS]],
+    }
+    if not probe:
+        report["error"] = "the application did not report its startup (see its stderr)"
+    try:
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    except OSError as e:
+        print(f"Could not write startup report: {e}", file=sys.stderr)
+    return report
@@ -0,0 +1,45 @@
+"""PathIndex must answer a keyword search the way fd itself would."""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import PathIndex
+
+FD_PATH = shutil.which("fd") or shutil.which("fdfind")
+
+@unittest.skipUnless(FD_PATH, "fd is not installed")
+class PathIndexMatchesFd(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        for rel in ("src/sub/deep/a.txt", "src/sub/b.txt", "src/subject.py", "docs/deep.md"):
+            path = os.path.join(self.root, rel)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            open(path, "w").close()
+        self.index = PathIndex(os.path.join(self.root, "index.db"), FD_PATH)
+        self.index.crawl(self.root)
+
+    def fd(self, keyword: str, file_type: str) -> list[str]:
+        args = [FD_PATH, "--hidden", "--exclude", "index.db*"]
+        if file_type in ("f", "d"):
+            args += ["--type", file_type]
+        output = subprocess.run([*args, keyword], cwd=self.root, capture_output=True, text=True, check=True).stdout
+        return sorted(output.splitlines())
+
+    def indexed(self, keyword: str, file_type: str) -> list[str]:
+        batches = self.index.search(self.root, keyword, file_type, hidden=True, case_sensitive=False)
+        return sorted(path for batch in batches for path in batch if not path.startswith("index.db"))
+
+    def test_directory_matches_end_with_a_separator(self):
+        for keyword in ("sub", "s", "deep"):
+            for file_type in ("all", "d"):
+                with self.subTest(keyword=keyword, file_type=file_type):
+                    self.assertEqual(self.indexed(keyword, file_type), self.fd(keyword, file_type))
+
+if __name__ == "__main__":
+    unittest.main()